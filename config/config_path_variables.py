@@ -22,6 +22,12 @@ UPDATED_FILES_PATH_RACINE = ROOT_DIR / "UPDATED_FILES"
 UPDATED_FILES_PATH = ROOT_DIR / "UPDATED_FILES" / "fichiers_platforms"
 VERIFIED_FILES_PATH = ROOT_DIR / "Verifier" 
 BACKUP_LOCAL_PATH = ROOT_DIR / "backup"
+ARCHIVE_STORE_PATH = BACKUP_LOCAL_PATH / "store"
+HISTORY_DB_PATH = ROOT_DIR / "history" / "stock_history.db"
+CACHE_PATH = ROOT_DIR / "cache"
+FTP_CACHE_PATH = CACHE_PATH / "ftp"
+PARSE_CACHE_PATH = CACHE_PATH / "frames"
+UPLOAD_STATE_PATH = CACHE_PATH / "uploads.json"
 
 # Fichiers YAML
 HEADER_PLATFORMS_YAML = CONFIG / "header_platforms.yaml"
@@ -25,7 +25,14 @@ def delete_old_logs(log_dir: Path, max_age_days: int = 1):
 
 
 # Forcer stdout à UTF-8 (pour éviter l'erreur UnicodeEncodeError sur Windows)
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+# (reconfigure garde le même objet : pas de double wrapper qui ferme le flux d'origine)
+if hasattr(sys.stdout, 'reconfigure'):
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+    except Exception:
+        pass
+elif hasattr(sys.stdout, 'buffer'):
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
 # Logging format
 LOGGING_FORMAT = '[%(asctime)s]: %(levelname)s: %(module)s: %(message)s.'
@@ -1,12 +1,22 @@
 import os
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from utils import *
-from ftplib import FTP
+from ftplib import FTP, all_errors, error_perm
 from utils import load_fournisseurs_config, load_plateformes_config
 from config.logging_config import logger
 from config.config_path_variables import *
 from functions.functions_check_ready_files import *
-from utils import get_entity_mappings, load_yaml_config
+from functions.functions_ftp_pool import get_run_pool
+from functions.functions_ftp_manifest import get_run_manifest
+from functions.functions_upload_state import UploadState
+from functions.functions_ftp_backup import get_backup_strategy
+from functions.functions_s3_backup import get_s3_backup
+from functions.functions_archive_store import get_archive_store
+from utils import get_entity_mappings, load_yaml_config, file_digest
 
 # ------------------------------------------------------------------------------
 #                           FTP Configuration
@@ -29,29 +39,172 @@ def create_ftp_config(keys, is_fournisseur=True):
         config[key] = {
             "host": host,
             "user": user,
-            "password": password
+            "password": password,
+            "port": creds.get('port', 21)
         }
     return config
 
 
 # ------------------------------------------------------------------------------
-#                           Download File via FTP
+#                      Paramètres FTP (config/ftp_settings.yaml)
+# ------------------------------------------------------------------------------
+FTP_SETTINGS_DEFAULTS = {
+    'max_workers': 6,
+    'max_connections_per_host': 3,
+    'timeout': 30,
+    'incremental_sync': True,
+    'download_retries': 4,
+    'retry_backoff': 2,
+    'skip_unchanged_uploads': True,
+    'backup_mode': 'auto',
+    'backup_remote_dir': 'backup',
+    'backup_remote_keep': 7,
+    'upload_workers': 4,
+    'upload_retries': 3,
+    'upload_deadline': 600,
+}
+
+
+def load_ftp_settings():
+    """Charge config/ftp_settings.yaml en complétant avec les valeurs par défaut."""
+    settings = dict(FTP_SETTINGS_DEFAULTS)
+    settings.update(load_yaml_config(CONFIG / "ftp_settings.yaml") or {})
+    return settings
+
+
 # ------------------------------------------------------------------------------
-def download_file_from_ftp(ftp, remote_file, local_file):
+#        Exécution parallèle bornée (nombre de connexions par hôte limité)
+# ------------------------------------------------------------------------------
+def run_ftp_jobs(ftp_jobs, worker, settings=None, hold_host_slot=True, errors=None):
     """
-    Charger le fichier du serveur FTP ==> puis créer une copie localement
+    Exécute worker(name, config) pour chaque entrée de ftp_jobs dans un pool de threads.
+    Au plus `max_connections_per_host` workers travaillent en même temps sur un même hôte.
+    Args:
+        ftp_jobs: {'NAME': {'host': ..., 'user': ..., 'password': ...}, ...}
+        worker: fonction appelée par entité, doit gérer ses propres erreurs
+        hold_host_slot: si False, worker(name, config, host_slot) est appelé sans tenir le slot de
+            l'hôte ; il le prend lui-même (with host_slot:) le temps de chaque connexion
+        errors: dict optionnel, complété avec {'NAME': exception} pour chaque worker qui lève une
+            exception (son résultat vaut None) ; les autres entités sont traitées normalement
+    Returns:
+        {'NAME': résultat du worker} dans l'ordre de ftp_jobs
     """
+    if not ftp_jobs:
+        return {}
+    settings = settings or load_ftp_settings()
+    max_workers = max(1, int(settings.get('max_workers') or 1))
+    per_host = max(1, int(settings.get('max_connections_per_host') or 1))
+    host_slots = {config['host']: threading.BoundedSemaphore(per_host) for config in ftp_jobs.values()}
+
+    def _run(name, config):
+        try:
+            if not hold_host_slot:
+                return worker(name, config, host_slots[config['host']])
+            with host_slots[config['host']]:
+                return worker(name, config)
+        except Exception as e:
+            logger.error(f"-- ❌ --  Erreur FTP inattendue pour {name}: {e}")
+            if errors is not None:
+                errors[name] = e
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ftp_jobs)), thread_name_prefix="ftp") as executor:
+        futures = {name: executor.submit(_run, name, config) for name, config in ftp_jobs.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+# ------------------------------------------------------------------------------
+#                           Download File via FTP
+# ------------------------------------------------------------------------------
+def remote_file_size(ftp, remote_file):
+    """Taille du fichier distant (commande SIZE en mode binaire), None si non supportée."""
     try:
-        with open(local_file, "wb") as local_f:
-            ftp.retrbinary("RETR " + remote_file, local_f.write)
-        logger.info(f" -- ✅ --  Téléchargement terminé : {remote_file}")
-        return True
+        ftp.voidcmd("TYPE I")
+        return ftp.size(remote_file)
+    except all_errors:
+        return None
 
-    except Exception as e:
-        logger.error(f"-- ❌ --  Error de téléchargement: {remote_file}: {e}")
-        return False
+
+def download_file_from_ftp(ftp, remote_file, local_file, reconnect=None, expected_size=None):
+    """
+    Charger le fichier du serveur FTP ==> puis créer une copie localement.
+    Le transfert est écrit dans <local_file>.part ; si la connexion tombe, on se reconnecte
+    (reconnect() doit retourner un nouvel objet FTP) et on reprend à l'octet déjà reçu (REST).
+    Le fichier n'est renommé en local_file que si sa taille correspond au SIZE du serveur.
+    """
+    settings = load_ftp_settings()
+    retries = max(1, int(settings.get('download_retries') or 1))
+    backoff = float(settings.get('retry_backoff') or 0)
+    part_file = f"{local_file}.part"
+    if expected_size is None:
+        expected_size = remote_file_size(ftp, remote_file)
+    if os.path.exists(part_file):
+        os.remove(part_file)
+
+    for attempt in range(1, retries + 1):
+        offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+        try:
+            with open(part_file, "ab") as local_f:
+                ftp.retrbinary("RETR " + remote_file, local_f.write, rest=offset or None)
+            received = os.path.getsize(part_file)
+            if expected_size is not None and received != expected_size:
+                raise IOError(f"taille reçue {received} octets, attendue {expected_size}")
+            os.replace(part_file, local_file)
+            if offset:
+                logger.info(f" -- ✅ --  Téléchargement terminé : {remote_file} (repris à l'octet {offset})")
+            else:
+                logger.info(f" -- ✅ --  Téléchargement terminé : {remote_file}")
+            return True
+
+        except Exception as e:
+            received = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+            logger.warning(f"-- ⚠️ --  Transfert interrompu : {remote_file} (tentative {attempt}/{retries}, {received} octets reçus): {e}")
+            # REST refusé ou fichier plus gros qu'annoncé ==> on repart de zéro
+            if (isinstance(e, error_perm) and offset) or (expected_size is not None and received > expected_size):
+                open(part_file, "wb").close()
+            if attempt == retries:
+                break
+            time.sleep(backoff * 2 ** (attempt - 1))
+            if reconnect is not None:
+                try:
+                    ftp = reconnect()
+                except Exception as reconnect_err:
+                    logger.warning(f"-- ⚠️ --  Reconnexion impossible pour {remote_file}: {reconnect_err}")
+
+    if os.path.exists(part_file):
+        os.remove(part_file)
+    logger.error(f"-- ❌ --  Error de téléchargement: {remote_file} après {retries} tentatives")
+    return False
     
 
+# ------------------------------------------------------------------------------
+#        Téléchargement incrémental : SIZE/MDTM inchangés ==> cache local
+# ------------------------------------------------------------------------------
+def sync_file_from_ftp(ftp, remote_file, local_file, entity, manifest=None, reconnect=None):
+    """
+    Comme download_file_from_ftp, mais si SIZE et MDTM du fichier distant sont identiques
+    au dernier téléchargement, la copie de cache/ftp est utilisée au lieu de retélécharger.
+    entity: 'fournisseurs/<NOM>' ou 'plateformes/<NOM>'
+    """
+    if manifest is None:
+        return download_file_from_ftp(ftp, remote_file, local_file, reconnect=reconnect)
+    size, mdtm = manifest.remote_state(ftp, remote_file)
+    cached = manifest.lookup(entity, remote_file, size, mdtm)
+    if cached is not None:
+        try:
+            shutil.copyfile(cached, local_file)
+            manifest.mark(entity, changed=False)
+            logger.info(f" -- ♻️ --  Inchangé depuis le dernier run, servi depuis le cache : {remote_file}")
+            return True
+        except Exception as e:
+            logger.warning(f"-- ⚠️ --  Lecture du cache impossible pour {remote_file}, téléchargement complet: {e}")
+    success = download_file_from_ftp(ftp, remote_file, local_file, reconnect=reconnect, expected_size=size)
+    if success:
+        manifest.record(entity, remote_file, size, mdtm, local_file)
+        manifest.mark(entity, changed=True)
+    return success
+
+
 # ------------------------------------------------------------------------------
 #                 Fonction pour télécharger tous les fichiers FTP
 # ------------------------------------------------------------------------------
@@ -107,30 +260,23 @@ def download_files_from_all_servers(ftp_servers, output_dir):
 # ------------------------------------------------------------------------------
 #       Load all/few Fournisseurs/ platforms existed in env file             
 # ------------------------------------------------------------------------------
-def load_fournisseurs_ftp(list_fournisseurs, report_gen=None):
-    # Clean old downloaded files (>5h) before fetching new ones
+def _download_fournisseur(name, config, report_gen=None, timeout=None, manifest=None):
+    """
+    Télécharge le(s) fichier(s) d'un fournisseur.
+    Returns: chemin local, liste de chemins (multi_file) ou None
+    """
     try:
-        os.makedirs(DOSSIER_FOURNISSEURS, exist_ok=True)
-        delete_old_files(DOSSIER_FOURNISSEURS, max_age_hours=5, extensions=(".csv", ".xls", ".xlsx", ".txt"))
-    except Exception as _cleanup_err:
-        logger.warning(f"[WARNING]: Cleanup fournisseurs folder failed: {_cleanup_err}")
-    f_data_ftp = create_ftp_config(list_fournisseurs, is_fournisseur=True)
-    downloaded_files_F = {}
-    for name, config in f_data_ftp.items():
-        try:
-            # Check if this supplier is multi_file
-            _, _, multi_file = get_entity_mappings(name)
-            ftp = FTP(config["host"])
-            ftp.login(config["user"], config["password"])
+        # Check if this supplier is multi_file
+        _, _, multi_file = get_entity_mappings(name)
+        with get_run_pool().session(config["host"], config["user"], config["password"], port=config.get("port", 21), timeout=timeout) as session:
             logger.info(f"-- ✅ --  Bien connecté à l'FTP de {name}")
-            filenames = ftp.nlst()
+            filenames = session.ftp.nlst()
             valid_files = [f for f in filenames if f.endswith((".csv", ".xls", ".xlsx", ".txt"))]
             if multi_file:
                 local_paths = []
                 for ftp_file in valid_files:
-                    extension = os.path.splitext(ftp_file)[1]
                     local_path = os.path.join(DOSSIER_FOURNISSEURS, f"{name}-{ftp_file}")
-                    success = download_file_from_ftp(ftp, ftp_file, local_path)
+                    success = sync_file_from_ftp(session.ftp, ftp_file, local_path, f"fournisseurs/{name}", manifest, reconnect=session.reconnect)
                     if success:
                         local_paths.append(local_path)
                         if report_gen:
@@ -140,36 +286,108 @@ def load_fournisseurs_ftp(list_fournisseurs, report_gen=None):
                         if report_gen:
                             report_gen.add_file_result(local_path, success=False, error_msg=f"Échec du téléchargement pour {name}")
                 if local_paths:
-                    downloaded_files_F[name] = local_paths
-                else:
-                    logger.exception(f"-- ⚠️ --  Aucun fichier valide trouvé pour {name}")
-                    if report_gen:
-                        report_gen.add_file_result(f"Aucun fichier pour {name}", success=False, error_msg="Aucun fichier valide trouvé")
+                    return local_paths
             else:
                 ftp_file = next((f for f in valid_files), None)
                 if ftp_file:
                     extension = os.path.splitext(ftp_file)[1]
                     local_path = os.path.join(DOSSIER_FOURNISSEURS, f"{name}-{extension}")
-                    success = download_file_from_ftp(ftp, ftp_file, local_path)
+                    success = sync_file_from_ftp(session.ftp, ftp_file, local_path, f"fournisseurs/{name}", manifest, reconnect=session.reconnect)
                     if success:
-                        downloaded_files_F[name] = local_path
                         if report_gen:
                             report_gen.add_supplier_processed(name)
                             report_gen.add_file_result(local_path, success=True)
-                    else:
-                        if report_gen:
-                            report_gen.add_file_result(local_path, success=False, error_msg=f"Échec du téléchargement pour {name}")
-                else:
-                    logger.exception(f"-- ⚠️ --  Aucun fichier valide trouvé pour {name}")
+                        return local_path
                     if report_gen:
-                        report_gen.add_file_result(f"Aucun fichier pour {name}", success=False, error_msg="Aucun fichier valide trouvé")
-            ftp.quit()
-        except Exception as e:
-            logger.error(f"-- ❌ --  Erreur connexion FTP pour {name} : {e}")
+                        report_gen.add_file_result(local_path, success=False, error_msg=f"Échec du téléchargement pour {name}")
+                    return None
+            logger.exception(f"-- ⚠️ --  Aucun fichier valide trouvé pour {name}")
+            if report_gen:
+                report_gen.add_file_result(f"Aucun fichier pour {name}", success=False, error_msg="Aucun fichier valide trouvé")
+            return None
+    except Exception as e:
+        logger.error(f"-- ❌ --  Erreur connexion FTP pour {name} : {e}")
+        if report_gen:
+            report_gen.add_file_result(f"FTP {name}", success=False, error_msg=str(e))
+            report_gen.add_error(f"Erreur FTP fournisseur {name}: {e}")
+        return None
+
+
+def load_fournisseurs_ftp(list_fournisseurs, report_gen=None, on_ready=None):
+    """
+    Télécharge les fichiers des fournisseurs en parallèle.
+    on_ready: callback optionnel on_ready(name, chemin) appelé (depuis le thread de téléchargement)
+              dès que les fichiers d'un fournisseur sont disponibles localement.
+    """
+    # Clean old downloaded files (>5h) before fetching new ones
+    try:
+        os.makedirs(DOSSIER_FOURNISSEURS, exist_ok=True)
+        delete_old_files(DOSSIER_FOURNISSEURS, max_age_hours=5, extensions=(".csv", ".xls", ".xlsx", ".txt"))
+    except Exception as _cleanup_err:
+        logger.warning(f"[WARNING]: Cleanup fournisseurs folder failed: {_cleanup_err}")
+    f_data_ftp = create_ftp_config(list_fournisseurs, is_fournisseur=True)
+    settings = load_ftp_settings()
+    manifest = get_run_manifest() if settings.get('incremental_sync') else None
+
+    def _worker(name, config):
+        downloaded = _download_fournisseur(name, config, report_gen, timeout=settings.get('timeout'), manifest=manifest)
+        if downloaded and on_ready is not None:
+            on_ready(name, downloaded)
+        return downloaded
+
+    results = run_ftp_jobs(f_data_ftp, _worker, settings)
+    if manifest is not None:
+        manifest.save()
+    return {name: downloaded for name, downloaded in results.items() if downloaded}
+
+
+def select_platform_remote_file(filenames, name):
+    """
+    Choose platform file with priority: canonical (not platform-prefixed and not -latest),
+    then prefixed, then -latest, else any supported file.
+    """
+    supported_exts = (".csv", ".xls", ".xlsx", ".txt")
+    candidates = [f for f in filenames if f.lower().endswith(supported_exts)]
+    canonical = [f for f in candidates if (not f.lower().startswith(f"{name.lower()}-")) and ("-latest" not in f.lower())]
+    prefixed = [f for f in candidates if f.lower().startswith(f"{name.lower()}-") and ("-latest" not in f.lower())]
+    latests = [f for f in candidates if f.lower().startswith(f"{name.lower()}-latest")]
+    for group in (canonical, prefixed, latests, candidates):
+        if group:
+            return group[0], candidates
+    return None, candidates
+
+
+def _download_platform(name, config, report_gen=None, timeout=None, manifest=None):
+    """
+    Télécharge le fichier d'une plateforme.
+    Returns: chemin local ou None
+    """
+    try:
+        with get_run_pool().session(config["host"], config["user"], config["password"], port=config.get("port", 21), timeout=timeout) as session:
+            logger.info(f"-- ✅ --  Bien connecté à l'FTP de {name}")
+            filenames = session.ftp.nlst()
+            ftp_file, candidates = select_platform_remote_file(filenames, name)
+            if not ftp_file:
+                logger.exception(f"-- ⚠️ --  Aucun fichier valide trouvé pour {name}")
+                if report_gen:
+                    report_gen.add_file_result(f"Aucun fichier pour {name}", success=False, error_msg="Aucun fichier valide trouvé")
+                return None
+            extension = os.path.splitext(ftp_file)[1]
+            local_path = os.path.join(DOSSIER_PLATFORMS, f"{name}-{extension}")
+            success = sync_file_from_ftp(session.ftp, ftp_file, local_path, f"plateformes/{name}", manifest, reconnect=session.reconnect)
+            if not success:
+                logger.debug(f"[DEBUG]: Candidates on FTP for {name}: {candidates}")
+                return None
             if report_gen:
-                report_gen.add_file_result(f"FTP {name}", success=False, error_msg=str(e))
-                report_gen.add_error(f"Erreur FTP fournisseur {name}: {e}")
-    return downloaded_files_F
+                report_gen.add_platform_processed(name)
+                report_gen.add_file_result(local_path, success=True)
+            return local_path
+    except Exception as e:
+        logger.error(f"-- ❌ --  Erreur connexion FTP pour {name} : {e}")
+        if report_gen:
+            report_gen.add_file_result(f"FTP {name}", success=False, error_msg=str(e))
+            report_gen.add_error(f"Erreur FTP plateforme {name}: {e}")
+        return None
 
 
 def load_platforms_ftp(list_platforms, report_gen=None):
@@ -180,50 +398,16 @@ def load_platforms_ftp(list_platforms, report_gen=None):
     except Exception as _cleanup_err:
         logger.warning(f"[WARNING]: Cleanup platforms folder failed: {_cleanup_err}")
     p_data_ftp = create_ftp_config(list_platforms, is_fournisseur=False)
-    downloaded_files_P = {}
-    for name, config in p_data_ftp.items():
-        try:
-            ftp = FTP(config["host"])
-            ftp.login(config["user"], config["password"])
-            logger.info(f"-- ✅ --  Bien connecté à l'FTP de {name}")
-            filenames = ftp.nlst()
-            # Choose platform file with priority: canonical (not platform-prefixed and not -latest), then prefixed, then -latest, else any
-            supported_exts = (".csv", ".xls", ".xlsx", ".txt")
-            candidates = [f for f in filenames if f.lower().endswith(supported_exts)]
-            canonical = [f for f in candidates if (not f.lower().startswith(f"{name.lower()}-")) and ("-latest" not in f.lower())]
-            prefixed = [f for f in candidates if f.lower().startswith(f"{name.lower()}-") and ("-latest" not in f.lower())]
-            latests = [f for f in candidates if f.lower().startswith(f"{name.lower()}-latest")]
-            ftp_file = None
-            if canonical:
-                ftp_file = canonical[0]
-            elif prefixed:
-                ftp_file = prefixed[0]
-            elif latests:
-                ftp_file = latests[0]
-            elif candidates:
-                ftp_file = candidates[0]
-            if ftp_file:
-                extension = os.path.splitext(ftp_file)[1]
-                local_path = os.path.join(DOSSIER_PLATFORMS, f"{name}-{extension}")
-                success = download_file_from_ftp(ftp, ftp_file, local_path)
-                if success:
-                    downloaded_files_P[name] = local_path
-                    if report_gen:
-                        report_gen.add_platform_processed(name)
-                        report_gen.add_file_result(local_path, success=True)
-                else:
-                    logger.debug(f"[DEBUG]: Candidates on FTP for {name}: {candidates}")
-            else:
-                logger.exception(f"-- ⚠️ --  Aucun fichier valide trouvé pour {name}")
-                if report_gen:
-                    report_gen.add_file_result(f"Aucun fichier pour {name}", success=False, error_msg="Aucun fichier valide trouvé")
-            ftp.quit()
-        except Exception as e:
-            logger.error(f"-- ❌ --  Erreur connexion FTP pour {name} : {e}")
-            if report_gen:
-                report_gen.add_file_result(f"FTP {name}", success=False, error_msg=str(e))
-                report_gen.add_error(f"Erreur FTP plateforme {name}: {e}")
-    return downloaded_files_P
+    settings = load_ftp_settings()
+    manifest = get_run_manifest() if settings.get('incremental_sync') else None
+    results = run_ftp_jobs(
+        p_data_ftp,
+        lambda name, config: _download_platform(name, config, report_gen, timeout=settings.get('timeout'), manifest=manifest),
+        settings,
+    )
+    if manifest is not None:
+        manifest.save()
+    return {name: downloaded for name, downloaded in results.items() if downloaded}
 
 
 # ------------------------------------------------------------------------------
@@ -250,53 +434,84 @@ def find_latest_file_for_platform(platform_dir, platform_name):
     return None
 
 
-def upload_updated_files_to_marketplace(dry_run=False):
+def select_upload_target(platform_name, file_path, remote_candidates):
+    """
+    Nom du fichier distant à remplacer par file_path, parmi les fichiers supportés présents sur le serveur.
+    """
+    upload_ext = file_path.suffix.lower()
+    prefix = f"{platform_name.lower()}-"
+    # Build categorized lists
+    latest_candidates = [f for f in remote_candidates if f.lower().startswith(f"{prefix}latest") and f.lower().endswith(upload_ext)]
+    prefix_candidates = [f for f in remote_candidates if f.lower().startswith(prefix) and f not in latest_candidates and f.lower().endswith(upload_ext)]
+    # Canonical: any supported file that is NOT '-latest' and NOT starting with platform prefix
+    canonical_candidates = [f for f in remote_candidates if (not f.lower().startswith(prefix)) and ("-latest" not in f.lower()) and f.lower().endswith(upload_ext)]
+
+    # Priority 1: canonical file (likely marketplace original)
+    if canonical_candidates:
+        return canonical_candidates[0]
+    # Priority 2: prefixed file without '-latest'
+    if prefix_candidates:
+        return prefix_candidates[0]
+    # Priority 3: existing '-latest'
+    if latest_candidates:
+        return latest_candidates[0]
+    # Priority 4: any supported file
+    if remote_candidates:
+        return remote_candidates[0]
+    # Default to our latest file name
+    return file_path.name
+
+
+def is_obsolete_remote_file(platform_name, fname, supported_exts=('.csv', '.xls', '.xlsx', '.txt')):
+    """Ancien fichier de la plateforme ('<plateforme>-*' ou '*-latest*'), supprimé après un envoi réussi."""
+    lower_name = fname.lower()
+    return (lower_name.startswith(f"{platform_name.lower()}-") or '-latest' in lower_name) and lower_name.endswith(supported_exts)
+
+
+def upload_skip_reason(platform_name, host, digest, upload_state, report_gen=None):
+    """
+    Raison de ne pas envoyer le fichier d'une plateforme, None s'il faut l'envoyer :
+      - aucun stock modifié pendant ce run (report_gen) : le fichier distant a déjà ces valeurs
+      - contenu identique (sha256) au dernier fichier envoyé sur le même hôte (cache/uploads.json)
+    """
+    change_count = report_gen.platform_change_count(platform_name) if report_gen is not None else None
+    if change_count == 0:
+        return "aucun changement de stock"
+    if digest is not None and upload_state.is_unchanged(platform_name, digest, host):
+        return "contenu identique au dernier envoi"
+    return None
+
+
+def upload_updated_files_to_marketplace(dry_run=False, report_gen=None, force=False):
     """
     Uploads the <PLATFORM_NAME>-latest.csv file for each platform in UPDATED_FILES/fichiers_platforms/<PLATFORM_NAME>/ to its FTP server.
     If dry_run is True, only log actions without uploading.
+    Unless force is True (or skip_unchanged_uploads is false), platforms whose file is unchanged
+    (see upload_skip_reason) are skipped entirely: no backup download, no upload. Skips go to report_gen.
+    Platforms are uploaded in parallel (upload_workers, max_connections_per_host).
+    Returns:
+        {'PLATFORM': result} (see _upload_result), also passed to report_gen.add_upload_result
     """
-    import time
-    from ftplib import error_perm
     from dotenv import load_dotenv
     load_dotenv()
 
     upload_root = UPDATED_FILES_PATH
     if not upload_root.exists() or not upload_root.is_dir():
         logger.error(f"[ERROR]: Upload directory {upload_root} does not exist or is not a directory.")
-        return
+        return {}
 
     plateformes_creds = load_plateformes_config()
-    # Load optional S3 backup settings
-    s3_settings = load_yaml_config(CONFIG / "aws_backup.yaml") or {}
-    s3_enabled = bool(s3_settings.get("enabled", False))
-    s3_bucket = s3_settings.get("bucket")
-    s3_prefix = s3_settings.get("prefix", "backups/platforms")
-    s3_region = s3_settings.get("region")
-    s3_access_key = s3_settings.get("access_key_id")
-    s3_secret_key = s3_settings.get("secret_access_key")
-    s3_session_token = s3_settings.get("session_token")
-    s3_endpoint_url = s3_settings.get("endpoint_url")
-    s3_client = None
-    if s3_enabled and s3_bucket:
-        try:
-            import boto3  # type: ignore
-            client_kwargs = {}
-            if s3_region:
-                client_kwargs["region_name"] = s3_region
-            if s3_access_key and s3_secret_key:
-                client_kwargs["aws_access_key_id"] = s3_access_key
-                client_kwargs["aws_secret_access_key"] = s3_secret_key
-            if s3_session_token:
-                client_kwargs["aws_session_token"] = s3_session_token
-            if s3_endpoint_url:
-                client_kwargs["endpoint_url"] = s3_endpoint_url
-            s3_client = boto3.client("s3", **client_kwargs)
-            logger.info(f"[INFO]: S3 backup enabled. Bucket='{s3_bucket}', Prefix='{s3_prefix}'")
-        except Exception as e:
-            logger.error(f"[ERROR]: Failed to initialize S3 client: {e}")
-            s3_client = None
-    
-    for platform_dir in upload_root.iterdir():
+    ftp_settings = load_ftp_settings()
+    manifest = get_run_manifest() if ftp_settings.get('incremental_sync') else None
+    skip_unchanged = bool(ftp_settings.get('skip_unchanged_uploads')) and not force
+    upload_state = UploadState()
+    # Copie S3 optionnelle des sauvegardes (config/aws_backup.yaml), envoyée en arrière-plan
+    backup = get_backup_strategy(ftp_settings, s3_backup=get_s3_backup(), archive_store=get_archive_store())
+    logger.info(f"[INFO]: Remote files backup mode: {backup.mode}")
+
+    upload_jobs = {}
+    results = {}
+    for platform_dir in sorted(upload_root.iterdir()):
         if not platform_dir.is_dir():
             continue
         platform_name = platform_dir.name
@@ -310,122 +525,221 @@ def upload_updated_files_to_marketplace(dry_run=False):
         password = creds.get('password')
         if not all([host, user, password]):
             logger.error(f"[ERROR]: FTP credentials missing for {platform_name}. Skipping upload for {file_path.name}.")
+            results[platform_name] = _upload_result(platform_name, file_path, 'failed', error="FTP credentials missing")
             continue
+        try:
+            digest = file_digest(file_path)
+        except OSError as e:
+            logger.warning(f"[WARNING]: Could not hash {file_path.name}: {e}")
+            digest = None
+        if skip_unchanged:
+            skip_reason = upload_skip_reason(platform_name, host, digest, upload_state, report_gen)
+            if skip_reason:
+                logger.info(f"⚡ Envoi ignoré pour {platform_name} ({skip_reason}) : {file_path.name}")
+                if report_gen:
+                    report_gen.add_upload_skipped(platform_name, skip_reason)
+                results[platform_name] = _upload_result(platform_name, file_path, 'skipped', error=skip_reason)
+                continue
         logger.info(f"[INFO]: Preparing to upload {file_path.name} for {platform_name} to FTP.")
         if dry_run:
             logger.info(f"[DRY RUN]: Would upload {file_path} to FTP for {platform_name}.")
+            results[platform_name] = _upload_result(platform_name, file_path, 'dry_run')
             continue
-        success = False
-        for attempt in range(1, 4):  # 3 retries
+        upload_jobs[platform_name] = {
+            'host': host, 'user': user, 'password': password, 'port': creds.get('port', 21),
+            'file_path': file_path, 'digest': digest,
+        }
+
+    # Envois en parallèle : au plus upload_workers plateformes, max_connections_per_host par hôte
+    jobs_settings = dict(ftp_settings, max_workers=ftp_settings.get('upload_workers'))
+    context = {'settings': ftp_settings, 'backup': backup, 'manifest': manifest, 'upload_state': upload_state}
+    upload_errors = {}
+    results.update(run_ftp_jobs(
+        upload_jobs,
+        lambda name, job, host_slot: _upload_platform(name, job, host_slot, context),
+        jobs_settings,
+        hold_host_slot=False,
+        errors=upload_errors,
+    ))
+    for platform_name, e in upload_errors.items():
+        results[platform_name] = _upload_result(platform_name, upload_jobs[platform_name]['file_path'],
+                                                'failed', error=str(e))
+
+    for platform_name, result in results.items():
+        if result['status'] == 'failed':
+            upload_state.forget(platform_name)
+            if manifest is not None:
+                manifest.forget(f"plateformes/{platform_name}")
+        if report_gen and result['status'] != 'skipped':
+            report_gen.add_upload_result(result)
+    if not dry_run:
+        upload_state.save()
+    if manifest is not None:
+        manifest.save()
+    return results
+
+
+def _upload_result(platform_name, file_path, status, remote_file=None, attempts=0, duration=0.0, error=None):
+    """Résultat de l'envoi d'une plateforme (status: uploaded | failed | skipped | dry_run)."""
+    return {
+        'platform': platform_name,
+        'status': status,
+        'file': str(file_path),
+        'remote_file': remote_file,
+        'attempts': attempts,
+        'duration': round(duration, 1),
+        'error': error,
+    }
+
+
+def _restore_remote_files(platform_name, job, host_slot, settings, backup, timestamp, backed_up, temp_name):
+    """Envoi abandonné après la sauvegarde : remet en place les fichiers déplacés et supprime le .tmp."""
+    try:
+        with host_slot, get_run_pool().session(job['host'], job['user'], job['password'], port=job['port'],
+                                               timeout=settings.get('timeout')) as session:
+            backup.restore(session.ftp, platform_name, timestamp, backed_up)
             try:
-                with FTP(host) as ftp:  # type: ignore
-                    ftp.login(user, password)  # type: ignore
-                    from datetime import datetime
-                    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M')
-                    # Prepare local backup directory under project
-                    try:
-                        local_backup_dir = BACKUP_LOCAL_PATH / timestamp / platform_name
-                        local_backup_dir.mkdir(parents=True, exist_ok=True)
-                    except Exception as e:
-                        logger.warning(f"[WARNING]: Could not create local backup dir: {e}")
+                session.ftp.delete(temp_name)
+            except all_errors:
+                pass
+    except Exception as e:
+        logger.error(f"[ERROR]: Could not restore remote files for {platform_name} ({', '.join(backed_up)}): {e}")
+
 
-                    # Determine existing remote files and back them up (any supported ext)
-                    remote_candidates = []
-                    backed_up_count = 0
+def _upload_platform(platform_name, job, host_slot, context):
+    """
+    Envoie le fichier d'une plateforme (exécuté dans un thread de run_ftp_jobs).
+    La connexion à l'hôte (host_slot) n'est tenue que pendant une tentative : l'attente entre
+    deux tentatives (backoff exponentiel) ne bloque pas les autres plateformes du même hôte.
+    upload_deadline borne l'envoi entier : le timeout des sockets d'une tentative est limité au temps
+    restant, le transfert est interrompu dès que le délai est dépassé, et aucune nouvelle tentative
+    ne commence après ce délai.
+    """
+    from datetime import datetime, timezone
+
+    settings = context['settings']
+    backup = context['backup']
+    manifest = context['manifest']
+    upload_state = context['upload_state']
+    file_path = job['file_path']
+    digest = job['digest']
+    host = job['host']
+    retries = max(1, int(settings.get('upload_retries') or 1))
+    backoff = float(settings.get('retry_backoff') or 0)
+    deadline = float(settings.get('upload_deadline') or 0)
+    started = time.monotonic()
+
+    def _remaining():
+        return deadline - (time.monotonic() - started) if deadline else None
+
+    def _check_deadline(_block=None):
+        # Appelé après chaque bloc envoyé (storbinary) : un transfert lent ne dépasse pas le délai
+        if deadline and _remaining() <= 0:
+            raise TimeoutError(f"délai de {deadline:.0f} s dépassé pendant le transfert")
+
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+    supported_exts = ('.csv', '.xls', '.xlsx', '.txt')
+    target_remote_name = None
+    remote_candidates = []
+    backup_done = False  # une seule sauvegarde par plateforme, pas une par tentative
+    backed_up = []
+    published = False    # le nouveau fichier est en place sous target_remote_name
+    error = None
+    attempt = 0
+    for attempt in range(1, retries + 1):
+        timeout = settings.get('timeout')
+        if deadline:
+            timeout = min(float(timeout or deadline), max(_remaining(), 1.0))
+        try:
+            with host_slot, get_run_pool().session(host, job['user'], job['password'], port=job['port'],
+                                                   timeout=timeout) as session:
+                ftp = session.ftp
+                logger.info(f"[INFO]: Connected to FTP for {platform_name} (attempt {attempt}).")
+                if target_remote_name is None:
                     try:
                         filenames = ftp.nlst()
-                        supported_exts = ('.csv', '.xls', '.xlsx', '.txt')
                         remote_candidates = [f for f in filenames if f.lower().endswith(supported_exts)]
-                        for fname in remote_candidates:
-                            try:
-                                from io import BytesIO
-                                buf = BytesIO()
-                                ftp.retrbinary(f"RETR {fname}", buf.write)
-                                buf.seek(0)
-                                # 1) Always save a local backup copy in project backup folder
-                                try:
-                                    local_copy_path = local_backup_dir / fname  # type: ignore
-                                    with open(local_copy_path, 'wb') as lf:
-                                        lf.write(buf.getvalue())
-                                    backed_up_count += 1
-                                    logger.info(f"[INFO]: Local backup saved: {local_copy_path}")
-                                except Exception as e:
-                                    logger.warning(f"[WARNING]: Could not save local backup for '{fname}': {e}")
-                                # 2) Optional S3 backup
-                                if s3_client is not None:
-                                    s3_key = f"{s3_prefix}/{timestamp}/{platform_name}/{fname}"
-                                    s3_client.put_object(Bucket=s3_bucket, Key=s3_key, Body=buf.getvalue())
-                                    logger.info(f"[INFO]: Backed up remote file '{fname}' to s3://{s3_bucket}/{s3_key}")
-                            except Exception as e:
-                                logger.warning(f"[WARNING]: Failed to back up remote file '{fname}' for {platform_name}: {e}")
                     except Exception as e:
                         logger.warning(f"[WARNING]: Could not list remote files for {platform_name}: {e}")
-
+                    target_remote_name = select_upload_target(platform_name, file_path, remote_candidates)
+
+                # Nouveau fichier envoyé sous un nom temporaire, puis sauvegarde de l'ancien et remplacement :
+                # en mode rename, le fichier n'est absent du serveur qu'entre RNFR/RNTO et le rename final
+                temp_name = f"{target_remote_name}.tmp"
+                with open(file_path, "rb") as f:
+                    ftp.storbinary(f"STOR {temp_name}", f, callback=_check_deadline)
+
+                if not backup_done:
+                    # Seuls le fichier remplacé et ceux que le nettoyage supprime sont déplacés (mode rename) ;
+                    # les autres fichiers du dossier restent en place (copie téléchargée)
+                    replaced = [f for f in remote_candidates
+                                if f == target_remote_name or is_obsolete_remote_file(platform_name, f, supported_exts)]
+                    others = [f for f in remote_candidates if f not in replaced]
+                    backed_up = backup.backup(ftp, platform_name, timestamp, replaced, copy_files=others,
+                                              reconnect=session.reconnect)
+                    ftp = session.ftp  # nouvelle connexion si le téléchargement de sauvegarde a dû reconnecter
                     # If there were remote files and none were backed up, do not overwrite
-                    if len(remote_candidates) > 0 and backed_up_count == 0:
+                    if len(remote_candidates) > 0 and not backed_up:
                         logger.error(f"[ERROR]: Backup verification failed for {platform_name}. Aborting upload.")
+                        try:
+                            ftp.delete(temp_name)
+                        except all_errors:
+                            pass
                         raise Exception("Backup verification failed")
+                    backup_done = True
 
-                    # Choose the target remote filename to replace
-                    upload_ext = file_path.suffix.lower()
-                    target_remote_name = None
-                    # Build categorized lists
-                    latest_candidates = [f for f in remote_candidates if f.lower().startswith(f"{platform_name.lower()}-latest") and f.lower().endswith(upload_ext)]
-                    prefix_candidates = [f for f in remote_candidates if f.lower().startswith(f"{platform_name.lower()}-") and f not in latest_candidates and f.lower().endswith(upload_ext)]
-                    # Canonical: any supported file that is NOT '-latest' and NOT starting with platform prefix
-                    canonical_candidates = [f for f in remote_candidates if (not f.lower().startswith(f"{platform_name.lower()}-")) and ("-latest" not in f.lower()) and f.lower().endswith(upload_ext)]
-
-                    # Priority 1: canonical file (likely marketplace original)
-                    if canonical_candidates:
-                        target_remote_name = canonical_candidates[0]
-                    # Priority 2: prefixed file without '-latest'
-                    elif prefix_candidates:
-                        target_remote_name = prefix_candidates[0]
-                    # Priority 3: existing '-latest'
-                    elif latest_candidates:
-                        target_remote_name = latest_candidates[0]
-                    # Priority 4: any supported file
-                    elif remote_candidates:
-                        target_remote_name = remote_candidates[0]
-                    else:
-                        # Default to our latest file name
-                        target_remote_name = file_path.name
-
-                    # Proceed with upload using temp + rename for atomic replace
-                    logger.info(f"[INFO]: Connected to FTP for {platform_name} (attempt {attempt}).")
-                    temp_name = f"{target_remote_name}.tmp"
+                try:
+                    ftp.rename(temp_name, target_remote_name)
+                except Exception as e:
+                    logger.warning(f"[WARNING]: Atomic rename failed, attempting direct overwrite: {e}")
+                    _check_deadline()
                     with open(file_path, "rb") as f:
-                        ftp.storbinary(f"STOR {temp_name}", f)
-                    try:
-                        ftp.rename(temp_name, target_remote_name)
-                    except Exception as e:
-                        logger.warning(f"[WARNING]: Atomic rename failed, attempting direct overwrite: {e}")
-                        with open(file_path, "rb") as f:
-                            ftp.storbinary(f"STOR {target_remote_name}", f)
-
-                    logger.info(f"[INFO]: Uploaded and replaced file for {platform_name}: {target_remote_name}")
-
-                    # Cleanup: remove other old remote files for this platform to avoid duplicates
+                        ftp.storbinary(f"STOR {target_remote_name}", f, callback=_check_deadline)
                     try:
-                        filenames = ftp.nlst()
-                        for fname in filenames:
-                            if fname == target_remote_name:
-                                continue
-                            lower_name = fname.lower()
-                            # Remove '-latest' files and platform-prefixed variants
-                            if (lower_name.startswith(f"{platform_name.lower()}-") or '-latest' in lower_name) and lower_name.endswith(supported_exts):
-                                try:
-                                    ftp.delete(fname)
-                                    logger.info(f"[INFO]: Removed old remote file: {fname}")
-                                except Exception as e:
-                                    logger.warning(f"[WARNING]: Could not delete remote file '{fname}': {e}")
-                    except Exception as e:
-                        logger.warning(f"[WARNING]: Cleanup listing failed for {platform_name}: {e}")
-                    success = True
-                    break
-            except Exception as e:
-                logger.error(f"[ERROR]: Failed to upload file {file_path.name} to FTP for {platform_name} (attempt {attempt}): {e}")
-                time.sleep(2)  # Wait before retry
-        if not success and not dry_run:
-            logger.error(f"[ERROR]: Failed to upload file {file_path.name} to FTP for {platform_name} after 3 attempts.")
-
+                        ftp.delete(temp_name)
+                    except all_errors as e:
+                        logger.warning(f"[WARNING]: Could not delete temporary remote file '{temp_name}': {e}")
+                published = True
+
+                logger.info(f"[INFO]: Uploaded and replaced file for {platform_name}: {target_remote_name}")
+                if manifest is not None:
+                    # Le fichier publié devient la référence du prochain run (pas de retéléchargement)
+                    size, mdtm = manifest.remote_state(ftp, target_remote_name)
+                    manifest.record(f"plateformes/{platform_name}", target_remote_name, size, mdtm, file_path)
+                if digest is not None:
+                    upload_state.record(platform_name, digest, host, target_remote_name, file_path)
+
+                # Cleanup: remove other old remote files for this platform to avoid duplicates
+                try:
+                    filenames = ftp.nlst()
+                    for fname in filenames:
+                        if fname == target_remote_name:
+                            continue
+                        # Remove '-latest' files and platform-prefixed variants
+                        if is_obsolete_remote_file(platform_name, fname, supported_exts):
+                            try:
+                                ftp.delete(fname)
+                                logger.info(f"[INFO]: Removed old remote file: {fname}")
+                            except Exception as e:
+                                logger.warning(f"[WARNING]: Could not delete remote file '{fname}': {e}")
+                except Exception as e:
+                    logger.warning(f"[WARNING]: Cleanup listing failed for {platform_name}: {e}")
+                return _upload_result(platform_name, file_path, 'uploaded', target_remote_name,
+                                      attempt, time.monotonic() - started)
+        except Exception as e:
+            error = str(e)
+            logger.error(f"[ERROR]: Failed to upload file {file_path.name} to FTP for {platform_name} (attempt {attempt}): {e}")
+        if attempt == retries:
+            break
+        delay = backoff * 2 ** (attempt - 1)
+        if deadline and time.monotonic() - started + delay > deadline:
+            error = f"{error} (délai de {deadline:.0f} s dépassé)"
+            logger.error(f"[ERROR]: Upload deadline reached for {platform_name} after {attempt} attempt(s).")
+            break
+        time.sleep(delay)
+    logger.error(f"[ERROR]: Failed to upload file {file_path.name} to FTP for {platform_name} after {attempt} attempts.")
+    if backup_done and not published:
+        _restore_remote_files(platform_name, job, host_slot, settings, backup, timestamp, backed_up,
+                              f"{target_remote_name}.tmp")
+    return _upload_result(platform_name, file_path, 'failed', target_remote_name,
+                          attempt, time.monotonic() - started, error)
@@ -0,0 +1,290 @@
+import os
+import sys
+import gzip
+import json
+import shutil
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from config.logging_config import logger
+from config.config_path_variables import CONFIG, ARCHIVE_STORE_PATH, BACKUP_LOCAL_PATH
+from utils import load_yaml_config, file_digest, HASH_CHUNK_BYTES
+
+
+ARCHIVE_STORE_DEFAULTS = {
+    'archive_store': True,
+    'archive_keep_daily': 14,
+    'archive_keep_weekly': 8,
+}
+
+TIMESTAMP_FORMATS = ('%Y%m%d-%H%M%S', '%Y%m%d_%H%M%S', '%Y%m%d_%H%M', '%Y%m%d')
+
+
+# ------------------------------------------------------------------------------
+#   Archives et sauvegardes compressées, stockées une seule fois par contenu
+# ------------------------------------------------------------------------------
+class ArchiveStore:
+    """
+    Fichiers archivés (kind='archive' : <plateforme>-latest de chaque run) et sauvegardés
+    (kind='backup' : anciens fichiers distants) gzip-compressés et indexés par leur sha256 :
+    un contenu identique n'est stocké qu'une fois.
+
+        <root>/blobs/<2 premiers caractères>/<sha256>.gz
+        <root>/index.jsonl  une ligne par version : {'kind', 'platform', 'name', 'timestamp',
+                            'sha256', 'size', 'stored'}
+    L'index est en ajout seul (une ligne = un write) : les process workers peuvent archiver
+    en même temps ; il n'est réécrit que par apply_retention.
+    """
+
+    def __init__(self, root=ARCHIVE_STORE_PATH):
+        self.root = Path(root)
+        self.index_path = self.root / "index.jsonl"
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest):
+        return self.root / "blobs" / digest[:2] / f"{digest}.gz"
+
+    def entries(self, kind=None, platform=None, name=None):
+        """Versions de l'index (de la plus ancienne à la plus récente), filtrées si demandé."""
+        entries = []
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # ligne tronquée (arrêt pendant une écriture)
+                    if ((kind is None or entry.get('kind') == kind)
+                            and (platform is None or entry.get('platform') == platform)
+                            and (name is None or entry.get('name') == name)):
+                        entries.append(entry)
+        except FileNotFoundError:
+            pass
+        return sorted(entries, key=lambda e: e['timestamp'])
+
+    def _store_blob(self, file_path, digest):
+        blob = self.blob_path(digest)
+        if blob.exists():
+            return blob.stat().st_size
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = blob.with_name(f"{blob.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(file_path, 'rb') as src, gzip.open(tmp_path, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, HASH_CHUNK_BYTES)
+        os.replace(tmp_path, blob)
+        return blob.stat().st_size
+
+    def put_file(self, kind, platform, timestamp, file_path, name=None):
+        """
+        Archive file_path (version `timestamp` de <platform>/<name>).
+        Returns: True si une version a été ajoutée, False si le contenu est identique à la
+        dernière version de ce fichier (rien n'est écrit).
+        """
+        name = name or Path(file_path).name
+        digest = file_digest(file_path)
+        previous = self.entries(kind, platform, name)
+        if previous and previous[-1]['sha256'] == digest:
+            logger.info(f"🔁 Archive inchangée pour {platform}/{name} (identique à {previous[-1]['timestamp']})")
+            return False
+        stored = self._store_blob(file_path, digest)
+        entry = {
+            'kind': kind,
+            'platform': platform,
+            'name': name,
+            'timestamp': timestamp,
+            'sha256': digest,
+            'size': Path(file_path).stat().st_size,
+            'stored': stored,
+        }
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return True
+
+    def find(self, platform, name=None, kind='archive', timestamp=None):
+        """Dernière version de <platform>[/<name>] antérieure ou égale à timestamp (la plus récente sinon)."""
+        entries = [e for e in self.entries(kind, platform, name) if timestamp is None or e['timestamp'] <= timestamp]
+        return entries[-1] if entries else None
+
+    def restore(self, entry, target):
+        """Décompresse la version `entry` dans target (fichier ou dossier). Returns: chemin écrit."""
+        target = Path(target)
+        if target.is_dir():
+            target = target / entry['name']
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self.blob_path(entry['sha256']), 'rb') as src, open(target, 'wb') as dst:
+            shutil.copyfileobj(src, dst, HASH_CHUNK_BYTES)
+        return target
+
+    def apply_retention(self, keep_daily=14, keep_weekly=8):
+        """
+        Pour chaque fichier (kind, plateforme, nom) : garde la dernière version de chacun des
+        keep_daily derniers jours et de chacune des keep_weekly dernières semaines (ISO) ;
+        les autres versions sont retirées de l'index, puis les contenus orphelins supprimés.
+        Returns: (versions retirées, contenus supprimés)
+        """
+        with self._lock:
+            entries = self.entries()
+            groups = {}
+            for entry in entries:
+                groups.setdefault((entry['kind'], entry['platform'], entry['name']), []).append(entry)
+            kept = []
+            for versions in groups.values():
+                keep = set()
+                for period, count in ((_day, keep_daily), (_week, keep_weekly)):
+                    latest_by_period = {}
+                    for i, entry in enumerate(versions):
+                        latest_by_period[period(entry['timestamp'])] = i
+                    keep.update(sorted(latest_by_period.items())[-count:] if count > 0 else [])
+                keep = {i for _, i in keep}
+                kept.extend(v for i, v in enumerate(versions) if i in keep)
+            removed = len(entries) - len(kept)
+            if removed:
+                kept.sort(key=lambda e: e['timestamp'])
+                tmp_path = self.index_path.with_suffix('.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for entry in kept:
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                os.replace(tmp_path, self.index_path)
+            used = {e['sha256'] for e in kept}
+            deleted = 0
+            for blob in self.root.glob("blobs/*/*.gz"):
+                if blob.name[:-len('.gz')] not in used:
+                    blob.unlink(missing_ok=True)
+                    deleted += 1
+        if removed or deleted:
+            logger.info(f"🔁 Archives : {removed} version(s) retirée(s), {deleted} contenu(s) supprimé(s) "
+                        f"(rétention {keep_daily} jours / {keep_weekly} semaines)")
+        return removed, deleted
+
+
+def _parse_timestamp(timestamp):
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(timestamp, fmt)
+        except ValueError:
+            continue
+    return datetime.min
+
+
+def _day(timestamp):
+    return _parse_timestamp(timestamp).date().isoformat()
+
+
+def _week(timestamp):
+    year, week, _ = _parse_timestamp(timestamp).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def load_archive_settings():
+    """Options archive_* de config/processing_settings.yaml."""
+    settings = dict(ARCHIVE_STORE_DEFAULTS)
+    loaded = load_yaml_config(CONFIG / "processing_settings.yaml") or {}
+    settings.update({k: v for k, v in loaded.items() if k in ARCHIVE_STORE_DEFAULTS})
+    return settings
+
+
+_ARCHIVE_STORE = None
+_ARCHIVE_STORE_LOCK = threading.Lock()
+
+
+def get_archive_store():
+    """Magasin d'archives du process, ou None s'il est désactivé (archive_store: false)."""
+    global _ARCHIVE_STORE
+    with _ARCHIVE_STORE_LOCK:
+        if _ARCHIVE_STORE is None:
+            if not load_archive_settings().get('archive_store'):
+                return None
+            _ARCHIVE_STORE = ArchiveStore()
+        return _ARCHIVE_STORE
+
+
+def apply_archive_retention():
+    store = get_archive_store()
+    if store is None:
+        return None
+    settings = load_archive_settings()
+    try:
+        return store.apply_retention(int(settings['archive_keep_daily']), int(settings['archive_keep_weekly']))
+    except Exception as e:
+        logger.warning(f"-- ⚠️ --  Rétention des archives impossible: {e}")
+        return None
+
+
+def import_backup_folders(store, backup_root=BACKUP_LOCAL_PATH):
+    """
+    Range dans le magasin les anciennes sauvegardes en clair backup/<timestamp>/<plateforme>/<fichier>
+    puis les supprime. Returns: nombre de fichiers importés.
+    """
+    imported = 0
+    for ts_dir in sorted(Path(backup_root).iterdir()):
+        if not ts_dir.is_dir() or ts_dir.resolve() == store.root.resolve():
+            continue
+        for platform_dir in ts_dir.iterdir():
+            if not platform_dir.is_dir():
+                continue
+            for file_path in platform_dir.iterdir():
+                if file_path.is_file():
+                    store.put_file('backup', platform_dir.name, ts_dir.name, file_path)
+                    file_path.unlink()
+                    imported += 1
+            if not any(platform_dir.iterdir()):
+                platform_dir.rmdir()
+        if not any(ts_dir.iterdir()):
+            ts_dir.rmdir()
+    return imported
+
+
+# ------------------------------------------------------------------------------
+#   python -m functions.functions_archive_store [list | restore | prune | import-backups]
+# ------------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archives et sauvegardes des fichiers plateformes")
+    sub = parser.add_subparsers(dest="command")
+    list_cmd = sub.add_parser("list", help="Lister les versions archivées")
+    list_cmd.add_argument("--platform", default=None)
+    list_cmd.add_argument("--kind", choices=["archive", "backup"], default=None)
+    restore = sub.add_parser("restore", help="Restaurer une version")
+    restore.add_argument("platform")
+    restore.add_argument("--name", default=None, help="Nom du fichier (défaut: le plus récent de la plateforme)")
+    restore.add_argument("--kind", choices=["archive", "backup"], default="archive")
+    restore.add_argument("--at", default=None, help="Timestamp (ex: 20250101-120000) : dernière version à cette date")
+    restore.add_argument("--to", default=".", help="Fichier ou dossier de destination")
+    prune = sub.add_parser("prune", help="Appliquer la rétention")
+    prune.add_argument("--daily", type=int, default=None)
+    prune.add_argument("--weekly", type=int, default=None)
+    sub.add_parser("import-backups", help="Ranger les sauvegardes en clair de backup/ dans le magasin")
+    args = parser.parse_args(argv)
+
+    settings = load_archive_settings()
+    store = ArchiveStore()
+    command = args.command or "list"
+    if command == "restore":
+        entry = store.find(args.platform, args.name, args.kind, args.at)
+        if entry is None:
+            print(f"Aucune version trouvée pour {args.platform}")
+            return 1
+        print(f"{entry['timestamp']}  {entry['name']} -> {store.restore(entry, args.to)}")
+    elif command == "prune":
+        daily = settings['archive_keep_daily'] if args.daily is None else args.daily
+        weekly = settings['archive_keep_weekly'] if args.weekly is None else args.weekly
+        removed, deleted = store.apply_retention(int(daily), int(weekly))
+        print(f"{removed} version(s) retirée(s), {deleted} contenu(s) supprimé(s)")
+    elif command == "import-backups":
+        print(f"{import_backup_folders(store)} fichier(s) importé(s) dans {store.root}")
+    else:
+        entries = store.entries(getattr(args, 'kind', None), getattr(args, 'platform', None))
+        size = sum(e['size'] for e in entries)
+        stored = sum(p.stat().st_size for p in store.root.glob("blobs/*/*.gz"))
+        print(f"{store.root} : {len(entries)} version(s), {size / (1024 * 1024):.1f} Mo en clair, "
+              f"{stored / (1024 * 1024):.1f} Mo stockés")
+        for e in entries:
+            print(f"  {e['timestamp']:<16} {e['kind']:<8} {e['platform']:<20} {e['name']:<40} "
+                  f"{e['size'] / 1024:>10.1f} Ko  {e['sha256'][:12]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
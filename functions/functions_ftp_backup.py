@@ -0,0 +1,207 @@
+from ftplib import all_errors, error_perm
+from pathlib import Path
+
+from config.logging_config import logger
+from config.config_path_variables import BACKUP_LOCAL_PATH
+
+
+BACKUP_MODES = ('auto', 'rename', 'download')
+
+
+# ------------------------------------------------------------------------------
+#     Sauvegarde des fichiers distants d'une plateforme avant leur remplacement
+# ------------------------------------------------------------------------------
+class RenameBackup:
+    """
+    Déplace les anciens fichiers sur le serveur même (RNFR/RNTO) dans <remote_dir>/<plateforme>/<timestamp>/ :
+    aucun octet transféré. Les dossiers datés au-delà des `keep` plus récents sont supprimés.
+    Si le serveur refuse MKD/RNFR, la sauvegarde passe par `fallback` (DownloadBackup).
+    """
+
+    mode = 'rename'
+
+    def __init__(self, remote_dir='backup', keep=7, fallback=None):
+        self.remote_dir = str(remote_dir).strip('/') or 'backup'
+        self.keep = keep
+        self.fallback = fallback
+
+    def _make_dirs(self, ftp, path):
+        current = ''
+        for part in path.split('/'):
+            current = f"{current}/{part}" if current else part
+            try:
+                ftp.mkd(current)
+            except error_perm:
+                pass  # dossier déjà présent (ou refus : le rename le dira)
+
+    def _target_dir(self, platform_name, timestamp):
+        return f"{self.remote_dir}/{platform_name}/{timestamp}"
+
+    def backup(self, ftp, platform_name, timestamp, remote_files, copy_files=(), reconnect=None):
+        """
+        remote_files: fichiers remplacés ou supprimés par l'envoi, déplacés dans le dossier de sauvegarde
+        copy_files:   autres fichiers du dossier, laissés en place (copie téléchargée par `fallback`)
+        reconnect:    transmis à `fallback` (reprise du téléchargement après une coupure)
+        Returns: liste des fichiers sauvegardés.
+        """
+        target_dir = self._target_dir(platform_name, timestamp)
+        backed_up = []
+        try:
+            if remote_files:
+                self._make_dirs(ftp, target_dir)
+            for fname in remote_files:
+                ftp.rename(fname, f"{target_dir}/{fname}")
+                backed_up.append(fname)
+                logger.info(f"[INFO]: Remote backup (rename): {fname} -> {target_dir}/{fname}")
+        except all_errors as e:
+            remaining = [f for f in remote_files if f not in backed_up] + list(copy_files)
+            if self.fallback is None:
+                logger.warning(f"[WARNING]: Remote rename backup failed for {platform_name}: {e}")
+                return backed_up
+            logger.warning(f"[WARNING]: Remote rename backup not possible for {platform_name} ({e}), downloading instead.")
+            return backed_up + self.fallback.backup(ftp, platform_name, timestamp, remaining, reconnect=reconnect)
+        if copy_files and self.fallback is not None:
+            backed_up += self.fallback.backup(ftp, platform_name, timestamp, list(copy_files), reconnect=reconnect)
+        self.prune(ftp, platform_name)
+        return backed_up
+
+    def restore(self, ftp, platform_name, timestamp, remote_files):
+        """
+        Remet en place les fichiers déplacés par backup() (envoi abandonné) ; les fichiers
+        seulement téléchargés ne sont pas dans le dossier de sauvegarde et sont ignorés.
+        Returns: liste des fichiers remis en place.
+        """
+        target_dir = self._target_dir(platform_name, timestamp)
+        restored = []
+        try:
+            moved = {Path(f).name for f in ftp.nlst(target_dir)}
+        except all_errors as e:
+            logger.warning(f"[WARNING]: Could not list remote backup folder '{target_dir}': {e}")
+            return restored
+        for fname in remote_files:
+            if fname not in moved:
+                continue
+            try:
+                ftp.rename(f"{target_dir}/{fname}", fname)
+            except all_errors as e:
+                logger.warning(f"[WARNING]: Could not restore remote backup '{target_dir}/{fname}': {e}")
+                continue
+            restored.append(fname)
+            logger.info(f"[INFO]: Remote backup restored: {target_dir}/{fname} -> {fname}")
+        return restored
+
+    def prune(self, ftp, platform_name):
+        """Supprime les dossiers de sauvegarde datés les plus anciens de la plateforme (au-delà de keep)."""
+        if not self.keep or self.keep <= 0:
+            return
+        platform_dir = f"{self.remote_dir}/{platform_name}"
+        try:
+            dated = sorted(Path(d).name for d in ftp.nlst(platform_dir))
+        except all_errors:
+            return
+        dated = [d for d in dated if d not in ('.', '..')]
+        for old in dated[:-self.keep]:
+            old_dir = f"{platform_dir}/{old}"
+            try:
+                for fname in ftp.nlst(old_dir):
+                    name = Path(fname).name
+                    if name not in ('.', '..'):
+                        ftp.delete(f"{old_dir}/{name}")
+                ftp.rmd(old_dir)
+                logger.info(f"[INFO]: Removed old remote backup folder for {platform_name}: {old_dir}")
+            except all_errors as e:
+                logger.warning(f"[WARNING]: Could not remove old remote backup folder '{old_dir}': {e}")
+
+
+class DownloadBackup:
+    """
+    Télécharge les anciens fichiers directement sur disque dans backup/<timestamp>/<plateforme>/
+    (pas de copie en mémoire), puis les confie à s3_backup (S3BackupUploader, en arrière-plan) s'il est fourni.
+    Avec archive_store (ArchiveStore), la copie est rangée compressée dans le magasin et le fichier
+    en clair supprimé (après la copie S3, le cas échéant).
+    Pour les serveurs qui ne supportent pas le renommage.
+    """
+
+    mode = 'download'
+
+    def __init__(self, local_root=BACKUP_LOCAL_PATH, s3_backup=None, archive_store=None):
+        self.local_root = Path(local_root)
+        self.s3_backup = s3_backup
+        self.archive_store = archive_store
+
+    def backup(self, ftp, platform_name, timestamp, remote_files, copy_files=(), reconnect=None):
+        """
+        Télécharge remote_files et copy_files (rien n'est déplacé).
+        reconnect: retourne un nouvel objet FTP après une coupure (reprise REST, puis fichiers suivants)
+        Returns: liste des fichiers sauvegardés.
+        """
+        # Import local : functions_FTP importe ce module
+        from functions.functions_FTP import download_file_from_ftp
+
+        def _reconnect():
+            nonlocal ftp
+            ftp = reconnect()
+            return ftp
+
+        backed_up = []
+        local_dir = self.local_root / timestamp / platform_name
+        try:
+            local_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"[WARNING]: Could not create local backup dir: {e}")
+            return backed_up
+        for fname in [*remote_files, *copy_files]:
+            local_path = local_dir / fname
+            try:
+                if not download_file_from_ftp(ftp, fname, str(local_path),
+                                              reconnect=_reconnect if reconnect is not None else None):
+                    raise IOError("download failed")
+            except Exception as e:
+                logger.warning(f"[WARNING]: Failed to back up remote file '{fname}' for {platform_name}: {e}")
+                continue
+            backed_up.append(fname)
+            logger.info(f"[INFO]: Local backup saved: {local_path}")
+            remove_plain = False
+            if self.archive_store is not None:
+                try:
+                    self.archive_store.put_file('backup', platform_name, timestamp, local_path)
+                    remove_plain = True
+                except OSError as e:
+                    logger.warning(f"[WARNING]: Could not store backup '{fname}' for {platform_name}: {e}")
+            if self.s3_backup is not None:
+                self.s3_backup.submit(local_path, f"{timestamp}/{platform_name}/{fname}", remove_after=remove_plain)
+            elif remove_plain:
+                local_path.unlink(missing_ok=True)
+        for folder in (local_dir, local_dir.parent):
+            try:
+                folder.rmdir()  # seulement si vide (tout est dans le magasin) ; avec S3, vidé par close_s3_backup
+            except OSError:
+                break
+        return backed_up
+
+    def restore(self, ftp, platform_name, timestamp, remote_files):
+        """Rien à remettre en place : les fichiers distants n'ont pas été déplacés."""
+        return []
+
+
+def get_backup_strategy(settings, s3_backup=None, archive_store=None):
+    """
+    Stratégie de sauvegarde selon ftp_settings.yaml (backup_mode) :
+        rename   : déplacement sur le serveur, téléchargement si le serveur refuse
+        download : téléchargement sur disque (+ copie S3 si activée)
+        auto     : download si la sauvegarde S3 est activée (il faut les octets), sinon rename
+    """
+    mode = str(settings.get('backup_mode') or 'auto').lower()
+    if mode not in BACKUP_MODES:
+        logger.warning(f"-- ⚠️ --  backup_mode '{mode}' inconnu, 'auto' utilisé")
+        mode = 'auto'
+    if mode == 'auto':
+        mode = 'download' if s3_backup is not None else 'rename'
+    download = DownloadBackup(s3_backup=s3_backup, archive_store=archive_store)
+    if mode == 'download':
+        return download
+    return RenameBackup(
+        remote_dir=settings.get('backup_remote_dir') or 'backup',
+        keep=int(settings.get('backup_remote_keep') or 0),
+        fallback=download,
+    )
@@ -0,0 +1,146 @@
+import json
+import shutil
+import threading
+from datetime import datetime
+from ftplib import all_errors
+from pathlib import Path
+
+from config.logging_config import logger
+from config.config_path_variables import FTP_CACHE_PATH
+
+
+# ------------------------------------------------------------------------------
+#        Manifeste de synchronisation FTP (SIZE / MDTM par fichier distant)
+# ------------------------------------------------------------------------------
+class SyncManifest:
+    """
+    Mémorise, pour chaque entité (fournisseur/plateforme) et chaque fichier distant,
+    la taille (SIZE) et la date de modification (MDTM) vues au dernier téléchargement,
+    ainsi qu'une copie locale du fichier dans cache/ftp.
+
+    Structure de manifest.json:
+        {'complete': bool,
+         'entities': {'fournisseurs/NTY': {'AJS.csv': {'size': 123, 'mdtm': '20250101120000',
+                                                       'cache': 'fournisseurs/NTY/AJS.csv',
+                                                       'synced_at': '...'}}}}
+    """
+
+    def __init__(self, cache_dir=FTP_CACHE_PATH):
+        self.cache_dir = Path(cache_dir)
+        self.path = self.cache_dir / "manifest.json"
+        self._lock = threading.Lock()
+        self.entities = {}
+        self.was_complete = False
+        self.changed = set()
+        self.unchanged = set()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.entities = data.get('entities', {})
+            self.was_complete = bool(data.get('complete', False))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"-- ⚠️ --  Manifeste FTP illisible, il sera reconstruit: {e}")
+
+    def save(self, complete=False):
+        with self._lock:
+            data = {'complete': complete, 'entities': self.entities}
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix('.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=1)
+                tmp_path.replace(self.path)
+            except Exception as e:
+                logger.warning(f"-- ⚠️ --  Impossible d'enregistrer le manifeste FTP: {e}")
+
+    def mark_complete(self):
+        """A appeler quand le run a mis à jour et publié toutes les plateformes."""
+        self.save(complete=True)
+
+    @staticmethod
+    def remote_state(ftp, remote_file):
+        """Retourne (size, mdtm) du fichier distant ; None pour ce que le serveur ne supporte pas."""
+        size = mdtm = None
+        try:
+            ftp.voidcmd("TYPE I")
+            size = ftp.size(remote_file)
+        except all_errors:
+            pass
+        try:
+            mdtm = ftp.voidcmd(f"MDTM {remote_file}")[4:].strip() or None
+        except all_errors:
+            pass
+        return size, mdtm
+
+    def lookup(self, entity, remote_file, size, mdtm):
+        """Chemin du fichier en cache si SIZE et MDTM sont identiques au dernier run, sinon None."""
+        if mdtm is None or size is None:
+            return None
+        with self._lock:
+            entry = self.entities.get(entity, {}).get(remote_file)
+        if not entry or entry.get('size') != size or entry.get('mdtm') != mdtm:
+            return None
+        cached = self.cache_dir / entry.get('cache', '')
+        if not cached.is_file() or cached.stat().st_size != size:
+            return None
+        return cached
+
+    def record(self, entity, remote_file, size, mdtm, local_file):
+        """Copie local_file dans le cache et enregistre son état distant."""
+        rel_path = Path(*entity.split('/')) / remote_file
+        cached = self.cache_dir / rel_path
+        try:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(local_file, cached)
+        except Exception as e:
+            logger.warning(f"-- ⚠️ --  Mise en cache impossible pour {remote_file}: {e}")
+            return
+        with self._lock:
+            self.entities.setdefault(entity, {})[remote_file] = {
+                'size': size,
+                'mdtm': mdtm,
+                'cache': rel_path.as_posix(),
+                'synced_at': datetime.now().isoformat(timespec='seconds'),
+            }
+
+    def forget(self, entity):
+        """Oublie une entité : son prochain fichier sera considéré comme modifié."""
+        with self._lock:
+            self.entities.pop(entity, None)
+
+    def mark(self, entity, changed):
+        with self._lock:
+            if changed:
+                self.changed.add(entity)
+                self.unchanged.discard(entity)
+            elif entity not in self.changed:
+                self.unchanged.add(entity)
+
+    def nothing_changed(self):
+        """True si le dernier run s'est terminé et qu'aucun fichier d'entrée n'a changé depuis."""
+        return self.was_complete and not self.changed and bool(self.unchanged)
+
+
+_RUN_MANIFEST = None
+_RUN_MANIFEST_LOCK = threading.Lock()
+
+
+def get_run_manifest():
+    """Manifeste partagé par toutes les étapes FTP du run en cours."""
+    global _RUN_MANIFEST
+    with _RUN_MANIFEST_LOCK:
+        if _RUN_MANIFEST is None:
+            _RUN_MANIFEST = SyncManifest()
+        return _RUN_MANIFEST
+
+
+def reset_run_manifest():
+    """Oublie le manifeste du run (le prochain get_run_manifest() le relit depuis le disque)."""
+    global _RUN_MANIFEST
+    with _RUN_MANIFEST_LOCK:
+        _RUN_MANIFEST = None
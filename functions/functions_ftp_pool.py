@@ -0,0 +1,166 @@
+import atexit
+import threading
+from contextlib import contextmanager
+from ftplib import FTP, all_errors
+
+from config.logging_config import logger
+
+
+# ------------------------------------------------------------------------------
+#                  Session FTP (connexion déjà authentifiée)
+# ------------------------------------------------------------------------------
+class FTPSession:
+    """
+    Connexion FTP authentifiée, identifiée par (host, port, user).
+    `ftp` est l'objet ftplib.FTP à utiliser ; `reconnect()` en ouvre un nouveau
+    avec les mêmes identifiants (utile après une coupure en cours de transfert).
+    """
+
+    def __init__(self, key, password, timeout=None):
+        self.key = key
+        self.timeout = timeout
+        self._password = password
+        self.ftp = None
+
+    def connect(self):
+        host, port, user = self.key
+        ftp = FTP()
+        ftp.connect(host=host, port=port, timeout=self.timeout)
+        ftp.login(user=user, passwd=self._password)
+        self.ftp = ftp
+        return ftp
+
+    def set_timeout(self, timeout):
+        """Applique timeout à la connexion de contrôle et aux prochaines connexions de données."""
+        self.timeout = timeout
+        if self.ftp is None:
+            return
+        self.ftp.timeout = timeout
+        if getattr(self.ftp, 'sock', None) is not None:
+            self.ftp.sock.settimeout(timeout)
+
+    def reconnect(self):
+        self.close()
+        logger.info(f"-- 🔄 --  Reconnexion FTP {self.key[2]}@{self.key[0]}")
+        return self.connect()
+
+    def is_alive(self):
+        if self.ftp is None:
+            return False
+        try:
+            self.ftp.voidcmd("NOOP")
+            return True
+        except all_errors:
+            return False
+
+    def close(self):
+        if self.ftp is None:
+            return
+        try:
+            self.ftp.quit()
+        except all_errors:
+            try:
+                self.ftp.close()
+            except all_errors:
+                pass
+        self.ftp = None
+
+
+# ------------------------------------------------------------------------------
+#          Pool de sessions FTP partagé pendant une exécution (run)
+# ------------------------------------------------------------------------------
+class FTPSessionPool:
+    """
+    Réutilise les connexions FTP authentifiées entre les phases d'un run
+    (validation, téléchargement, upload). Une session inactive est vérifiée
+    par NOOP avant d'être rendue ; si elle est morte, une nouvelle connexion
+    est ouverte de façon transparente.
+    """
+
+    def __init__(self, timeout=30, max_idle_per_key=3):
+        self.timeout = timeout
+        self.max_idle_per_key = max_idle_per_key
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.stats = {'opened': 0, 'reused': 0}
+
+    @contextmanager
+    def session(self, host, user, password, port=21, timeout=None):
+        """
+        with pool.session(host, user, password) as session:
+            session.ftp.nlst()
+        La session est rendue au pool si le bloc se termine sans erreur, fermée sinon.
+        """
+        key = (host, int(port or 21), user)
+        session = self._checkout(key, password, timeout if timeout is not None else self.timeout)
+        reusable = False
+        try:
+            yield session
+            reusable = True
+        finally:
+            self._checkin(session, reusable)
+
+    def _checkout(self, key, password, timeout):
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                session = idle.pop() if idle else None
+            if session is None:
+                break
+            if session.is_alive():
+                session.set_timeout(timeout)  # timeout de l'appelant, pas celui de la session d'origine
+                self._count('reused')
+                logger.debug(f"[DEBUG]: Session FTP réutilisée pour {key[2]}@{key[0]}")
+                return session
+            session.close()
+        session = FTPSession(key, password, timeout)
+        session.connect()
+        self._count('opened')
+        return session
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _checkin(self, session, reusable):
+        if reusable and session.ftp is not None:
+            with self._lock:
+                idle = self._idle.setdefault(session.key, [])
+                if len(idle) < self.max_idle_per_key:
+                    idle.append(session)
+                    return
+        session.close()
+
+    def close_all(self):
+        with self._lock:
+            sessions = [s for idle in self._idle.values() for s in idle]
+            self._idle.clear()
+        for session in sessions:
+            session.close()
+        if sessions or self.stats['opened']:
+            logger.info(f"-- 🔌 --  Pool FTP fermé (connexions ouvertes: {self.stats['opened']}, réutilisées: {self.stats['reused']})")
+
+
+_RUN_POOL = None
+_RUN_POOL_LOCK = threading.Lock()
+
+
+def get_run_pool():
+    """Retourne le pool FTP de l'exécution en cours (créé à la première utilisation)."""
+    global _RUN_POOL
+    with _RUN_POOL_LOCK:
+        if _RUN_POOL is None:
+            _RUN_POOL = FTPSessionPool()
+        return _RUN_POOL
+
+
+def close_run_pool():
+    """Ferme toutes les sessions du run ; le prochain get_run_pool() repart de zéro."""
+    global _RUN_POOL
+    with _RUN_POOL_LOCK:
+        pool, _RUN_POOL = _RUN_POOL, None
+    if pool is not None:
+        pool.close_all()
+
+
+atexit.register(close_run_pool)
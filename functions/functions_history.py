@@ -0,0 +1,212 @@
+import sys
+import sqlite3
+import argparse
+import threading
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from config.logging_config import logger
+from config.config_path_variables import CONFIG, HISTORY_DB_PATH
+from utils import load_yaml_config
+
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_ts      TEXT NOT NULL,
+    duration_s  REAL,
+    status      TEXT,
+    n_changes   INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS stock_changes (
+    run_id       INTEGER NOT NULL REFERENCES runs(run_id),
+    run_ts       TEXT NOT NULL,
+    platform     TEXT NOT NULL,
+    product_id   TEXT NOT NULL,
+    old_quantity INTEGER,
+    new_quantity INTEGER
+);
+CREATE TABLE IF NOT EXISTS supplier_stock (
+    run_id      INTEGER NOT NULL REFERENCES runs(run_id),
+    run_ts      TEXT NOT NULL,
+    platform    TEXT NOT NULL,
+    product_id  TEXT NOT NULL,
+    supplier    TEXT NOT NULL,
+    quantity    INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_changes_platform_product_ts ON stock_changes (platform, product_id, run_ts);
+CREATE INDEX IF NOT EXISTS idx_changes_product_ts ON stock_changes (product_id, run_ts);
+CREATE INDEX IF NOT EXISTS idx_supplier_stock_supplier_ts ON supplier_stock (supplier, run_ts);
+CREATE INDEX IF NOT EXISTS idx_supplier_stock_platform_ts ON supplier_stock (platform, run_ts);
+"""
+
+
+# ------------------------------------------------------------------------------
+#          Historique des changements de stock (SQLite, un ajout par run)
+# ------------------------------------------------------------------------------
+class StockHistory:
+    """
+    Base SQLite history/stock_history.db :
+        runs            un run par ligne (date, durée, statut, nombre de changements)
+        stock_changes   les changements de stock du run (plateforme, produit, ancien, nouveau)
+        supplier_stock  stock de chaque fournisseur pour les produits modifiés (contributions)
+    Chaque run est ajouté en une seule transaction (executemany).
+    """
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(HISTORY_SCHEMA)
+        return conn
+
+    def record_run(self, run_ts, changes, matrix=None, duration=None, status=None):
+        """
+        changes: DataFrame[product_id, old_quantity, new_quantity, platform] (stats['stock_changes'])
+        matrix:  SupplierStockMatrix du run (stock par fournisseur), optionnel
+        Returns: run_id
+        """
+        changes = changes[changes['platform'].fillna('') != ''].reset_index(drop=True)
+        change_rows = list(zip(
+            changes['platform'].astype(str),
+            changes['product_id'].astype(str),
+            _int_values(changes['old_quantity']),
+            _int_values(changes['new_quantity']),
+        ))
+        supplier_rows = []
+        if matrix is not None and len(changes):
+            supplier_frame = matrix.to_frame(changes['product_id'])
+            for column in supplier_frame.columns:
+                supplier = column[len('stock_'):]
+                values = supplier_frame[column]
+                present = values.notna() & (values != 0)
+                supplier_rows.extend(zip(
+                    changes['platform'][present].astype(str),
+                    changes['product_id'][present].astype(str),
+                    [supplier] * int(present.sum()),
+                    values[present].astype('int64').tolist(),
+                ))
+        with self._lock, closing(self.connect()) as conn:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO runs (run_ts, duration_s, status, n_changes) VALUES (?, ?, ?, ?)",
+                    (run_ts, duration, status, len(change_rows)),
+                )
+                run_id = cursor.lastrowid
+                conn.executemany(
+                    "INSERT INTO stock_changes (run_id, run_ts, platform, product_id, old_quantity, new_quantity) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    ((run_id, run_ts, *row) for row in change_rows),
+                )
+                conn.executemany(
+                    "INSERT INTO supplier_stock (run_id, run_ts, platform, product_id, supplier, quantity) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    ((run_id, run_ts, *row) for row in supplier_rows),
+                )
+        return run_id
+
+    def query(self, sql, params=()):
+        """Lecture seule (query_only) : utilisable pour les requêtes libres de la ligne de commande."""
+        with self._lock, closing(self.connect()) as conn:
+            conn.execute("PRAGMA query_only=ON")
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def product_history(self, product_id, platform=None):
+        """Stock d'un produit au fil des runs (uniquement les runs où il a changé)."""
+        sql = ("SELECT run_ts, platform, old_quantity, new_quantity FROM stock_changes "
+               "WHERE product_id = ?")
+        params = [product_id]
+        if platform:
+            sql += " AND platform = ?"
+            params.append(platform)
+        return self.query(sql + " ORDER BY run_ts, platform", params)
+
+    def supplier_trends(self, platform=None, since=None):
+        """Par run et par fournisseur : quantité totale et nombre d'articles des produits modifiés."""
+        sql = ("SELECT run_ts, supplier, SUM(quantity) AS total_quantity, COUNT(*) AS articles "
+               "FROM supplier_stock WHERE 1 = 1")
+        params = []
+        if platform:
+            sql += " AND platform = ?"
+            params.append(platform)
+        if since:
+            sql += " AND run_ts >= ?"
+            params.append(since)
+        return self.query(sql + " GROUP BY run_ts, supplier ORDER BY run_ts, supplier", params)
+
+    def runs(self, limit=20):
+        return self.query("SELECT run_id, run_ts, duration_s, status, n_changes FROM runs "
+                          "ORDER BY run_ts DESC LIMIT ?", (limit,))
+
+
+def _int_values(series):
+    return [None if pd.isna(v) else int(v) for v in series]
+
+
+def record_run_history(report_gen):
+    """Ajoute les changements du run à l'historique (history_db: true dans report_settings.yaml)."""
+    settings = load_yaml_config(CONFIG / "report_settings.yaml") or {}
+    if not settings.get('history_db', True):
+        return None
+    stats = report_gen.stats
+    started = report_gen.start_time or datetime.now().timestamp()
+    duration = report_gen.end_time - started if report_gen.end_time else None
+    status = 'success' if not stats['errors'] and not stats['files_failed'] else 'failure'
+    try:
+        run_id = StockHistory().record_run(
+            datetime.fromtimestamp(started).strftime('%Y-%m-%d %H:%M:%S'),
+            stats['stock_changes'], stats.get('supplier_matrix'), duration, status,
+        )
+        logger.info(f"-- ✅ --  Historique des stocks : run {run_id} ({len(stats['stock_changes'])} changements)")
+        return run_id
+    except Exception as e:
+        logger.warning(f"-- ⚠️ --  Historique des stocks non enregistré: {e}")
+        return None
+
+
+# ------------------------------------------------------------------------------
+#   python -m functions.functions_history [runs | product <id> | suppliers | sql "<requête>"]
+# ------------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Historique des changements de stock")
+    sub = parser.add_subparsers(dest="command")
+    runs = sub.add_parser("runs", help="Derniers runs")
+    runs.add_argument("--limit", type=int, default=20)
+    product = sub.add_parser("product", help="Stock d'un produit au fil des runs")
+    product.add_argument("product_id", help="ID produit canonique (tel qu'affiché dans les rapports)")
+    product.add_argument("--platform", default=None)
+    suppliers = sub.add_parser("suppliers", help="Contribution des fournisseurs par run")
+    suppliers.add_argument("--platform", default=None)
+    suppliers.add_argument("--since", default=None, help="Date de début (ex: 2025-01-01)")
+    sql = sub.add_parser("sql", help="Requête SQL libre (lecture seule)")
+    sql.add_argument("query")
+    for cmd in (runs, product, suppliers, sql):
+        cmd.add_argument("--csv", default=None, help="Exporter le résultat dans ce fichier CSV")
+    args = parser.parse_args(argv)
+
+    history = StockHistory()
+    command = args.command or "runs"
+    if command == "product":
+        result = history.product_history(args.product_id, args.platform)
+    elif command == "suppliers":
+        result = history.supplier_trends(args.platform, args.since)
+    elif command == "sql":
+        result = history.query(args.query)
+    else:
+        result = history.runs(getattr(args, 'limit', 20))
+    if getattr(args, 'csv', None):
+        result.to_csv(args.csv, index=False)
+        print(f"{len(result)} ligne(s) exportée(s) dans {args.csv}")
+    else:
+        print(result.to_string(index=False) if len(result) else "Aucun résultat")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
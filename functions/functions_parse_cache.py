@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config.logging_config import logger
+from config.config_path_variables import CONFIG, PARSE_CACHE_PATH
+from utils import load_yaml_config, file_digest
+
+
+# Incrémenter quand le contenu des tableaux mis en cache change (lecture, normalisation, ...)
+PARSE_CACHE_VERSION = 1
+
+PARSE_CACHE_DEFAULTS = {
+    'parse_cache': True,
+    'parse_cache_max_mb': 512,
+}
+
+
+# ------------------------------------------------------------------------------
+#     Cache des tableaux lus, indexé par le contenu du fichier (sha256)
+# ------------------------------------------------------------------------------
+class ParseCache:
+    """
+    Tableaux déjà lus (fournisseur réduit ID_Product/Quantity, plateforme complète),
+    indexés par le hash du fichier source et les paramètres de lecture : un fichier
+    identique octet pour octet à celui d'un run précédent n'est pas relu.
+
+    Une entrée = deux fichiers dans cache/frames :
+        <clé>.parquet ou <clé>.pkl : le DataFrame (Parquet si pyarrow est installé, sinon pickle)
+        <clé>.json                 : {'format', 'meta' (sep, encoding, ...), 'source', 'created'}
+    Pas d'index central : plusieurs process peuvent lire/écrire en même temps.
+    La date de modification du .json sert de date de dernier accès (éviction LRU).
+    """
+
+    def __init__(self, cache_dir=PARSE_CACHE_PATH, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def key_for(self, file_path, params) -> str:
+        """Clé = hash du contenu + paramètres de lecture (colonnes mappées, entête, ...)."""
+        params_json = json.dumps([PARSE_CACHE_VERSION, params], sort_keys=True, default=str)
+        params_hash = hashlib.sha256(params_json.encode('utf-8')).hexdigest()[:16]
+        return f"{file_digest(file_path)[:40]}-{params_hash}"
+
+    def _meta_path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key):
+        """(DataFrame, meta) si la clé est en cache, sinon None."""
+        meta_path = self._meta_path(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            data_path = self.cache_dir / entry['file']
+            if entry['format'] == 'parquet':
+                df = pd.read_parquet(data_path)
+            else:
+                df = pd.read_pickle(data_path)
+            df.attrs.update(entry.get('attrs', {}))
+            os.utime(meta_path)  # dernier accès (LRU)
+            return df, entry.get('meta', {})
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"-- ⚠️ --  Entrée du cache de lecture illisible ({key}), elle sera recréée: {e}")
+            self.remove(key)
+            return None
+
+    def put(self, key, df, meta=None, source=None):
+        """Enregistre df (+ meta JSON) puis applique la limite de taille."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fmt = 'parquet' if _parquet_available() else 'pickle'
+            data_path = self.cache_dir / f"{key}.{'parquet' if fmt == 'parquet' else 'pkl'}"
+            tmp_path = data_path.with_name(f"{data_path.name}.{os.getpid()}.tmp")
+            try:
+                if fmt == 'parquet':
+                    df.to_parquet(tmp_path, index=True)
+                else:
+                    df.to_pickle(tmp_path)
+            except Exception:
+                # Colonnes non supportées par Parquet (types mélangés) : pickle pour cette entrée
+                fmt = 'pickle'
+                data_path = self.cache_dir / f"{key}.pkl"
+                df.to_pickle(tmp_path)
+            tmp_path.replace(data_path)
+            entry = {
+                'file': data_path.name,
+                'format': fmt,
+                'meta': meta or {},
+                'attrs': {k: v for k, v in df.attrs.items() if isinstance(v, (str, int, float, bool))},
+                'source': str(source) if source else None,
+                'rows': len(df),
+                'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            meta_tmp = self._meta_path(key).with_suffix(f'.{os.getpid()}.tmp')
+            with open(meta_tmp, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, indent=1)
+            meta_tmp.replace(self._meta_path(key))
+        except Exception as e:
+            logger.warning(f"-- ⚠️ --  Impossible d'enregistrer dans le cache de lecture: {e}")
+            return
+        self.evict()
+
+    def remove(self, key):
+        for path in self.cache_dir.glob(f"{key}.*"):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def entries(self):
+        """Liste des entrées, de la plus récemment utilisée à la plus ancienne."""
+        entries = []
+        for meta_path in self.cache_dir.glob("*.json"):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                data_path = self.cache_dir / entry['file']
+                entry['key'] = meta_path.stem
+                entry['size'] = data_path.stat().st_size + meta_path.stat().st_size
+                entry['last_used'] = meta_path.stat().st_mtime
+                entries.append(entry)
+            except (OSError, ValueError, KeyError):
+                continue
+        return sorted(entries, key=lambda e: e['last_used'], reverse=True)
+
+    def evict(self, max_bytes=None):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes. Returns: nb supprimées."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            total = 0
+            removed = 0
+            for entry in self.entries():
+                total += entry['size']
+                if total > max_bytes:
+                    self.remove(entry['key'])
+                    removed += 1
+        if removed:
+            logger.info(f"🔁 Cache de lecture : {removed} entrée(s) supprimée(s) (limite {max_bytes // (1024 * 1024)} Mo)")
+        return removed
+
+    def clear(self):
+        removed = 0
+        for entry in self.entries():
+            self.remove(entry['key'])
+            removed += 1
+        for tmp_path in self.cache_dir.glob("*.tmp"):
+            tmp_path.unlink(missing_ok=True)
+        return removed
+
+
+def _parquet_available():
+    try:
+        import pyarrow  # type: ignore  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+_NOT_JSON = object()
+
+
+def _json_value(value):
+    """
+    Valeurs simples (sep, encoding, colonnes résolues...) conservées dans le .json de l'entrée ;
+    scalaires numpy convertis, _NOT_JSON pour le reste.
+    """
+    if isinstance(value, (list, tuple)):
+        values = [_json_value(v) for v in value]
+        return _NOT_JSON if any(v is _NOT_JSON for v in values) else values
+    if isinstance(value, np.generic):
+        value = value.item()
+    return value if value is None or isinstance(value, (str, int, float, bool)) else _NOT_JSON
+
+
+def load_parse_cache_settings():
+    """Options parse_cache* de config/processing_settings.yaml."""
+    settings = dict(PARSE_CACHE_DEFAULTS)
+    loaded = load_yaml_config(CONFIG / "processing_settings.yaml") or {}
+    settings.update({k: v for k, v in loaded.items() if k in PARSE_CACHE_DEFAULTS})
+    return settings
+
+
+_PARSE_CACHE = None
+_PARSE_CACHE_LOCK = threading.Lock()
+
+
+def get_parse_cache():
+    """Cache de lecture du process, ou None s'il est désactivé (parse_cache: false)."""
+    global _PARSE_CACHE
+    with _PARSE_CACHE_LOCK:
+        if _PARSE_CACHE is None:
+            settings = load_parse_cache_settings()
+            if not settings.get('parse_cache'):
+                return None
+            _PARSE_CACHE = ParseCache(max_bytes=int(float(settings['parse_cache_max_mb']) * 1024 * 1024))
+        return _PARSE_CACHE
+
+
+def cached_read(file_path, params, read, frame_key):
+    """
+    Lecture via le cache : read() -> dict contenant le DataFrame sous frame_key et des valeurs
+    simples (sep, encoding, listes de colonnes, ...). Un résultat vide (lecture en échec) n'est jamais mis en cache.
+    """
+    cache = get_parse_cache()
+    if cache is None:
+        return read()
+    try:
+        key = cache.key_for(file_path, params)
+    except OSError:
+        return read()
+    hit = cache.get(key)
+    if hit is not None:
+        df, meta = hit
+        logger.info(f"🔁 Lu depuis le cache de lecture : {file_path} ({len(df)} lignes)")
+        return {**meta, frame_key: df}
+    result = read()
+    df = result.get(frame_key)
+    if isinstance(df, pd.DataFrame) and not df.empty:
+        meta = {k: _json_value(v) for k, v in result.items() if k != frame_key}
+        meta = {k: v for k, v in meta.items() if v is not _NOT_JSON}
+        cache.put(key, df, meta, source=file_path)
+    return result
+
+
+# ------------------------------------------------------------------------------
+#       python -m functions.functions_parse_cache [list | clear | evict]
+# ------------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cache des fichiers fournisseurs/plateformes déjà lus")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("list", help="Lister les entrées (la plus récemment utilisée en premier)")
+    sub.add_parser("clear", help="Vider le cache")
+    evict = sub.add_parser("evict", help="Appliquer la limite de taille")
+    evict.add_argument("--max-mb", type=float, default=None, help="Limite en Mo (défaut: parse_cache_max_mb)")
+    args = parser.parse_args(argv)
+
+    settings = load_parse_cache_settings()
+    cache = ParseCache(max_bytes=int(float(settings['parse_cache_max_mb']) * 1024 * 1024))
+    command = args.command or "list"
+    if command == "clear":
+        print(f"{cache.clear()} entrée(s) supprimée(s) de {cache.cache_dir}")
+    elif command == "evict":
+        max_bytes = None if args.max_mb is None else int(args.max_mb * 1024 * 1024)
+        print(f"{cache.evict(max_bytes)} entrée(s) supprimée(s)")
+    else:
+        entries = cache.entries()
+        total = sum(e['size'] for e in entries)
+        print(f"{cache.cache_dir} : {len(entries)} entrée(s), {total / (1024 * 1024):.1f} Mo "
+              f"(limite {cache.max_bytes / (1024 * 1024):.0f} Mo)")
+        for e in entries:
+            last_used = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(e['last_used']))
+            print(f"  {last_used}  {e['size'] / 1024:>10.1f} Ko  {e.get('rows', '?'):>8} lignes  "
+                  f"{e['format']:<7}  {e.get('source')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,9 +8,58 @@ import os
 import csv
 import pandas as pd
 from pathlib import Path
-from utils import load_yaml_config
+from utils import load_yaml_config, DIALECT_CACHE_STATS
 from config.config_path_variables import CONFIG, LOG_FOLDER
 
+# Colonnes de la table des changements de stock (une ligne par produit modifié)
+STOCK_CHANGE_COLUMNS = ['product_id', 'old_quantity', 'new_quantity', 'platform']
+
+
+def empty_stock_changes() -> pd.DataFrame:
+    return pd.DataFrame({
+        'product_id': pd.Series(dtype=object),
+        'old_quantity': pd.Series(dtype='int64'),
+        'new_quantity': pd.Series(dtype='int64'),
+        'platform': pd.Series(dtype=object),
+    })
+
+
+class ReportRecorder:
+    """
+    Remplace le ReportGenerator dans un process worker : enregistre les appels
+    (add_file_result, add_stock_changes, ...) et les compteurs du cache de dialectes,
+    puis le process parent les rejoue dans le vrai rapport avec replay().
+    """
+
+    RECORDED = ('add_supplier_processed', 'add_platform_processed', 'add_file_result',
+                'add_products_count', 'add_error', 'add_warning', 'add_stock_changes')
+
+    def __init__(self):
+        self.calls = []
+        self._dialect_cache_baseline = dict(DIALECT_CACHE_STATS)
+        self.dialect_cache = {'hits': 0, 'misses': 0}
+
+    def __getattr__(self, name):
+        if name not in ReportRecorder.RECORDED:
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def close(self):
+        """Fige les lectures CSV faites par ce worker (à appeler avant de renvoyer le recorder)."""
+        self.dialect_cache = {
+            key: DIALECT_CACHE_STATS[key] - self._dialect_cache_baseline.get(key, 0)
+            for key in ('hits', 'misses')
+        }
+        return self
+
+    def replay(self, report_gen=None):
+        for key, count in self.dialect_cache.items():
+            DIALECT_CACHE_STATS[key] += count
+        if report_gen is not None:
+            for name, args, kwargs in self.calls:
+                getattr(report_gen, name)(*args, **kwargs)
+
+
 class ReportGenerator:
     def __init__(self):
         self.start_time = None
@@ -21,10 +70,15 @@ class ReportGenerator:
             'files_successful': [],
             'files_failed': [],
             'products_updated': 0,
-            'stock_changes': [],  # New field to track actual changes
+            'stock_changes': empty_stock_changes(),  # New field to track actual changes
+            'dialect_cache': {'hits': 0, 'misses': 0},
+            'supplier_matrix': None,  # SupplierStockMatrix du run (stock par fournisseur)
+            'uploads': [],  # résultats d'envoi par plateforme (voir functions_FTP._upload_result)
+            'uploads_skipped': [],  # [{'platform', 'reason'}] plateformes non renvoyées (inchangées)
             'errors': [],
             'warnings': []
         }
+        self._dialect_cache_baseline = dict(DIALECT_CACHE_STATS)
         self.html_report = None
         self.logger = logging.getLogger("ReportGenerator")
 
@@ -37,17 +91,34 @@ class ReportGenerator:
             'files_successful': [],
             'files_failed': [],
             'products_updated': 0,
-            'stock_changes': [],  # Reset stock changes
+            'stock_changes': empty_stock_changes(),  # Reset stock changes
+            'dialect_cache': {'hits': 0, 'misses': 0},
+            'supplier_matrix': None,  # SupplierStockMatrix du run (stock par fournisseur)
+            'uploads': [],  # résultats d'envoi par plateforme (voir functions_FTP._upload_result)
+            'uploads_skipped': [],  # [{'platform', 'reason'}] plateformes non renvoyées (inchangées)
             'errors': [],
             'warnings': []
         }
+        self._dialect_cache_baseline = dict(DIALECT_CACHE_STATS)
         self.html_report = None
         self.logger.info("Début de l'opération de mise à jour.")
 
     def end_operation(self):
         self.end_time = time.time()
+        self.update_dialect_cache_stats()
         self.logger.info("Fin de l'opération de mise à jour.")
 
+    def update_dialect_cache_stats(self):
+        """Lectures CSV de ce run servies par le cache de dialectes (hits) ou par la recherche complète (misses)."""
+        self.stats['dialect_cache'] = {
+            key: DIALECT_CACHE_STATS[key] - self._dialect_cache_baseline.get(key, 0)
+            for key in ('hits', 'misses')
+        }
+
+    def set_supplier_matrix(self, matrix):
+        """Matrice produits × fournisseurs utilisée pour le détail par fournisseur des changements."""
+        self.stats['supplier_matrix'] = matrix
+
     def add_supplier_processed(self, supplier_name):
         self.stats['suppliers_processed'].add(supplier_name)
 
@@ -72,11 +143,36 @@ class ReportGenerator:
         self.stats['warnings'].append(warning_msg)
     
     def add_stock_changes(self, changes):
-        """Add stock changes to the report"""
-        self.stats['stock_changes'].extend(changes)
+        """
+        Add stock changes to the report.
+        changes: table STOCK_CHANGE_COLUMNS (voir update_plateforme) ou liste de dicts avec ces clés.
+        """
+        if not isinstance(changes, pd.DataFrame):
+            changes = pd.DataFrame(list(changes), columns=STOCK_CHANGE_COLUMNS)
+        if changes.empty:
+            return
+        current = self.stats['stock_changes']
+        changes = changes[STOCK_CHANGE_COLUMNS]
+        self.stats['stock_changes'] = changes.reset_index(drop=True) if current.empty else pd.concat([current, changes], ignore_index=True)
         # Update the count of products actually updated
         self.stats['products_updated'] = len(self.stats['stock_changes'])
 
+    def add_upload_result(self, result):
+        """result: {'platform', 'status', 'file', 'remote_file', 'attempts', 'duration', 'error'}"""
+        self.stats['uploads'].append(result)
+        if result.get('status') == 'failed':
+            self.stats['errors'].append(f"Envoi échoué pour {result['platform']}: {result.get('error')}")
+
+    def add_upload_skipped(self, platform_name, reason):
+        self.stats['uploads_skipped'].append({'platform': platform_name, 'reason': reason})
+
+    def platform_change_count(self, platform_name):
+        """Nombre de stocks modifiés sur la plateforme pendant ce run, None si elle n'a pas été traitée."""
+        if platform_name not in self.stats['platforms_processed']:
+            return None
+        changes = self.stats['stock_changes']
+        return int((changes['platform'] == platform_name).sum())
+
     def generate_html_report(self):
         try:
             report_settings = load_yaml_config(CONFIG / "report_settings.yaml")
@@ -112,30 +208,19 @@ class ReportGenerator:
                 context['has_stock_changes'] = len(self.stats['stock_changes']) > 0
 
                 # Build per-platform summary: changed_count and supplier contribution percentages using real supplier names
+                # (contributions par fournisseur lues directement dans la matrice produits × fournisseurs)
+                changes = self.stats['stock_changes']
+                matrix = self.stats.get('supplier_matrix')
                 per_platform = {}
-                for change in self.stats['stock_changes']:
-                    platform = change.get('platform')
-                    if not platform:
-                        continue
-                    entry = per_platform.setdefault(platform, {
-                        'changed_count': 0,
-                        'total_new_quantity': 0,
-                        'supplier_totals': {},
-                        'supplier_article_counts': {}
-                    })
-                    entry['changed_count'] += 1
-                    new_q = change.get('new_quantity', 0) or 0
-                    entry['total_new_quantity'] += int(new_q)
-                    supplier_details = change.get('supplier_details', {}) or {}
-                    for supplier, qty in supplier_details.items():
-                        entry['supplier_totals'][supplier] = entry['supplier_totals'].get(supplier, 0) + (qty or 0)
-                        # Count articles per supplier (only count if supplier contributes > 0)
-                        try:
-                            qty_val = int(qty)
-                        except Exception:
-                            qty_val = 0
-                        if qty_val > 0:
-                            entry['supplier_article_counts'][supplier] = entry['supplier_article_counts'].get(supplier, 0) + 1
+                changes = changes[changes['platform'].fillna('') != '']
+                for platform, group in changes.groupby('platform', sort=False):
+                    totals, article_counts = matrix.contributions(group['product_id']) if matrix is not None else ({}, {})
+                    per_platform[platform] = {
+                        'changed_count': len(group),
+                        'total_new_quantity': int(group['new_quantity'].fillna(0).sum()),
+                        'supplier_totals': totals,
+                        'supplier_article_counts': article_counts
+                    }
 
                 # Compute percentages per supplier
                 platform_change_summary = []
@@ -150,11 +235,9 @@ class ReportGenerator:
                         all_suppliers = set(self.stats.get('all_suppliers', set()))
                     except Exception:
                         pass
-                    # Fallback to per-platform scan if global set is empty
-                    if not all_suppliers:
-                        for ch in self.stats['stock_changes']:
-                            if ch.get('platform') == platform and isinstance(ch.get('supplier_details'), dict):
-                                all_suppliers.update(ch['supplier_details'].keys())
+                    # Fallback to the matrix suppliers if global set is empty
+                    if not all_suppliers and matrix is not None:
+                        all_suppliers = set(matrix.suppliers)
                     # Build percentages
                     candidate_suppliers = sorted(all_suppliers) if include_zero else sorted(data['supplier_totals'].keys())
                     for supplier in candidate_suppliers:
@@ -175,6 +258,10 @@ class ReportGenerator:
                 platform_change_summary.sort(key=lambda x: x['platform'])
                 context['platform_change_summary'] = platform_change_summary
                 context['has_platform_change_summary'] = len(platform_change_summary) > 0
+            context['uploads'] = self.stats['uploads']
+            context['uploads_skipped'] = self.stats['uploads_skipped']
+            self.update_dialect_cache_stats()
+            context['dialect_cache'] = self.stats['dialect_cache']
             if context['sections'].get('errors', True):
                 context['errors'] = self.stats['errors']
             if context['sections'].get('warnings', True):
@@ -197,7 +284,8 @@ class ReportGenerator:
     def generate_csv_report(self):
         """Generate CSV files with stock changes - one per platform"""
         try:
-            if not self.stats['stock_changes']:
+            changes = self.stats['stock_changes']
+            if changes.empty:
                 self.logger.info("Aucun changement de stock à exporter en CSV.")
                 return []
             
@@ -205,36 +293,17 @@ class ReportGenerator:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             
             # Create DataFrame from stock changes
-            df_all = pd.DataFrame(self.stats['stock_changes'])
-            
-            # Get all unique supplier names
-            all_suppliers = set()
-            for change in self.stats['stock_changes']:
-                if 'supplier_details' in change and isinstance(change['supplier_details'], dict):
-                    all_suppliers.update(change['supplier_details'].keys())
-            
-            sorted_suppliers = sorted(list(all_suppliers))
-            
-            # Prepare data for DataFrame
-            records = []
-            for change in self.stats['stock_changes']:
-                record = {
-                    'platform': change['platform'],
-                    'product_id': change['product_id'],
-                    'old_quantity': change['old_quantity'],
-                    'new_quantity': change['new_quantity'],
-                    'difference': change['new_quantity'] - change['old_quantity'],
-                    'run_timestamp': timestamp
-                }
-                
-                # Add individual supplier quantities
-                if 'supplier_details' in change and isinstance(change['supplier_details'], dict):
-                    for supplier in sorted_suppliers:
-                        record[f'stock_{supplier}'] = change['supplier_details'].get(supplier, 0)
-                
-                records.append(record)
-            
-            df_all = pd.DataFrame(records)
+            df_all = changes[['platform', 'product_id', 'old_quantity', 'new_quantity']].reset_index(drop=True)
+            df_all['difference'] = df_all['new_quantity'] - df_all['old_quantity']
+            df_all['run_timestamp'] = timestamp
+
+            # Stock par fournisseur lu directement dans la matrice produits × fournisseurs
+            sorted_suppliers = []
+            matrix = self.stats.get('supplier_matrix')
+            if matrix is not None:
+                supplier_df = matrix.to_frame(df_all['product_id'])
+                sorted_suppliers = [col[len('stock_'):] for col in supplier_df.columns]
+                df_all = pd.concat([df_all, supplier_df], axis=1)
             # Enforce column order: core columns first, then supplier columns (sorted)
             core_cols = ['platform', 'product_id', 'old_quantity', 'new_quantity', 'difference', 'run_timestamp']
             supplier_cols = [f'stock_{s}' for s in sorted_suppliers]
@@ -299,7 +368,7 @@ class ReportGenerator:
             contents = [self.html_report]
             
             # Generate and attach CSV files if enabled and there are stock changes
-            if report_settings.get('attach_csv', True) and self.stats['stock_changes']:
+            if report_settings.get('attach_csv', True) and not self.stats['stock_changes'].empty:
                 csv_paths = self.generate_csv_report()
                 if csv_paths:
                     # Enforce total size cap for attachments
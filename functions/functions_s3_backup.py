@@ -0,0 +1,246 @@
+import atexit
+import queue
+import threading
+from pathlib import Path
+
+from config.logging_config import logger
+from config.config_path_variables import CONFIG
+from utils import load_yaml_config, file_digest
+
+
+S3_BACKUP_DEFAULTS = {
+    'enabled': False,
+    'bucket': None,
+    'prefix': "backups/platforms",
+    'workers': 2,
+    'multipart_threshold_mb': 8,
+    'flush_timeout': 300,
+}
+
+
+# ------------------------------------------------------------------------------
+#     Copie S3 des sauvegardes en arrière-plan, dédupliquée par contenu (sha256)
+# ------------------------------------------------------------------------------
+class S3BackupUploader:
+    """
+    File d'attente de fichiers locaux à copier sur S3, traitée par des threads en arrière-plan :
+    l'envoi FTP n'attend plus S3.
+
+    Clés S3 :
+        <prefix>/by-hash/<sha256>               contenu, envoyé une seule fois (upload_file : multipart
+                                                au-delà de multipart_threshold_mb, lu depuis le disque)
+        <prefix>/<timestamp>/<plateforme>/<nom>.sha256   petit pointeur vers le contenu
+    Un contenu dont le hash est déjà sous <prefix>/by-hash/ n'est pas renvoyé.
+    """
+
+    def __init__(self, client, bucket, prefix="backups/platforms", workers=2, multipart_threshold_mb=8):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = str(prefix or '').strip('/')
+        self.workers = max(1, int(workers or 1))
+        self.multipart_threshold = int(float(multipart_threshold_mb or 8) * 1024 * 1024)
+        self.stats = {'uploaded': 0, 'deduplicated': 0, 'failed': 0}
+        self._queue = queue.Queue()
+        self._threads = []
+        self._known = None  # hashes déjà présents sous <prefix>/by-hash/ (chargés au premier envoi)
+        self._local_dirs = {}  # dossiers des fichiers remove_after -> nombre de niveaux à supprimer s'ils sont vides
+        self._lock = threading.Lock()
+
+    def _key(self, *parts):
+        return "/".join(p for p in (self.prefix, *parts) if p)
+
+    def blob_key(self, digest=""):
+        return self._key("by-hash", digest)
+
+    def submit(self, local_path, name, remove_after=False):
+        """
+        Ajoute local_path à la file ; name = '<timestamp>/<plateforme>/<fichier>' (clé du pointeur).
+        remove_after: supprimer le fichier local une fois copié (il est conservé si la copie échoue) ;
+                      ses dossiers (autant que de dossiers dans name) sont supprimés par close() s'ils sont vides.
+        """
+        local_path = Path(local_path)
+        with self._lock:
+            if remove_after:
+                self._local_dirs[local_path.parent] = len(Path(name).parts) - 1
+            if not self._threads:
+                for i in range(self.workers):
+                    thread = threading.Thread(target=self._work, name=f"s3-backup-{i}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+        self._queue.put((local_path, name, remove_after))
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._upload(*item)
+            except Exception as e:
+                self._count('failed')
+                logger.warning(f"[WARNING]: S3 backup failed for '{item[0].name}': {e}")
+            finally:
+                self._queue.task_done()
+
+    def _load_known(self):
+        """Liste une seule fois les contenus déjà sauvegardés (list_objects_v2 paginé)."""
+        known = set()
+        blob_prefix = self.blob_key() + "/"
+        kwargs = {'Bucket': self.bucket, 'Prefix': blob_prefix}
+        try:
+            while True:
+                response = self.client.list_objects_v2(**kwargs)
+                known.update(obj['Key'][len(blob_prefix):] for obj in response.get('Contents', []))
+                if not response.get('IsTruncated'):
+                    return known
+                kwargs['ContinuationToken'] = response['NextContinuationToken']
+        except Exception as e:
+            logger.warning(f"-- ⚠️ --  Liste S3 impossible (s3://{self.bucket}/{blob_prefix}), pas de déduplication: {e}")
+            return known
+
+    def _claim(self, digest):
+        """False si ce contenu est déjà sur S3 (ou en cours d'envoi), sinon le réserve et renvoie True."""
+        with self._lock:
+            if self._known is None:
+                self._known = self._load_known()
+            if digest in self._known:
+                return False
+            self._known.add(digest)
+            return True
+
+    def _upload(self, local_path, name, remove_after=False):
+        digest = file_digest(local_path)
+        blob_key = self.blob_key(digest)
+        if not self._claim(digest):
+            self._count('deduplicated')
+            logger.info(f"🔁 S3 : contenu déjà sauvegardé pour '{name}' (s3://{self.bucket}/{blob_key})")
+        else:
+            try:
+                self.client.upload_file(str(local_path), self.bucket, blob_key, **self._transfer_kwargs(digest))
+            except Exception:
+                with self._lock:
+                    self._known.discard(digest)
+                raise
+            self._count('uploaded')
+            logger.info(f"[INFO]: Backed up '{name}' to s3://{self.bucket}/{blob_key}")
+        self.client.put_object(Bucket=self.bucket, Key=self._key(f"{name}.sha256"), Body=digest.encode('ascii'))
+        if remove_after:
+            local_path.unlink(missing_ok=True)
+
+    def _transfer_kwargs(self, digest):
+        kwargs = {'ExtraArgs': {'Metadata': {'sha256': digest}}}
+        try:
+            from boto3.s3.transfer import TransferConfig  # type: ignore
+            kwargs['Config'] = TransferConfig(
+                multipart_threshold=self.multipart_threshold, multipart_chunksize=self.multipart_threshold,
+            )
+        except ImportError:
+            pass
+        return kwargs
+
+    def flush(self, timeout=None):
+        """Attend que la file soit vide. Returns: True si tout a été traité avant timeout."""
+        if timeout is None:
+            self._queue.join()
+            return True
+        done = threading.Event()
+        waiter = threading.Thread(target=lambda: (self._queue.join(), done.set()), daemon=True)
+        waiter.start()
+        return done.wait(timeout)
+
+    def _remove_empty_dirs(self):
+        """Supprime les dossiers locaux vidés par remove_after (ex: backup/<timestamp>/<plateforme>/)."""
+        with self._lock:
+            local_dirs, self._local_dirs = self._local_dirs, {}
+        for folder, levels in local_dirs.items():
+            for _ in range(levels):
+                try:
+                    folder.rmdir()  # seulement si vide
+                except OSError:
+                    break
+                folder = folder.parent
+
+    def close(self, timeout=None):
+        """Vide la file puis arrête les threads."""
+        flushed = self.flush(timeout)
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout=1)
+        self._remove_empty_dirs()
+        if not flushed:
+            logger.warning(f"-- ⚠️ --  Sauvegarde S3 incomplète : {self._queue.qsize()} fichier(s) non envoyé(s)")
+        if self.stats['uploaded'] or self.stats['deduplicated'] or self.stats['failed']:
+            logger.info(f"-- ☁️ --  Sauvegarde S3 : {self.stats['uploaded']} envoyé(s), "
+                        f"{self.stats['deduplicated']} déjà présent(s), {self.stats['failed']} en échec")
+        return flushed
+
+
+def load_s3_backup_settings():
+    """config/aws_backup.yaml complété avec les valeurs par défaut."""
+    settings = dict(S3_BACKUP_DEFAULTS)
+    settings.update(load_yaml_config(CONFIG / "aws_backup.yaml") or {})
+    return settings
+
+
+def create_s3_client(settings):
+    import boto3  # type: ignore
+
+    client_kwargs = {}
+    if settings.get("region"):
+        client_kwargs["region_name"] = settings["region"]
+    if settings.get("access_key_id") and settings.get("secret_access_key"):
+        client_kwargs["aws_access_key_id"] = settings["access_key_id"]
+        client_kwargs["aws_secret_access_key"] = settings["secret_access_key"]
+    if settings.get("session_token"):
+        client_kwargs["aws_session_token"] = settings["session_token"]
+    if settings.get("endpoint_url"):
+        client_kwargs["endpoint_url"] = settings["endpoint_url"]
+    return boto3.client("s3", **client_kwargs)
+
+
+_S3_BACKUP = None
+_S3_BACKUP_LOADED = False
+_S3_BACKUP_LOCK = threading.Lock()
+
+
+def get_s3_backup():
+    """Uploader S3 du process, ou None si la sauvegarde S3 est désactivée ou indisponible."""
+    global _S3_BACKUP, _S3_BACKUP_LOADED
+    with _S3_BACKUP_LOCK:
+        if _S3_BACKUP_LOADED:
+            return _S3_BACKUP
+        _S3_BACKUP_LOADED = True
+        settings = load_s3_backup_settings()
+        if not settings.get("enabled") or not settings.get("bucket"):
+            return None
+        try:
+            client = create_s3_client(settings)
+        except Exception as e:
+            logger.error(f"[ERROR]: Failed to initialize S3 client: {e}")
+            return None
+        _S3_BACKUP = S3BackupUploader(
+            client, settings["bucket"], settings.get("prefix"),
+            workers=settings.get("workers"), multipart_threshold_mb=settings.get("multipart_threshold_mb"),
+        )
+        logger.info(f"[INFO]: S3 backup enabled. Bucket='{settings['bucket']}', Prefix='{_S3_BACKUP.prefix}'")
+        return _S3_BACKUP
+
+
+def close_s3_backup():
+    """Termine les sauvegardes S3 en attente (fin de run, et à la sortie du process)."""
+    global _S3_BACKUP, _S3_BACKUP_LOADED
+    with _S3_BACKUP_LOCK:
+        uploader, _S3_BACKUP = _S3_BACKUP, None
+        _S3_BACKUP_LOADED = False
+    if uploader is not None:
+        uploader.close(timeout=float(load_s3_backup_settings().get('flush_timeout') or 0) or None)
+
+
+atexit.register(close_s3_backup)
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+from config.config_path_variables import ID_PRODUCT, QUANTITY
+
+
+# ------------------------------------------------------------------------------
+#          Matrice produits × fournisseurs (stock de chaque fournisseur)
+# ------------------------------------------------------------------------------
+class SupplierStockMatrix:
+    """
+    Stock de chaque fournisseur pour chaque produit, construit en un seul pivot.
+        products:   pd.Index des ID_Product canoniques ; le code entier d'un produit est sa position
+        suppliers:  noms des fournisseurs (colonnes, dans l'ordre de data_fournisseurs)
+        quantities: np.ndarray int64 (produits × fournisseurs), 0 si le fournisseur n'a pas le produit
+        present:    np.ndarray bool, True si le fournisseur a une ligne pour le produit
+    """
+
+    def __init__(self, products, suppliers, quantities, present):
+        self.products = pd.Index(products)
+        self.suppliers = list(suppliers)
+        self.quantities = quantities
+        self.present = present
+
+    @classmethod
+    def from_fournisseurs(cls, data_fournisseurs):
+        """data_fournisseurs: dict {nom: {'reduced_data': DataFrame[ID_Product, Quantity], ...}} (IDs canoniques)."""
+        suppliers = list(data_fournisseurs)
+        frames = [
+            pd.DataFrame({
+                ID_PRODUCT: data['reduced_data'][ID_PRODUCT].to_numpy(),
+                'supplier': name,
+                QUANTITY: data['reduced_data'][QUANTITY].to_numpy(),
+            })
+            for name, data in data_fournisseurs.items()
+        ]
+        if not frames:
+            return cls(pd.Index([]), [], np.zeros((0, 0), dtype='int64'), np.zeros((0, 0), dtype=bool))
+        long_df = pd.concat(frames, ignore_index=True)
+        # Un produit présent plusieurs fois chez un fournisseur : la dernière ligne l'emporte
+        long_df = long_df.drop_duplicates(subset=[ID_PRODUCT, 'supplier'], keep='last')
+        wide = long_df.pivot(index=ID_PRODUCT, columns='supplier', values=QUANTITY).reindex(columns=suppliers)
+        return cls(
+            wide.index,
+            suppliers,
+            wide.fillna(0).to_numpy(dtype='int64'),
+            wide.notna().to_numpy(),
+        )
+
+    def __len__(self):
+        return len(self.products)
+
+    def __contains__(self, product_id):
+        return product_id in self.products
+
+    def codes(self, product_ids) -> np.ndarray:
+        """Code entier de chaque produit (-1 si inconnu)."""
+        return self.products.get_indexer(pd.Index(product_ids))
+
+    def details(self, product_id) -> dict:
+        """{fournisseur: quantité} pour un produit (fournisseurs qui l'ont uniquement)."""
+        code = self.codes([product_id])[0]
+        if code < 0:
+            return {}
+        return {s: int(q) for s, q, p in zip(self.suppliers, self.quantities[code], self.present[code]) if p}
+
+    def to_frame(self, product_ids, prefix='stock_') -> pd.DataFrame:
+        """
+        Une ligne par produit demandé, une colonne '<prefix><fournisseur>' (triées) pour chaque
+        fournisseur qui a au moins un de ces produits ; 0 si le fournisseur n'a pas le produit.
+        """
+        codes = self.codes(product_ids)
+        known = codes >= 0
+        rows = codes[known]
+        used = self.present[rows].any(axis=0) if len(rows) else np.zeros(len(self.suppliers), dtype=bool)
+        columns = sorted(s for s, u in zip(self.suppliers, used) if u)
+        positions = [self.suppliers.index(s) for s in columns]
+        values = np.zeros((len(codes), len(columns)), dtype='int64')
+        values[known] = self.quantities[rows][:, positions]
+        frame = pd.DataFrame(values, columns=[f"{prefix}{s}" for s in columns])
+        frame.loc[~known] = None
+        return frame
+
+    def contributions(self, product_ids):
+        """
+        Pour un ensemble de produits (ex: ceux modifiés sur une plateforme) :
+            totals:   {fournisseur: somme des quantités}
+            articles: {fournisseur: nombre de produits avec une quantité > 0}
+        Seuls les fournisseurs qui ont au moins un de ces produits apparaissent.
+        """
+        codes = self.codes(product_ids)
+        rows = codes[codes >= 0]
+        quantities = self.quantities[rows]
+        used = self.present[rows].any(axis=0)
+        totals = quantities.sum(axis=0)
+        articles = (quantities > 0).sum(axis=0)
+        return (
+            {s: int(t) for s, t, u in zip(self.suppliers, totals, used) if u},
+            {s: int(a) for s, a, u in zip(self.suppliers, articles, used) if u},
+        )
+
+
+# ------------------------------------------------------------------------------
+#        Index du stock cumulé (ID canonique -> quantité), un par run
+# ------------------------------------------------------------------------------
+class SupplierStockIndex:
+    """
+    Stock cumulé de tous les fournisseurs, construit une seule fois par run puis partagé
+    (en lecture seule) par toutes les plateformes.
+        ids:        pd.Index (haché, unique) des ID_Product canoniques
+        quantities: np.ndarray non modifiable, quantité cumulée de chaque ID (même position)
+    La mise à jour d'une plateforme devient un seul get_indexer + une indexation numpy.
+    """
+
+    def __init__(self, ids, quantities):
+        self.ids = pd.Index(ids)
+        if not self.ids.is_unique:
+            raise ValueError("SupplierStockIndex: ID_Product en double")
+        self.quantities = np.asarray(quantities)
+        if len(self.quantities) != len(self.ids):
+            raise ValueError("SupplierStockIndex: ids et quantities de tailles différentes")
+        self.quantities.setflags(write=False)
+
+    @classmethod
+    def from_frame(cls, df_fournisseurs):
+        """
+        df_fournisseurs: DataFrame[ID_Product, Quantity] (ex: résultat de cumule_fournisseurs).
+        Stock normalisé et IDs canonisés ici ; un ID présent plusieurs fois : la dernière ligne l'emporte.
+        """
+        # Import local : functions_update importe ce module
+        from functions.functions_update import ensure_canonical_ids
+        from utils import process_stock_series
+
+        df = pd.DataFrame({
+            ID_PRODUCT: df_fournisseurs[ID_PRODUCT],
+            QUANTITY: process_stock_series(df_fournisseurs[QUANTITY]),
+        })
+        if df_fournisseurs.attrs:
+            df.attrs.update(df_fournisseurs.attrs)
+        ensure_canonical_ids(df)
+        df = df.drop_duplicates(subset=ID_PRODUCT, keep='last')
+        return cls(df[ID_PRODUCT].to_numpy(), df[QUANTITY].to_numpy())
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, product_id):
+        return product_id in self.ids
+
+    def lookup(self, product_ids) -> pd.Series:
+        """
+        Quantité cumulée pour chaque ID canonique demandé, NaN si aucun fournisseur ne l'a.
+        Le résultat garde l'index de product_ids (Series) pour s'aligner sur la plateforme.
+        """
+        index = product_ids.index if isinstance(product_ids, pd.Series) else None
+        codes = self.ids.get_indexer(product_ids)
+        found = codes >= 0
+        if not len(self.ids):
+            return pd.Series(np.nan, index=index if index is not None else pd.RangeIndex(len(codes)), dtype='float64')
+        values = pd.Series(self.quantities[codes], index=index)
+        return values if found.all() else values.where(found)
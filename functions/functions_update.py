@@ -1,5 +1,10 @@
 import os
+import re
+import queue
 import warnings
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 import time
 
@@ -9,82 +14,93 @@ from config.logging_config import logger
 from config.config_path_variables import *
 from config.temporary_data_list import current_dataFiles
 from functions.functions_check_ready_files import *
+from functions.functions_supplier_matrix import SupplierStockMatrix, SupplierStockIndex
+from functions.functions_parse_cache import cached_read
+from functions.functions_archive_store import get_archive_store, apply_archive_retention
+from functions.functions_report import STOCK_CHANGE_COLUMNS, ReportRecorder, empty_stock_changes
 
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 
 
+NON_ALNUM_RE = re.compile(r"[^A-Z0-9]")
+CANONICAL_IDS_ATTR = 'canonical_ids'
+
+
 def canonicalize_product_id(value: object) -> str:
     """Return a canonical product ID: trim, uppercase, remove non-alphanumeric."""
     try:
-        import re
         s = str(value).strip().upper()
         # Remove any character that is not A-Z or 0-9
-        s = re.sub(r"[^A-Z0-9]", "", s)
+        s = NON_ALNUM_RE.sub("", s)
         return s
     except Exception:
         return str(value)
 
-def update_plateforme(df_platform, df_fournisseurs, name_platform, name_fournisseur, supplier_details=None): 
+
+def canonicalize_product_ids(values: pd.Series) -> pd.Series:
+    """
+    Version vectorisée de canonicalize_product_id (mêmes résultats, valeurs manquantes comprises :
+    str(nan) -> 'NAN', str(pd.NA) -> 'NA').
+    """
+    if values.dtype == object or not pd.api.types.is_string_dtype(values):
+        values = values.map(str)
+    else:
+        # Valeur manquante propre au dtype (NaN pour 'str', pd.NA pour 'string'), convertie comme str() le fait
+        values = values.fillna(str(getattr(values.dtype, 'na_value', np.nan)))
+    return values.str.upper().str.replace(NON_ALNUM_RE.pattern, '', regex=True)
+
+
+def ensure_canonical_ids(df: pd.DataFrame, column: str = ID_PRODUCT) -> pd.DataFrame:
+    """
+    Canonicalise df[column] une seule fois : le DataFrame est ensuite marqué
+    (df.attrs['canonical_ids']) et les étapes suivantes ne refont pas le calcul.
+    """
+    if df.attrs.get(CANONICAL_IDS_ATTR) != column:
+        df[column] = canonicalize_product_ids(df[column])
+        mark_canonical_ids(df, column)
+    return df
+
+
+def mark_canonical_ids(df: pd.DataFrame, column: str = ID_PRODUCT) -> pd.DataFrame:
+    """Marque df[column] comme déjà canonique (ex: clés d'un groupby sur des IDs canoniques)."""
+    df.attrs[CANONICAL_IDS_ATTR] = column
+    return df
+
+
+def update_plateforme(df_platform, df_fournisseurs, name_platform, name_fournisseur): 
+    """
+    df_fournisseurs: SupplierStockIndex construit une fois par run (voir mettre_a_jour_Stock),
+                     ou DataFrame[ID_Product, Quantity] (converti en index ici).
+    Returns:
+        (df_platform mis à jour (mêmes lignes, même index), table des changements STOCK_CHANGE_COLUMNS :
+         product_id / old_quantity / new_quantity / platform, une ligne par produit modifié)
+    """
     os.makedirs(VERIFIED_FILES_PATH, exist_ok=True)
-    stock_changes = []  # Track actual changes
     try:
-        # Keep original quantities for comparison
-        df_platform_original = df_platform.copy()
-        
-        # Nettoyage du stock fournisseur
-        df_fournisseurs[QUANTITY] = df_fournisseurs[QUANTITY].apply(process_stock_value)
+        if isinstance(df_fournisseurs, SupplierStockIndex):
+            supplier_index = df_fournisseurs
+        else:
+            supplier_index = SupplierStockIndex.from_frame(df_fournisseurs)
 
-        # Canonicalize product IDs before merge (both frames)
-        df_platform[ID_PRODUCT] = df_platform[ID_PRODUCT].apply(canonicalize_product_id)
-        df_fournisseurs[ID_PRODUCT] = df_fournisseurs[ID_PRODUCT].apply(canonicalize_product_id)
+        ensure_canonical_ids(df_platform)
 
-        # Ajouter le suffixe _fournisseur après merge sur ID_PRODUCT
-        # df_merged = df_platform.merge(df_fournisseurs, on=ID_PRODUCT, how='left', suffixes=('', '_fournisseur'))
-        
-        # Sauvegarde des différences de quantités
-        # df_merged.to_csv(f'{VERIFIED_FILES_PATH}/{name_platform}-{name_fournisseur}_valeurs_différentes.csv', index=False)
-         
-        df_platform = df_platform.merge(
-            df_fournisseurs[[ID_PRODUCT, QUANTITY]],
-            on=ID_PRODUCT,
-            how='left',
-            suffixes=('', '_fournisseur')
-        )
-        
-        # Track changes before updating
-        mask = df_platform[f'{QUANTITY}_fournisseur'].notna()
-        changed_products = df_platform[mask].copy()
-        
-        # Compare old and new values
-        for idx, row in changed_products.iterrows():
-            old_qty = row[QUANTITY]
-            new_qty = row[f'{QUANTITY}_fournisseur']
-            if pd.notna(new_qty) and old_qty != new_qty:
-                change_data = {
-                    'product_id': row[ID_PRODUCT],
-                    'old_quantity': int(old_qty) if pd.notna(old_qty) else 0,
-                    'new_quantity': int(new_qty),
-                    'platform': name_platform
-                }
-                
-                # Add supplier details if provided
-                if supplier_details:
-                    pid_norm = canonicalize_product_id(row[ID_PRODUCT])
-                    if pid_norm in supplier_details:
-                        change_data['supplier_details'] = supplier_details[pid_norm]
-                
-                stock_changes.append(change_data)
-                
-        df_platform[QUANTITY] = df_platform[f'{QUANTITY}_fournisseur'].combine_first(df_platform[QUANTITY])
-        df_platform.drop(columns=[f'{QUANTITY}_fournisseur'], inplace=True)
+        # Une seule recherche vectorisée dans l'index (NaN si aucun fournisseur n'a le produit)
+        old_qty = df_platform[QUANTITY]
+        new_qty = supplier_index.lookup(df_platform[ID_PRODUCT])
+        changed = new_qty.notna() & (old_qty != new_qty)
+        stock_changes = pd.DataFrame({
+            'product_id': df_platform.loc[changed, ID_PRODUCT].to_numpy(),
+            'old_quantity': old_qty[changed].fillna(0).to_numpy().astype('int64'),
+            'new_quantity': new_qty[changed].to_numpy().astype('int64'),
+            'platform': name_platform,
+        }, columns=STOCK_CHANGE_COLUMNS)
 
-        # Sauvegarde finale des données corrigées
-        # df_platform.to_csv(f'{VERIFIED_FILES_PATH}/{name_platform}-{name_fournisseur}_valeurs_identiques.csv', index=False)
+        df_platform[QUANTITY] = new_qty.combine_first(old_qty)
 
         return df_platform, stock_changes
     except Exception as e:
         logger.error(f"-- -- ❌ -- --  Erreur lors de la mise à jour de fichier...: {e}")
-        return None, []
+        return None, empty_stock_changes()
 
 
 # =========================================================================================
@@ -152,73 +168,224 @@ def mettre_a_jour_Stock_old(valide_fichiers_platforms, valide_fichiers_fournisse
 
 
 
-def read_fournisseur(data_f):
+# ------------------------------------------------------------------------------
+#          Paramètres de traitement (config/processing_settings.yaml)
+# ------------------------------------------------------------------------------
+PROCESSING_SETTINGS_DEFAULTS = {
+    'platform_workers': 1,
+    'supplier_workers': 1,
+    'csv_patch_mode': True,
+}
+
+
+def load_processing_settings():
+    """Charge config/processing_settings.yaml en complétant avec les valeurs par défaut."""
+    settings = dict(PROCESSING_SETTINGS_DEFAULTS)
+    settings.update(load_yaml_config(CONFIG / "processing_settings.yaml") or {})
+    return settings
+
+
+def resolve_worker_count(value, n_jobs):
+    """0 = un process par cœur ; le résultat est borné par le nombre de tâches."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = 1
+    if value <= 0:
+        value = os.cpu_count() or 1
+    return max(1, min(value, n_jobs))
+
+
+# ------------------------------------------------------------------------------
+#          Lecture des fournisseurs (en série ou dans un pool de process)
+# ------------------------------------------------------------------------------
+def _read_fournisseur_file(file_path, nom_reference_f, quantite_stock_f, header='infer', entity=None):
+    """
+    Lit un fichier fournisseur (colonnes référence/quantité mappées uniquement),
+    depuis le cache de lecture si le même contenu a déjà été lu avec les mêmes colonnes.
+    Returns: {'reduced_data': DataFrame[ID_Product, Quantity] (IDs canoniques, stock entier),
+              'ref', 'qte': colonnes source, 'sep', 'encoding'}
+    """
+    params = {'kind': 'fournisseur', 'ref': nom_reference_f, 'qte': quantite_stock_f, 'header': header}
+    return cached_read(
+        file_path, params,
+        lambda: _parse_fournisseur_file(file_path, nom_reference_f, quantite_stock_f, header, entity),
+        'reduced_data',
+    )
+
+
+def _parse_fournisseur_file(file_path, nom_reference_f, quantite_stock_f, header='infer', entity=None):
+    df_f_info = read_dataset_columns(file_path, [nom_reference_f, quantite_stock_f], header=header, entity=entity)
+    df_f = df_f_info['dataset']
+    ref_col, qty_col = df_f_info['columns']
+    df_f[qty_col] = process_stock_series(df_f[qty_col])
+    reduced_cols_df = df_f[[ref_col, qty_col]].copy()
+    reduced_cols_df[qty_col] = reduced_cols_df[qty_col].astype(int)
+    reduced_cols_df.columns = [ID_PRODUCT, QUANTITY]
+    return {
+        'reduced_data': ensure_canonical_ids(reduced_cols_df),
+        'ref': ref_col,
+        'qte': qty_col,
+        'sep': df_f_info['sep'],
+        'encoding': df_f_info['encoding'],
+    }
+
+
+def _fournisseur_read_jobs(data_f, name=None):
+    """(file_path, nom_ref, nom_qte, header, entity) pour chaque fichier du fournisseur."""
+    entity = f"fournisseurs/{name}" if name else None
+    chemin_fichier_f = data_f['chemin_fichier']
+    header = None if data_f.get('no_header', False) else 'infer'
+    files = chemin_fichier_f if data_f.get('multi_file', False) and isinstance(chemin_fichier_f, list) else [chemin_fichier_f]
+    return [(file_path, data_f[YAML_REFERENCE_NAME], data_f[YAML_QUANTITY_NAME], header, entity) for file_path in files]
+
+
+def _assemble_fournisseur(data_f, parts):
+    """Construit le dict fournisseur à partir des fichiers lus (_read_fournisseur_file)."""
     chemin_fichier_f = data_f['chemin_fichier']
-    nom_reference_f = data_f[YAML_REFERENCE_NAME]    # nom_ref
-    quantite_stock_f = data_f[YAML_QUANTITY_NAME]       # nom_qte
-    no_header = data_f.get('no_header', False)
-    multi_file = data_f.get('multi_file', False)
-    header = None if no_header else 'infer'
-    if multi_file and isinstance(chemin_fichier_f, list):
-        # Process all files, concatenate, and sum stock per reference
-        dfs = []
-        for file_path in chemin_fichier_f:
-            df_f_info = read_dataset_file(file_name=file_path, header=header)
-            df_f = df_f_info['dataset'].copy()
-            ref_col = get_column_by_mapping(df_f, nom_reference_f)
-            qty_col = get_column_by_mapping(df_f, quantite_stock_f)
-            df_f[qty_col] = df_f[qty_col].apply(process_stock_value)
-            reduced_cols_df = df_f[[ref_col, qty_col]].copy()
-            reduced_cols_df[qty_col] = reduced_cols_df[qty_col].astype(int)
-            reduced_cols_df.columns = [ID_PRODUCT, QUANTITY]
-            reduced_cols_df[ID_PRODUCT] = reduced_cols_df[ID_PRODUCT].apply(canonicalize_product_id)
-            dfs.append(reduced_cols_df)
-        if dfs:
-            all_data = pd.concat(dfs, ignore_index=True)
+    if data_f.get('multi_file', False) and isinstance(chemin_fichier_f, list):
+        if parts:
+            all_data = pd.concat([part['reduced_data'] for part in parts], ignore_index=True)
             # Sum stock per reference
-            reduced_cols_df = all_data.groupby(ID_PRODUCT, as_index=False)[QUANTITY].sum()
+            reduced_cols_df = mark_canonical_ids(all_data.groupby(ID_PRODUCT, as_index=False)[QUANTITY].sum())
         else:
             reduced_cols_df = pd.DataFrame(columns=[ID_PRODUCT, QUANTITY])
         return {
             'Chemin': chemin_fichier_f,
             'ref': ID_PRODUCT,
             'qte': QUANTITY,
-            'main_data': reduced_cols_df,  # données brutes
+            'main_data': reduced_cols_df,
             'reduced_data': reduced_cols_df,  # données nettoyées
             'sep': None,
             'encoding': None
         }
-    else:
-        df_f_info = read_dataset_file(file_name=chemin_fichier_f, header=header)   # df_info
-        pd.set_option('display.max_columns', None) 
-        df_f = df_f_info['dataset'].copy()  # df
-        # Use new helper for mapping by index or name
-        ref_col = get_column_by_mapping(df_f, nom_reference_f)
-        qty_col = get_column_by_mapping(df_f, quantite_stock_f)
-        df_f[qty_col] = df_f[qty_col].apply(process_stock_value)   # df[nom_qte]
-        reduced_cols_df = df_f[[ref_col, qty_col]].copy()
-        reduced_cols_df[qty_col] = reduced_cols_df[qty_col].astype(int)
-        reduced_cols_df.columns = [ID_PRODUCT, QUANTITY]
-        reduced_cols_df[ID_PRODUCT] = reduced_cols_df[ID_PRODUCT].apply(canonicalize_product_id)
-        return {
-            'Chemin': chemin_fichier_f,
-            'ref': ref_col,
-            'qte': qty_col,
-            'main_data': df_f,  # données brutes
-            'reduced_data': reduced_cols_df,  # données nettoyées
-            'sep': df_f_info['sep'],
-            'encoding': df_f_info['encoding']
-        }
+    part = parts[0]
+    return {
+        'Chemin': chemin_fichier_f,
+        'ref': part['ref'],
+        'qte': part['qte'],
+        'main_data': part['reduced_data'],  # seules les colonnes référence/quantité sont lues
+        'reduced_data': part['reduced_data'],  # données nettoyées
+        'sep': part['sep'],
+        'encoding': part['encoding']
+    }
+
+
+def read_fournisseur(data_f, name=None):
+    """name: nom du fournisseur, utilisé comme clé du cache de dialectes CSV."""
+    parts = [_read_fournisseur_file(*job) for job in _fournisseur_read_jobs(data_f, name)]
+    return _assemble_fournisseur(data_f, parts)
+
+
+def _fournisseur_file_worker(job):
+    recorder = ReportRecorder()
+    part = _read_fournisseur_file(*job)
+    return part, recorder.close()
+
+
+def read_all_fournisseurs(valide_fichiers_fournisseurs, report_gen=None, settings=None):
+    """
+    Lit tous les fournisseurs (clé = nom du fournisseur).
+    supplier_workers (config/processing_settings.yaml) > 1 : chaque fichier (y compris ceux
+    d'un fournisseur multi_file) est lu dans un pool de process qui ne renvoie que les
+    tableaux ID_Product/Quantity réduits. Si un process du pool meurt (BrokenProcessPool),
+    les fournisseurs restants sont lus en série dans le process courant.
+    Une erreur est rapportée par fournisseur ; s'il y en a, RuntimeError à la fin.
+    """
+    settings = settings or load_processing_settings()
+    jobs = {name: _fournisseur_read_jobs(data_f, name) for name, data_f in valide_fichiers_fournisseurs.items()}
+    workers = resolve_worker_count(settings.get('supplier_workers', 1), sum(len(j) for j in jobs.values()))
+    parts = {}
+    errors = {}
+
+    if workers > 1:
+        logger.info(f"⚡ Lecture de {len(jobs)} fournisseurs sur {workers} process")
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {name: [executor.submit(_fournisseur_file_worker, job) for job in name_jobs]
+                           for name, name_jobs in jobs.items()}
+                for name, name_futures in futures.items():
+                    try:
+                        results = [future.result() for future in name_futures]
+                        for _, recorder in results:
+                            recorder.replay()
+                        parts[name] = [part for part, _ in results]
+                    except BrokenProcessPool:
+                        raise  # process mort : pas une erreur de ce fournisseur, les restants sont relus en série
+                    except Exception as e:
+                        errors[name] = e
+        except (OSError, BrokenProcessPool) as e:
+            logger.warning(f"-- ⚠️ --  Pool de process indisponible ({e}), lecture en série des fournisseurs restants")
+
+    for name, name_jobs in jobs.items():
+        if name in parts or name in errors:
+            continue
+        try:
+            parts[name] = [_read_fournisseur_file(*job) for job in name_jobs]
+        except Exception as e:
+            errors[name] = e
 
+    for name, e in errors.items():
+        logger.error(f"-- -- ❌ -- --  Lecture impossible pour le fournisseur {name}: {e}")
+        if report_gen:
+            report_gen.add_error(f"Erreur lecture fournisseur {name}: {e}")
+    if errors:
+        raise RuntimeError(f"Lecture impossible pour: {', '.join(errors)}")
+
+    return {name: _assemble_fournisseur(valide_fichiers_fournisseurs[name], parts[name]) for name in jobs}
+
+
+# ------------------------------------------------------------------------------
+#      Pipeline téléchargement ==> lecture (fournisseur N lu pendant N+1 arrive)
+# ------------------------------------------------------------------------------
+def load_and_read_fournisseurs(list_fournisseurs, report_gen=None):
+    """
+    Télécharge les fournisseurs (producteur, threads FTP) et lit chaque fichier dès qu'il
+    arrive (consommateur, thread appelant) via une file : la lecture des références/quantités
+    d'un fournisseur se fait pendant que les suivants sont encore en téléchargement.
+    Returns:
+        (fichiers_fournisseurs, data_fournisseurs)
+        fichiers_fournisseurs: même dict que load_fournisseurs_ftp
+        data_fournisseurs: même dict que read_all_fournisseurs, pour les fournisseurs lus avec succès
+    """
+    ready = queue.Queue()
+    finished = object()
+    produced = {}
+
+    def _produce():
+        try:
+            produced['files'] = load_fournisseurs_ftp(
+                list_fournisseurs,
+                report_gen=report_gen,
+                on_ready=lambda name, chemin: ready.put((name, chemin)),
+            )
+        except Exception as e:
+            logger.error(f"-- ❌ --  Erreur lors du téléchargement des fournisseurs: {e}")
+            if report_gen:
+                report_gen.add_error(f"Erreur téléchargement fournisseurs: {e}")
+        finally:
+            ready.put(finished)
 
-def read_all_fournisseurs(valide_fichiers_fournisseurs):
-    data_fournisseurs = {}
-    # Use actual supplier names as keys (instead of Fournisseur1, ...)
-    for name, data_f in valide_fichiers_fournisseurs.items():
-        data_fournisseurs[name] = read_fournisseur(data_f)
+    producer = threading.Thread(target=_produce, name="ftp-fournisseurs", daemon=True)
+    producer.start()
 
-    #print('\n\nhere \n', data_fournisseurs['Fournisseur1']['reduced_data'].head())
-    return data_fournisseurs
+    data_fournisseurs = {}
+    while True:
+        item = ready.get()
+        if item is finished:
+            break
+        name, chemin = item
+        infos = verifier_fichiers_existent(keep_data_with_header_specified({name: chemin}))
+        if name not in infos:
+            continue
+        try:
+            data_fournisseurs[name] = read_fournisseur(infos[name], name)
+            logger.info(f"-- ✅ --  Fournisseur lu pendant les téléchargements : {name}")
+        except Exception as e:
+            # La lecture sera retentée (et l'erreur rapportée) par mettre_a_jour_Stock
+            logger.warning(f"-- ⚠️ --  Lecture anticipée impossible pour {name}: {e}")
+    producer.join()
+    return produced.get('files', {}), data_fournisseurs
 
 
 def cumule_fournisseurs(data_fournisseurs):
@@ -243,13 +410,13 @@ def cumule_fournisseurs(data_fournisseurs):
     #print(df_all_fournisseus.shape)
 
     # Force canonical ID_PRODUCT
-    df_all_fournisseus[ID_PRODUCT] = df_all_fournisseus[ID_PRODUCT].apply(canonicalize_product_id)
+    ensure_canonical_ids(df_all_fournisseus)
     logger.debug(f"[DEBUG] ID_PRODUCT dtype: {df_all_fournisseus[ID_PRODUCT].dtype}, unique: {df_all_fournisseus[ID_PRODUCT].unique()[:10]}")
     # Debug before sort/groupby
     logger.debug(f"[DEBUG] cumule_fournisseurs: df_all_fournisseus[QUANTITY] dtype: {df_all_fournisseus[QUANTITY].dtype}, unique values: {df_all_fournisseus[QUANTITY].unique()[:10]}")
     try:
         df_all_fournisseus = df_all_fournisseus.sort_values(by=ID_PRODUCT, ascending=True)
-        df_cumule = df_all_fournisseus.groupby(ID_PRODUCT, as_index=False)[QUANTITY].sum()
+        df_cumule = mark_canonical_ids(df_all_fournisseus.groupby(ID_PRODUCT, as_index=False)[QUANTITY].sum())
     except Exception as e:
         logger.error(f"[DEBUG] Error during aggregation in cumule_fournisseurs: {e}")
         logger.error(f"[DEBUG] Problematic values: {df_all_fournisseus[QUANTITY].unique()[:20]}")
@@ -266,7 +433,7 @@ def cumule_fournisseurs(data_fournisseurs):
             else:
                 chemin_for_name = chemin
             # Force canonical ID for merge
-            df[ID_PRODUCT] = df[ID_PRODUCT].apply(canonicalize_product_id)
+            ensure_canonical_ids(df)
             df_merged = df.merge(df_cumule, left_on=df[ID_PRODUCT], right_on=ID_PRODUCT, how='left', suffixes=('', '_Fourniss_After_Cumule'))
             df_merged[infos['qte']] = df_merged[QUANTITY+'_Fourniss_After_Cumule']
             df_final = df_merged.drop(columns=[ID_PRODUCT+'_Fourniss_After_Cumule'])
@@ -282,104 +449,237 @@ def cumule_fournisseurs(data_fournisseurs):
 
 
 def collect_supplier_details(data_fournisseurs):
-    """Collects individual supplier stock for each product"""
-    supplier_details = {}
-    for supplier_name, data in data_fournisseurs.items():
-        for _, row in data['reduced_data'].iterrows():
-            product_id = canonicalize_product_id(row[ID_PRODUCT])
-            quantity = row[QUANTITY]
-            if product_id not in supplier_details:
-                supplier_details[product_id] = {}
-            supplier_details[product_id][supplier_name] = quantity
-    return supplier_details
-
-def mettre_a_jour_Stock(valide_fichiers_platforms, valide_fichiers_fournisseurs, report_gen=None):
+    """Collects individual supplier stock for each product (matrice produits × fournisseurs)"""
+    for data in data_fournisseurs.values():
+        ensure_canonical_ids(data['reduced_data'])
+    return SupplierStockMatrix.from_fournisseurs(data_fournisseurs)
+
+def _patch_platform_csv(chemin_fichier_p, latest_file, archive_file, df_p_info, df_p, quantite_stock_p, stock_before_p):
+    """
+    Écrit le -latest en copiant le CSV d'origine et en ne réécrivant que les cellules de stock
+    dont la valeur normalisée a changé (voir patch_csv_column). Returns: chemin écrit, None si impossible.
+    """
+    stock_after = df_p[quantite_stock_p].to_numpy()
+    changed_rows = np.flatnonzero(stock_before_p != stock_after)
+    patches = {int(row): str(int(stock_after[row])) for row in changed_rows}
+    has_header = not all(isinstance(col, (int, np.integer)) for col in df_p.columns)
+    return patch_csv_file_and_archive(
+        chemin_fichier_p, str(latest_file), None if archive_file is None else str(archive_file),
+        df_p_info['encoding'], df_p_info['sep'], df_p_info['positions'][1], patches,
+        has_header=has_header, n_rows=len(df_p),
+    )
+
+
+def _full_platform_frame(chemin_fichier_p, name_p, df_p_info, stock_after):
+    """Repli du mode patch : fichier plateforme complet avec la colonne de stock mise à jour."""
+    df_full = read_dataset_file(file_name=chemin_fichier_p, entity=f"plateformes/{name_p}")['dataset']
+    if len(df_full) != len(stock_after):
+        raise ValueError(f"{len(df_full)} lignes relues pour {name_p}, {len(stock_after)} attendues")
+    df_full[df_full.columns[df_p_info['positions'][1]]] = stock_after.to_numpy()
+    return df_full
+
+
+def update_one_platform(name_p, data_p, supplier_index, report_gen=None):
+    """
+    Met à jour une plateforme (lecture, normalisation, recherche dans l'index fournisseurs,
+    écriture des fichiers -latest et archive). Indépendante des autres plateformes :
+    appelée en série ou dans un process worker (report_gen est alors un ReportRecorder).
+    Returns: True si les fichiers de la plateforme ont été écrits.
+    """
+    try:
+        chemin_fichier_p = data_p['chemin_fichier']
+        nom_reference_p = data_p[YAML_REFERENCE_NAME]
+        quantite_stock_p = data_p[YAML_QUANTITY_NAME]
+        platform_ext = Path(chemin_fichier_p).suffix.lower()
+        # CSV : seules les colonnes référence/quantité sont lues, le fichier d'origine est patché à l'écriture
+        patch_csv = platform_ext in CSV_EXTENSIONS and bool(load_processing_settings().get('csv_patch_mode'))
+        if patch_csv:
+            df_p_info = cached_read(
+                chemin_fichier_p, {'kind': 'plateforme', 'columns': [nom_reference_p, quantite_stock_p]},
+                lambda: read_dataset_columns(chemin_fichier_p, [nom_reference_p, quantite_stock_p], entity=f"plateformes/{name_p}"),
+                'dataset',
+            )
+            nom_reference_p, quantite_stock_p = df_p_info['columns']
+        else:
+            df_p_info = cached_read(
+                chemin_fichier_p, {'kind': 'plateforme'},
+                lambda: read_dataset_file(file_name=chemin_fichier_p, entity=f"plateformes/{name_p}"),
+                'dataset',
+            )
+        df_p = df_p_info['dataset']
+        sep_p = df_p_info['sep']
+        encoding_p = df_p_info['encoding']
+        # NaN/None -> 0, '>10' -> 10, ... (voir process_stock_value)
+        df_p[quantite_stock_p] = process_stock_series(df_p[quantite_stock_p])
+        stock_before_p = df_p[quantite_stock_p].to_numpy()
+        logger.debug(f"[DEBUG] Platform '{name_p}' stock column dtype: {df_p[quantite_stock_p].dtype}, unique values: {df_p[quantite_stock_p].unique()[:10]}")
+        # IDs canoniques calculés une seule fois pour la recherche dans l'index fournisseurs
+        canon_ids_p = canonicalize_product_ids(df_p[nom_reference_p])
+        reduced_data_p = pd.DataFrame({ID_PRODUCT: canon_ids_p, QUANTITY: df_p[quantite_stock_p]})
+        mark_canonical_ids(reduced_data_p)
+        logger.debug(f"[DEBUG] reduced_data_p[QUANTITY] dtype: {reduced_data_p[QUANTITY].dtype}, unique values: {reduced_data_p[QUANTITY].unique()[:10]}")
+        try:
+            df_updated, stock_changes = update_plateforme(reduced_data_p, supplier_index, name_p, 'cumule')
+        except Exception as merge_exc:
+            logger.error(f"[MERGE ERROR] Platform {name_p}: {merge_exc}")
+            if report_gen:
+                report_gen.add_file_result(str(latest_file) if 'latest_file' in locals() else name_p, success=False, error_msg=f"Merge error: {merge_exc}")
+            return False  # Skip this platform
+        if df_updated is None:
+            logger.error(f"[SKIP] Platform {name_p}: update_plateforme returned None.")
+            if report_gen:
+                report_gen.add_file_result(str(latest_file) if 'latest_file' in locals() else name_p, success=False, error_msg="update_plateforme returned None.")
+            return False
+        reduced_data_p = df_updated
+
+        # Add stock changes to report
+        if report_gen and not stock_changes.empty:
+            report_gen.add_stock_changes(stock_changes)
+        if nom_reference_p is None or quantite_stock_p is None:
+            logger.error(f"[SKIP] Platform {name_p}: Mapping extraction failed (nom_reference_p or quantite_stock_p is None)")
+            if report_gen:
+                report_gen.add_file_result(str(latest_file) if 'latest_file' in locals() else name_p, success=False, error_msg="Mapping extraction failed.")
+            return False
+        # reduced_data_p garde les lignes (et l'index) de df_p : report direct par position
+        df_p[quantite_stock_p] = reduced_data_p[QUANTITY].to_numpy()
+        platform_dir = UPDATED_FILES_PATH / name_p
+        platform_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = time.strftime('%Y%m%d-%H%M%S')
+        # Build output file paths with same extension
+        latest_file = platform_dir / f"{name_p}-latest{platform_ext}"
+        # Archive dans le magasin compressé (backup/store) si activé, sinon fichier horodaté à côté du -latest
+        archive_store = get_archive_store()
+        archive_file = None if archive_store is not None else platform_dir / f"{name_p}-{timestamp}{platform_ext}"
+        force_excel = platform_ext in {'.xls', '.xlsx'}
+        saved = None
+        if patch_csv:
+            saved = _patch_platform_csv(chemin_fichier_p, latest_file, archive_file, df_p_info, df_p,
+                                        quantite_stock_p, stock_before_p)
+            if not saved:
+                df_p = _full_platform_frame(chemin_fichier_p, name_p, df_p_info, df_p[quantite_stock_p])
+        # Sérialisé une seule fois : l'archive est un lien physique (ou une copie) du -latest
+        if not saved:
+            saved = save_file_and_archive(str(latest_file), None if archive_file is None else str(archive_file), df_p, encoding=encoding_p, sep=sep_p, force_excel=force_excel)
+            if not saved:
+                raise OSError(f"Enregistrement impossible : {latest_file}")
+        latest_file = saved  # chemin réellement écrit (.xlsx si force_excel)
+        if archive_store is not None:
+            try:
+                archive_store.put_file('archive', name_p, timestamp, latest_file)
+            except OSError as e:
+                logger.warning(f"-- ⚠️ --  Archivage impossible pour {name_p}: {e}")
+        logger.info(f"-- -- ✅ -- --  Mise à jour effectuée et fichiers sauvegardés pour : {name_p}")
+        if report_gen:
+            report_gen.add_platform_processed(name_p)
+            report_gen.add_file_result(str(latest_file), success=True)
+            # The actual count of updated products is now handled by add_stock_changes
+        return True
+    except Exception as e:
+        logger.error(f"Erreur lors de la mise à jour de la plateforme {name_p}: {e}")
+        if 'df_p' in locals():
+            logger.error(f"[DEBUG] Platform '{name_p}' DataFrame: {df_p.head()}")
+        if report_gen:
+            report_gen.add_file_result(str(latest_file) if 'latest_file' in locals() else name_p, success=False, error_msg=str(e))
+            report_gen.add_error(f"Erreur mise à jour plateforme {name_p}: {e}")
+        return False
+
+
+# ------------------------------------------------------------------------------
+#        Mise à jour des plateformes en parallèle (pool de process)
+# ------------------------------------------------------------------------------
+# Index fournisseurs du process worker (reçu une seule fois par l'initializer du pool)
+_WORKER_SUPPLIER_INDEX = None
+
+
+def _init_platform_worker(supplier_index):
+    global _WORKER_SUPPLIER_INDEX
+    _WORKER_SUPPLIER_INDEX = supplier_index
+
+
+def _platform_worker(name_p, data_p):
+    recorder = ReportRecorder()
+    success = update_one_platform(name_p, data_p, _WORKER_SUPPLIER_INDEX, recorder)
+    return success, recorder.close()
+
+
+def run_platform_updates(valide_fichiers_platforms, supplier_index, report_gen=None, settings=None):
+    """
+    Met à jour chaque plateforme avec update_one_platform.
+    platform_workers <= 1 (défaut) : en série dans ce process.
+    Sinon : pool de process ; l'index fournisseurs est transmis une fois par worker
+    (initializer), chaque worker renvoie un ReportRecorder rejoué ici dans l'ordre des plateformes.
+    Returns:
+        {'NAME': True/False} dans l'ordre de valide_fichiers_platforms
+    """
+    settings = settings or load_processing_settings()
+    workers = resolve_worker_count(settings.get('platform_workers', 1), len(valide_fichiers_platforms))
+    if workers <= 1:
+        return {
+            name_p: update_one_platform(name_p, data_p, supplier_index, report_gen)
+            for name_p, data_p in valide_fichiers_platforms.items()
+        }
+
+    logger.info(f"⚡ Mise à jour de {len(valide_fichiers_platforms)} plateformes sur {workers} process")
+    results = {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_platform_worker,
+                                 initargs=(supplier_index,)) as executor:
+            futures = {
+                name_p: executor.submit(_platform_worker, name_p, data_p)
+                for name_p, data_p in valide_fichiers_platforms.items()
+            }
+            for name_p, future in futures.items():
+                try:
+                    success, recorder = future.result()
+                    recorder.replay(report_gen)
+                    results[name_p] = success
+                except BrokenProcessPool:
+                    raise  # process mort : les plateformes restantes sont traitées en série ci-dessous
+                except Exception as e:
+                    logger.error(f"-- -- ❌ -- --  Worker en échec pour la plateforme {name_p}: {e}")
+                    if report_gen:
+                        report_gen.add_file_result(name_p, success=False, error_msg=str(e))
+                        report_gen.add_error(f"Erreur mise à jour plateforme {name_p}: {e}")
+                    results[name_p] = False
+    except (OSError, BrokenProcessPool) as e:
+        # Pool impossible à démarrer ou process mort : les plateformes restantes sont traitées en série
+        logger.warning(f"-- ⚠️ --  Pool de process indisponible ({e}), mise à jour en série")
+        for name_p, data_p in valide_fichiers_platforms.items():
+            if name_p not in results:
+                results[name_p] = update_one_platform(name_p, data_p, supplier_index, report_gen)
+    return results
+
+
+def mettre_a_jour_Stock(valide_fichiers_platforms, valide_fichiers_fournisseurs, report_gen=None, data_fournisseurs=None):
+    """
+    data_fournisseurs: fournisseurs déjà lus (ex: load_and_read_fournisseurs) ;
+                       seuls les fournisseurs valides absents de ce dict sont relus.
+    """
     logger.info('--------------------- Mettre A Jour le Stock -------------------')
     if len(valide_fichiers_platforms) > 0 and len(valide_fichiers_fournisseurs)> 0:
         try: 
-            data_fournisseurs = read_all_fournisseurs(valide_fichiers_fournisseurs)
+            preloaded = data_fournisseurs or {}
+            data_fournisseurs = {name: preloaded[name] for name in valide_fichiers_fournisseurs if name in preloaded}
+            data_fournisseurs.update(read_all_fournisseurs({
+                name: data_f for name, data_f in valide_fichiers_fournisseurs.items() if name not in data_fournisseurs
+            }, report_gen=report_gen))
             if report_gen is not None:
                 try:
                     report_gen.stats['all_suppliers'] = set(data_fournisseurs.keys())
                 except Exception:
                     report_gen.stats['all_suppliers'] = list(data_fournisseurs.keys())
             supplier_details = collect_supplier_details(data_fournisseurs)
+            if report_gen is not None:
+                report_gen.set_supplier_matrix(supplier_details)
             
             logger.info('----------- Calcule de cumule ------------------')
             data_fournisseurs_cumule = cumule_fournisseurs(data_fournisseurs)
-            for name_p, data_p in valide_fichiers_platforms.items():
-                try:
-                    chemin_fichier_p = data_p['chemin_fichier']
-                    nom_reference_p = data_p[YAML_REFERENCE_NAME]
-                    quantite_stock_p = data_p[YAML_QUANTITY_NAME]
-                    df_p_info = read_dataset_file(file_name=chemin_fichier_p)
-                    df_p = df_p_info['dataset']
-                    sep_p = df_p_info['sep']
-                    encoding_p = df_p_info['encoding']
-                    # Handle NaN/None before processing
-                    df_p[quantite_stock_p] = df_p[quantite_stock_p].fillna(0)
-                    df_p[quantite_stock_p] = df_p[quantite_stock_p].apply(process_stock_value)
-                    logger.debug(f"[DEBUG] Platform '{name_p}' stock column dtype: {df_p[quantite_stock_p].dtype}, unique values: {df_p[quantite_stock_p].unique()[:10]}")
-                    reduced_data_p = df_p[[nom_reference_p, quantite_stock_p]].copy()
-                    reduced_data_p.columns = [ID_PRODUCT, QUANTITY]
-                    reduced_data_p[ID_PRODUCT] = reduced_data_p[ID_PRODUCT].apply(canonicalize_product_id)
-                    logger.debug(f"[DEBUG] reduced_data_p[QUANTITY] dtype: {reduced_data_p[QUANTITY].dtype}, unique values: {reduced_data_p[QUANTITY].unique()[:10]}")
-                    # Ensure canonical IDs before merging
-                    reduced_data_p[ID_PRODUCT] = reduced_data_p[ID_PRODUCT].apply(canonicalize_product_id)
-                    data_fournisseurs_cumule[ID_PRODUCT] = data_fournisseurs_cumule[ID_PRODUCT].apply(canonicalize_product_id)
-                    try:
-                        df_updated, stock_changes = update_plateforme(reduced_data_p, data_fournisseurs_cumule, name_p, 'cumule', supplier_details=supplier_details)
-                    except Exception as merge_exc:
-                        logger.error(f"[MERGE ERROR] Platform {name_p}: {merge_exc}")
-                        if report_gen:
-                            report_gen.add_file_result(str(latest_file) if 'latest_file' in locals() else name_p, success=False, error_msg=f"Merge error: {merge_exc}")
-                        continue  # Skip this platform
-                    if df_updated is None:
-                        logger.error(f"[SKIP] Platform {name_p}: update_plateforme returned None.")
-                        if report_gen:
-                            report_gen.add_file_result(str(latest_file) if 'latest_file' in locals() else name_p, success=False, error_msg="update_plateforme returned None.")
-                        continue
-                    reduced_data_p = df_updated
-                    
-                    # Add stock changes to report
-                    if report_gen and stock_changes:
-                        report_gen.add_stock_changes(stock_changes)
-                    map_quantites = dict(zip(reduced_data_p[ID_PRODUCT], reduced_data_p[QUANTITY]))
-                    if nom_reference_p is None or quantite_stock_p is None:
-                        logger.error(f"[SKIP] Platform {name_p}: Mapping extraction failed (nom_reference_p or quantite_stock_p is None)")
-                        if report_gen:
-                            report_gen.add_file_result(str(latest_file) if 'latest_file' in locals() else name_p, success=False, error_msg="Mapping extraction failed.")
-                        continue
-                    # Map using canonicalized platform reference
-                    try:
-                        canon_ref_col = '__canon_ref__'
-                        df_p[canon_ref_col] = df_p[nom_reference_p].apply(canonicalize_product_id)
-                        df_p[quantite_stock_p] = df_p[canon_ref_col].map(map_quantites).fillna(df_p[quantite_stock_p])
-                        df_p.drop(columns=[canon_ref_col], errors='ignore', inplace=True)
-                    except Exception:
-                        df_p[quantite_stock_p] = df_p[nom_reference_p].map(map_quantites).fillna(df_p[quantite_stock_p])
-                    platform_dir = UPDATED_FILES_PATH / name_p
-                    platform_dir.mkdir(parents=True, exist_ok=True)
-                    timestamp = time.strftime('%Y%m%d-%H%M%S')
-                    # Detect original extension
-                    platform_ext = Path(chemin_fichier_p).suffix.lower()
-                    # Build output file paths with same extension
-                    latest_file = platform_dir / f"{name_p}-latest{platform_ext}"
-                    archive_file = platform_dir / f"{name_p}-{timestamp}{platform_ext}"
-                    force_excel = platform_ext in {'.xls', '.xlsx'}
-                    save_file(str(latest_file), df_p, encoding=encoding_p, sep=sep_p, force_excel=force_excel)
-                    save_file(str(archive_file), df_p, encoding=encoding_p, sep=sep_p, force_excel=force_excel)
-                    logger.info(f"-- -- ✅ -- --  Mise à jour effectuée et fichiers sauvegardés pour : {name_p}")
-                    if report_gen:
-                        report_gen.add_platform_processed(name_p)
-                        report_gen.add_file_result(str(latest_file), success=True)
-                        # The actual count of updated products is now handled by add_stock_changes
-                except Exception as e:
-                    logger.error(f"Erreur lors de la mise à jour de la plateforme {name_p}: {e}")
-                    logger.error(f"[DEBUG] Platform '{name_p}' DataFrame: {df_p.head()}")
-                    if report_gen:
-                        report_gen.add_file_result(str(latest_file) if 'latest_file' in locals() else name_p, success=False, error_msg=str(e))
-                        report_gen.add_error(f"Erreur mise à jour plateforme {name_p}: {e}")
+            # Index immuable ID canonique -> quantité cumulée, partagé par toutes les plateformes
+            supplier_index = SupplierStockIndex.from_frame(data_fournisseurs_cumule)
+            logger.info(f"-- ✅ --  Index stock fournisseurs: {len(supplier_index)} produits")
+            results = run_platform_updates(valide_fichiers_platforms, supplier_index, report_gen)
+            logger.info(f"-- ✅ --  Plateformes mises à jour: {sum(results.values())}/{len(results)}")
+            apply_archive_retention()
             logger.info('---------------------------------------------------------------')
             logger.info('================================================================')
             return True
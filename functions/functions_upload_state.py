@@ -0,0 +1,68 @@
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from config.logging_config import logger
+from config.config_path_variables import UPLOAD_STATE_PATH
+
+
+# ------------------------------------------------------------------------------
+#       Dernier fichier publié sur chaque plateforme (hash du contenu envoyé)
+# ------------------------------------------------------------------------------
+class UploadState:
+    """
+    Mémorise, pour chaque plateforme, le hash (sha256) du dernier fichier envoyé avec succès
+    sur son FTP : un fichier -latest identique n'est pas renvoyé au run suivant.
+
+    Structure de cache/uploads.json:
+        {'AMAZON': {'sha256': '...', 'host': 'ftp.exemple.com', 'remote_file': 'stock.csv',
+                    'local_file': 'AMAZON-latest.csv', 'uploaded_at': '...'}}
+    """
+
+    def __init__(self, path=UPLOAD_STATE_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.platforms = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.platforms = json.load(f) or {}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"-- ⚠️ --  État des envois illisible, tous les fichiers seront renvoyés: {e}")
+
+    def save(self):
+        with self._lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix('.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.platforms, f, ensure_ascii=False, indent=1)
+                tmp_path.replace(self.path)
+            except Exception as e:
+                logger.warning(f"-- ⚠️ --  Impossible d'enregistrer l'état des envois: {e}")
+
+    def is_unchanged(self, platform, digest, host):
+        """True si ce contenu est exactement celui déjà envoyé sur ce même hôte."""
+        with self._lock:
+            entry = self.platforms.get(platform)
+        return bool(entry) and entry.get('sha256') == digest and entry.get('host') == host
+
+    def record(self, platform, digest, host, remote_file, local_file):
+        with self._lock:
+            self.platforms[platform] = {
+                'sha256': digest,
+                'host': host,
+                'remote_file': remote_file,
+                'local_file': Path(local_file).name,
+                'uploaded_at': datetime.now().isoformat(timespec='seconds'),
+            }
+
+    def forget(self, platform):
+        """Envoi en échec : le contenu distant est inconnu, le prochain fichier sera envoyé."""
+        with self._lock:
+            self.platforms.pop(platform, None)
@@ -13,6 +13,10 @@ from config.temporary_data_list import current_dataFiles
 from config.config_path_variables import *
 from config.logging_config import LOG_FILEPATH
 from functions.functions_FTP import upload_updated_files_to_marketplace
+from functions.functions_ftp_pool import close_run_pool
+from functions.functions_s3_backup import close_s3_backup
+from functions.functions_ftp_manifest import reset_run_manifest
+from functions.functions_history import record_run_history
 from functions.functions_report import ReportGenerator
 from utils import load_fournisseurs_config, load_plateformes_config, get_valid_fournisseurs, get_valid_platforms
 
@@ -307,7 +311,7 @@ class MajFTPFrame(ctk.CTkFrame):
             if is_store_updated:
 
                 logger.info('-- -- ✅ -- --  Mise à jour effectuée -- -- ✅ -- -- ')
-                upload_updated_files_to_marketplace(dry_run=False)
+                upload_updated_files_to_marketplace(dry_run=False, report_gen=report_gen)
                 messagebox.showinfo("Succès", "✅ La mise à jour a été effectuée avec succès.\nFiles have been uploaded to marketplaces FTP.")
                  
                 # Supprimer ancien bouton s'il existe
@@ -336,7 +340,11 @@ class MajFTPFrame(ctk.CTkFrame):
             # Fin du suivi
             self.log_running = False
         finally:
+            close_run_pool()
+            close_s3_backup()
+            reset_run_manifest()
             report_gen.end_operation()
+            record_run_history(report_gen)
             try:
                 report_gen.generate_html_report()
                 sent = report_gen.send_email_report()
@@ -1,5 +1,6 @@
 import os 
 import sys 
+import multiprocessing
 import customtkinter as ctk
 from PIL import Image
 from pathlib import Path
@@ -157,6 +158,7 @@ class MainApp(ctk.CTk):
     """
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # exécutable PyInstaller + pool de process
     try:
         app = MainApp()
         app.mainloop()
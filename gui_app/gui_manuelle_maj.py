@@ -271,7 +271,7 @@ class MajManuelleFrame(ctk.CTkFrame):
     def process_manual_update(self, platform, supplier_file_path):
         # This function should use the same cumule/processing logic as the main script, but for manual update
         # You can adapt cumule_fournisseurs, mettre_a_jour_Stock, etc. for this context
-        from utils import get_entity_mappings, read_dataset_file
+        from utils import get_entity_mappings, read_dataset_file, save_file_and_archive
         from functions.functions_update import update_plateforme
         from config.config_path_variables import UPDATED_FILES_PATH
         import pandas as pd
@@ -314,8 +314,9 @@ class MajManuelleFrame(ctk.CTkFrame):
             timestamp = time.strftime('%Y%m%d-%H%M%S')
             latest_file = platform_dir / f"{platform}-latest.csv"
             archive_file = platform_dir / f"{platform}-{timestamp}.csv"
-            platform_df.to_csv(latest_file, index=False)
-            platform_df.to_csv(archive_file, index=False)
+            # -latest jamais réécrit en place : il peut être lié (lien physique) à une archive
+            if not save_file_and_archive(str(latest_file), str(archive_file), platform_df):
+                return f"Enregistrement impossible : {latest_file}"
             return True
         except Exception as e:
             return str(e)
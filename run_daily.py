@@ -1,5 +1,6 @@
 import sys
 import argparse
+import multiprocessing
 import shutil
 from pathlib import Path
 
@@ -11,8 +12,12 @@ from functions.functions_FTP import (
     load_platforms_ftp,
     upload_updated_files_to_marketplace,
 )
+from functions.functions_ftp_pool import close_run_pool
+from functions.functions_s3_backup import close_s3_backup
+from functions.functions_history import record_run_history
+from functions.functions_ftp_manifest import get_run_manifest, reset_run_manifest
 from functions.functions_check_ready_files import check_ready_files
-from functions.functions_update import mettre_a_jour_Stock
+from functions.functions_update import mettre_a_jour_Stock, load_and_read_fournisseurs
 from utils import load_fournisseurs_config, load_plateformes_config
 
 
@@ -37,6 +42,16 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Do not actually upload updated files to platform FTP (log only)",
     )
+    parser.add_argument(
+        "--force-upload",
+        action="store_true",
+        help="Upload every platform file even if its content is unchanged since the last upload",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Parse each supplier file as soon as it is downloaded, while the next ones are still downloading",
+    )
     parser.add_argument(
         "--no-email",
         action="store_true",
@@ -97,9 +112,21 @@ def main() -> int:
     try:
         logger.info("==== Start headless update run ====")
         # 1) Download latest inputs via FTP
-        fichiers_fournisseurs = load_fournisseurs_ftp(list_fournisseurs, report_gen=report_gen)
+        data_fournisseurs = None
+        if args.pipeline:
+            fichiers_fournisseurs, data_fournisseurs = load_and_read_fournisseurs(list_fournisseurs, report_gen=report_gen)
+        else:
+            fichiers_fournisseurs = load_fournisseurs_ftp(list_fournisseurs, report_gen=report_gen)
         fichiers_platforms = load_platforms_ftp(list_platforms, report_gen=report_gen)
 
+        # Incremental sync: nothing republished since the last complete run => nothing to do
+        manifest = get_run_manifest()
+        if manifest.nothing_changed() and not report_gen.stats['files_failed']:
+            logger.info("[INFO]: No supplier or platform file changed since the last complete run. Skipping update and upload.")
+            report_gen.add_warning("Aucun fichier fournisseur/plateforme modifié depuis le dernier run : mise à jour ignorée.")
+            manifest.mark_complete()
+            return 0
+
         # 2) Validate readiness
         fournisseurs_files_valides = check_ready_files(
             title_files="Fournisseurs", downloaded_files=fichiers_fournisseurs, report_gen=report_gen
@@ -110,12 +137,20 @@ def main() -> int:
 
         # 3) Update stock and write outputs
         is_store_updated = mettre_a_jour_Stock(
-            platforms_files_valides, fournisseurs_files_valides, report_gen=report_gen
+            platforms_files_valides, fournisseurs_files_valides, report_gen=report_gen,
+            data_fournisseurs=data_fournisseurs,
         )
 
         # 4) Upload updated files to platform FTP (unless dry run)
         if is_store_updated:
-            upload_updated_files_to_marketplace(dry_run=args.dry_run_upload)
+            upload_results = upload_updated_files_to_marketplace(
+                dry_run=args.dry_run_upload, report_gen=report_gen, force=args.force_upload
+            )
+            failed_uploads = [name for name, result in upload_results.items() if result['status'] == 'failed']
+            if failed_uploads:
+                logger.error(f"[ERROR]: Upload failed for: {', '.join(failed_uploads)}")
+            elif not args.dry_run_upload:
+                manifest.mark_complete()
         else:
             logger.error("[ERROR]: Store update failed. Skipping upload.")
 
@@ -126,7 +161,11 @@ def main() -> int:
         report_gen.add_error(str(e))
         return 1
     finally:
+        close_run_pool()
+        close_s3_backup()
+        reset_run_manifest()
         report_gen.end_operation()
+        record_run_history(report_gen)
         # Always try to build the HTML report; optionally send email
         try:
             report_gen.generate_html_report()
@@ -137,6 +176,7 @@ def main() -> int:
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # exécutable PyInstaller + pool de process
     sys.exit(main())
 
 
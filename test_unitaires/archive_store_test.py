@@ -0,0 +1,34 @@
+from functions.functions_archive_store import ArchiveStore
+
+
+def archive(store, tmp_path, timestamp, content, platform="AMAZON"):
+    source = tmp_path / f"{platform}-latest.csv"
+    source.write_bytes(content)
+    return store.put_file('archive', platform, timestamp, source)
+
+
+def test_identical_versions_are_stored_once(tmp_path):
+    store = ArchiveStore(tmp_path / "store")
+    assert archive(store, tmp_path, "20250101-080000", b"sku;qty\nA;1\n")
+    assert not archive(store, tmp_path, "20250101-090000", b"sku;qty\nA;1\n")
+    assert archive(store, tmp_path, "20250101-100000", b"sku;qty\nA;2\n")
+    assert archive(store, tmp_path, "20250101-110000", b"sku;qty\nA;1\n")
+    assert [e['timestamp'] for e in store.entries('archive', 'AMAZON')] == ["20250101-080000", "20250101-100000", "20250101-110000"]
+    assert len(list(store.root.glob("blobs/*/*.gz"))) == 2
+
+    restored = store.restore(store.find('AMAZON', timestamp="20250101-103000"), tmp_path / "restored.csv")
+    assert restored.read_bytes() == b"sku;qty\nA;2\n"
+
+
+def test_retention_keeps_last_version_per_day_and_week(tmp_path):
+    store = ArchiveStore(tmp_path / "store")
+    # 2025-01-06 (lundi) -> 2025-01-19 : deux semaines ISO, deux versions par jour
+    for day in range(6, 20):
+        for hour in (8, 18):
+            archive(store, tmp_path, f"202501{day:02d}-{hour:02d}0000", f"{day}-{hour}".encode())
+    removed, deleted = store.apply_retention(keep_daily=3, keep_weekly=2)
+    kept = [e['timestamp'] for e in store.entries()]
+    # 3 derniers jours + dernière version de la semaine précédente (le 12)
+    assert kept == ["20250112-180000", "20250117-180000", "20250118-180000", "20250119-180000"]
+    assert (removed, deleted) == (24, 24)
+    assert len(list(store.root.glob("blobs/*/*.gz"))) == 4
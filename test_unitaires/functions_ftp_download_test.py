@@ -0,0 +1,66 @@
+import ftplib
+
+import pytest
+
+import functions.functions_FTP as F
+
+CONTENT = b"sku;qty\n" + b"".join(b"A%d;%d\n" % (i, i) for i in range(200))
+
+
+class DroppingFTP:
+    """Envoie le fichier par blocs et coupe la connexion après drop_after octets (None = jamais)."""
+
+    def __init__(self, drop_after=None, rest_supported=True):
+        self.drop_after = drop_after
+        self.rest_supported = rest_supported
+        self.rests = []
+
+    def voidcmd(self, cmd):
+        return "200 OK"
+
+    def size(self, name):
+        return len(CONTENT)
+
+    def retrbinary(self, cmd, callback, rest=None):
+        self.rests.append(rest)
+        if rest and not self.rest_supported:
+            raise ftplib.error_perm("502 REST non supporté")
+        sent = 0
+        for start in range(rest or 0, len(CONTENT), 64):
+            if self.drop_after is not None and sent >= self.drop_after:
+                raise ConnectionResetError("connexion coupée")
+            block = CONTENT[start:start + 64]
+            callback(block)
+            sent += len(block)
+
+
+@pytest.fixture(autouse=True)
+def ftp_settings(monkeypatch):
+    monkeypatch.setattr(F, "load_ftp_settings", lambda: {'download_retries': 3, 'retry_backoff': 0})
+    monkeypatch.setattr(F.time, "sleep", lambda s: None)
+
+
+def test_resumes_at_offset_after_drop(tmp_path):
+    local = tmp_path / "stock.csv"
+    first, second = DroppingFTP(drop_after=256), DroppingFTP()
+    assert F.download_file_from_ftp(first, "stock.csv", str(local), reconnect=lambda: second)
+    assert first.rests == [None]
+    assert second.rests == [256]          # reprise à l'octet déjà reçu, sur la nouvelle connexion
+    assert local.read_bytes() == CONTENT
+    assert not (tmp_path / "stock.csv.part").exists()
+
+
+def test_restarts_from_zero_when_rest_refused(tmp_path):
+    local = tmp_path / "stock.csv"
+    connections = [DroppingFTP(rest_supported=False), DroppingFTP(rest_supported=False)]
+    first = DroppingFTP(drop_after=128)
+    assert F.download_file_from_ftp(first, "stock.csv", str(local), reconnect=connections.pop)
+    assert local.read_bytes() == CONTENT
+
+
+def test_failure_removes_part_file(tmp_path):
+    local = tmp_path / "stock.csv"
+    dead = DroppingFTP(drop_after=0)
+    assert not F.download_file_from_ftp(dead, "stock.csv", str(local), reconnect=lambda: dead)
+    assert dead.rests == [None, None, None]
+    assert not local.exists() and not (tmp_path / "stock.csv.part").exists()
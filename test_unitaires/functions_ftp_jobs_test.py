@@ -0,0 +1,46 @@
+import threading
+import time
+
+from functions.functions_FTP import run_ftp_jobs
+
+
+def test_per_host_limit_and_error_collection():
+    jobs = {f"A{i}": {'host': 'a'} for i in range(6)}
+    jobs.update({f"B{i}": {'host': 'b'} for i in range(3)})
+    jobs['A_ERR'] = {'host': 'a'}
+    lock = threading.Lock()
+    active = {'a': 0, 'b': 0}
+    peak = {'a': 0, 'b': 0}
+
+    def worker(name, config):
+        host = config['host']
+        with lock:
+            active[host] += 1
+            peak[host] = max(peak[host], active[host])
+        time.sleep(0.02)
+        with lock:
+            active[host] -= 1
+        if name == 'A_ERR':
+            raise ConnectionError("530 login refusé")
+        return name.lower()
+
+    errors = {}
+    results = run_ftp_jobs(jobs, worker, {'max_workers': 8, 'max_connections_per_host': 2}, errors=errors)
+
+    assert list(results) == list(jobs)
+    assert results['A0'] == 'a0' and results['B2'] == 'b2'
+    assert results['A_ERR'] is None
+    assert list(errors) == ['A_ERR'] and isinstance(errors['A_ERR'], ConnectionError)
+    assert peak['a'] == 2 and peak['b'] <= 2
+
+
+def test_host_slot_is_passed_when_not_held():
+    seen = []
+
+    def worker(name, config, host_slot):
+        with host_slot:
+            seen.append(name)
+        return True
+
+    assert run_ftp_jobs({'P1': {'host': 'h'}}, worker, {'max_workers': 2}, hold_host_slot=False) == {'P1': True}
+    assert seen == ['P1']
@@ -0,0 +1,38 @@
+from functions.functions_ftp_pool import FTPSession, FTPSessionPool
+
+
+class FakeSocket:
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+
+class FakeFTP:
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.sock = FakeSocket(timeout)
+
+    def voidcmd(self, cmd):
+        return "200 OK"
+
+    def quit(self):
+        pass
+
+
+def test_reused_session_gets_caller_timeout(monkeypatch):
+    def fake_connect(session):
+        session.ftp = FakeFTP(session.timeout)
+        return session.ftp
+
+    monkeypatch.setattr(FTPSession, "connect", fake_connect)
+    pool = FTPSessionPool()
+    with pool.session("h", "u", "p", timeout=5) as session:
+        first = session.ftp
+    with pool.session("h", "u", "p", timeout=30) as session:
+        assert session.ftp is first
+        assert session.timeout == 30
+        assert session.ftp.timeout == 30
+        assert session.ftp.sock.timeout == 30
+    assert pool.stats == {'opened': 1, 'reused': 1}
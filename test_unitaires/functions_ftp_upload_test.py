@@ -0,0 +1,132 @@
+import contextlib
+import ftplib
+
+import pytest
+
+import functions.functions_FTP as F
+from functions.functions_ftp_backup import RenameBackup
+
+
+class FakeFTP:
+    """Serveur FTP en mémoire ; fail_stor / fail_rename : nombre d'échecs à provoquer (-1 = toujours)."""
+
+    def __init__(self, files, fail_stor=0, fail_rename=0, on_block=None):
+        self.files = dict(files)
+        self.fail_stor = fail_stor
+        self.fail_rename = fail_rename
+        self.on_block = on_block
+        self.log = []
+
+    def nlst(self, path=None):
+        if path:
+            return [k[len(path) + 1:] for k in self.files if k.startswith(path + '/')]
+        return [k for k in self.files if '/' not in k]
+
+    def storbinary(self, cmd, f, callback=None):
+        self.log.append(cmd)
+        if self.fail_stor:
+            self.fail_stor -= 1
+            raise ftplib.error_temp("421 connexion perdue")
+        data = f.read()
+        if callback is not None:
+            if self.on_block:
+                self.on_block()
+            callback(data)
+        self.files[cmd[5:]] = data
+
+    def rename(self, source, target):
+        self.log.append(f"REN {source} {target}")
+        if self.fail_rename and source.endswith('.tmp'):
+            self.fail_rename -= 1
+            raise ftplib.error_perm("553 rename refusé")
+        if source not in self.files:
+            raise ftplib.error_perm("550 absent")
+        self.files[target] = self.files.pop(source)
+
+    def mkd(self, path):
+        pass
+
+    def delete(self, name):
+        self.log.append(f"DELE {name}")
+        self.files.pop(name, None)
+
+
+class FakePool:
+    def __init__(self, ftp):
+        self.ftp = ftp
+        self.timeouts = []
+
+    @contextlib.contextmanager
+    def session(self, host, user, password, port=21, timeout=None):
+        self.timeouts.append(timeout)
+        session = type("Session", (), {"ftp": self.ftp, "reconnect": lambda s: self.ftp})()
+        yield session
+
+
+@pytest.fixture
+def upload(tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(F.time, "sleep", sleeps.append)
+    file_path = tmp_path / "P1-latest.csv"
+    file_path.write_bytes(b"sku;qty\nA1;3\n")
+
+    def run(ftp, **settings):
+        pool = FakePool(ftp)
+        monkeypatch.setattr(F, "get_run_pool", lambda: pool)
+        context = {
+            'settings': {'upload_retries': 3, 'retry_backoff': 2, 'timeout': 30, **settings},
+            'backup': RenameBackup(keep=0),
+            'manifest': None,
+            'upload_state': None,
+        }
+        job = {'file_path': file_path, 'digest': None, 'host': 'h', 'user': 'u', 'password': 'p', 'port': 21}
+        result = F._upload_platform("P1", job, contextlib.nullcontext(), context)
+        return result, pool
+
+    run.sleeps = sleeps
+    return run
+
+
+def test_retries_with_exponential_backoff(upload):
+    ftp = FakeFTP({'stock.csv': b'old'}, fail_stor=2)
+    result, _ = upload(ftp)
+    assert (result['status'], result['attempts'], result['remote_file']) == ('uploaded', 3, 'stock.csv')
+    assert upload.sleeps == [2.0, 4.0]
+    assert ftp.files['stock.csv'] == b"sku;qty\nA1;3\n"
+
+
+def test_no_retry_past_deadline(upload):
+    ftp = FakeFTP({'stock.csv': b'old'}, fail_stor=-1)
+    result, pool = upload(ftp, upload_deadline=10, retry_backoff=30)
+    assert (result['status'], result['attempts']) == ('failed', 1)
+    assert "délai de 10 s dépassé" in result['error']
+    assert upload.sleeps == []
+    assert pool.timeouts == [pytest.approx(10, abs=1)]  # timeout des sockets limité au temps restant
+
+
+def test_transfer_interrupted_at_deadline(upload, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(F.time, "monotonic", lambda: clock[0])
+    ftp = FakeFTP({'stock.csv': b'old'}, on_block=lambda: clock.__setitem__(0, clock[0] + 20))
+    result, _ = upload(ftp, upload_deadline=10)
+    assert result['status'] == 'failed'
+    assert "pendant le transfert" in result['error']
+    assert ftp.files['stock.csv'] == b'old'
+
+
+def test_failed_upload_restores_moved_files(upload):
+    # rename final et STOR direct toujours refusés : l'envoi échoue après la sauvegarde
+    ftp = FakeFTP({'stock.csv': b'old', 'P1-2024.csv': b'older', 'other.csv': b'keep'}, fail_rename=-1)
+
+    def stor(cmd, f, callback=None):
+        if not cmd.endswith('.tmp'):
+            ftp.log.append(cmd)
+            raise ftplib.error_temp("421 STOR refusé")
+        return FakeFTP.storbinary(ftp, cmd, f, callback)
+
+    ftp.storbinary = stor
+    result, _ = upload(ftp, retry_backoff=0)
+    assert result['status'] == 'failed'
+    assert {k: v for k, v in ftp.files.items() if '/' not in k} == {
+        'stock.csv': b'old', 'P1-2024.csv': b'older', 'other.csv': b'keep'}
+    assert 'DELE stock.csv.tmp' in ftp.log
@@ -0,0 +1,25 @@
+import pandas as pd
+
+from functions.functions_history import StockHistory
+from functions.functions_supplier_matrix import SupplierStockMatrix
+
+
+def changes(rows):
+    return pd.DataFrame(rows, columns=['product_id', 'old_quantity', 'new_quantity', 'platform'])
+
+
+def test_runs_are_appended_and_queryable(tmp_path):
+    history = StockHistory(tmp_path / "history.db")
+    matrix = SupplierStockMatrix.from_fournisseurs({
+        'NTY': {'reduced_data': pd.DataFrame({'ID_Product': ['A1', 'B2'], 'Quantity': [3, 4]})},
+        'AJS': {'reduced_data': pd.DataFrame({'ID_Product': ['A1'], 'Quantity': [2]})},
+    })
+    history.record_run("2025-01-01 08:00:00", changes([('A1', 0, 5, 'AMAZON'), ('B2', 1, 4, 'AMAZON')]), matrix)
+    history.record_run("2025-01-02 08:00:00", changes([('A1', 5, 7, 'AMAZON'), ('A1', 5, 7, 'FNAC')]))
+
+    product = history.product_history('A1', platform='AMAZON')
+    assert product[['run_ts', 'old_quantity', 'new_quantity']].values.tolist() == [
+        ["2025-01-01 08:00:00", 0, 5], ["2025-01-02 08:00:00", 5, 7]]
+    trends = history.supplier_trends()
+    assert trends[['supplier', 'total_quantity', 'articles']].values.tolist() == [['AJS', 2, 1], ['NTY', 7, 2]]
+    assert history.runs()['n_changes'].tolist() == [2, 2]
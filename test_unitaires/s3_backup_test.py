@@ -0,0 +1,67 @@
+import hashlib
+import shutil
+import threading
+
+from functions.functions_s3_backup import S3BackupUploader
+
+
+class FakeS3:
+    """Stand-in S3 minimal sur le disque : un fichier par clé."""
+
+    def __init__(self, root):
+        self.root = root
+        self.uploads = []
+        self.lock = threading.Lock()
+
+    def _path(self, bucket, key):
+        path = self.root / bucket / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def upload_file(self, filename, bucket, key, ExtraArgs=None, Config=None):
+        with self.lock:
+            self.uploads.append(key)
+        shutil.copyfile(filename, self._path(bucket, key))
+
+    def put_object(self, Bucket, Key, Body):
+        self._path(Bucket, Key).write_bytes(Body)
+
+    def list_objects_v2(self, Bucket, Prefix, ContinuationToken=None):
+        base = self.root / Bucket
+        keys = sorted(p.relative_to(base).as_posix() for p in base.rglob('*') if p.is_file())
+        return {'Contents': [{'Key': k} for k in keys if k.startswith(Prefix)], 'IsTruncated': False}
+
+
+def test_identical_content_is_uploaded_once(tmp_path):
+    s3 = FakeS3(tmp_path / "s3")
+    already = b"deja sauvegarde"
+    s3.put_object("bucket", f"bk/by-hash/{hashlib.sha256(already).hexdigest()}", already)
+    files = {}
+    for name, content in [("a.csv", b"stock;1"), ("b.csv", b"stock;1"), ("c.csv", already)]:
+        files[name] = tmp_path / name
+        files[name].write_bytes(content)
+
+    uploader = S3BackupUploader(s3, "bucket", "bk/", workers=2)
+    for name, path in files.items():
+        uploader.submit(path, f"20250101_1200/AMAZON/{name}")
+    assert uploader.close(timeout=10)
+
+    digest = hashlib.sha256(b"stock;1").hexdigest()
+    assert s3.uploads == [f"bk/by-hash/{digest}"]
+    assert uploader.stats == {'uploaded': 1, 'deduplicated': 2, 'failed': 0}
+    pointer = tmp_path / "s3" / "bucket" / "bk" / "20250101_1200" / "AMAZON" / "b.csv.sha256"
+    assert pointer.read_text() == digest
+
+
+def test_remove_after_cleans_empty_backup_dirs(tmp_path):
+    s3 = FakeS3(tmp_path / "s3")
+    local_dir = tmp_path / "backup" / "20250101-120000" / "AMAZON"
+    local_dir.mkdir(parents=True)
+    (local_dir / "a.csv").write_bytes(b"stock;1")
+
+    uploader = S3BackupUploader(s3, "bucket", "bk", workers=1)
+    uploader.submit(local_dir / "a.csv", "20250101-120000/AMAZON/a.csv", remove_after=True)
+    assert uploader.close(timeout=10)
+
+    assert not (tmp_path / "backup" / "20250101-120000").exists()
+    assert (tmp_path / "backup").is_dir()
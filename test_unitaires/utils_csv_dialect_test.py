@@ -0,0 +1,55 @@
+import pytest
+
+import utils
+from utils import robust_read_csv, remember_dialect, sniff_csv_dialect
+
+
+@pytest.fixture
+def dialect_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "DIALECT_CACHE_FILE", tmp_path / "csv_dialects.json")
+    monkeypatch.setattr(utils, "_dialect_cache", None)
+    monkeypatch.setattr(utils, "DIALECT_CACHE_STATS", {'hits': 0, 'misses': 0})
+    return utils.DIALECT_CACHE_STATS
+
+
+def test_sniff_uses_sample_and_ignores_cut_last_line():
+    # ';' n'apparaît que dans l'entête : ',' est le seul séparateur régulier ; la dernière ligne est coupée
+    sample = "ref,titre;court,qte\n" + "".join(f"A{i},t{i},{i}\n" for i in range(20)) + "A20,t"
+    dialect = sniff_csv_dialect(sample.encode(), ['utf-8'], [';', ','], truncated=True)
+    assert (dialect['sep'], dialect['fields'], dialect['header']) == (',', 3, 'infer')
+
+
+def test_headerless_file_keeps_first_row(tmp_path, dialect_cache):
+    path = tmp_path / "fournisseur.csv"
+    path.write_text("".join(f"REF{i};{i}\n" for i in range(30)))
+    df, encoding, sep = robust_read_csv(path, header=None, entity="fournisseurs/TEST")
+    assert sep == ';'
+    assert len(df) == 30
+    assert df.iloc[0].tolist() == ['REF0', 0]
+    assert utils.get_cached_dialect("fournisseurs/TEST", header=None)['header'] == 'none'
+    assert utils.get_cached_dialect("fournisseurs/TEST") is None  # autre mode d'entête
+
+
+def test_cached_dialect_hit_then_stale(tmp_path, dialect_cache):
+    path = tmp_path / "plateforme.csv"
+    path.write_text("sku;qty\n" + "".join(f"A{i};{i}\n" for i in range(10)))
+    robust_read_csv(path, entity="plateformes/TEST")
+    df, _, sep = robust_read_csv(path, entity="plateformes/TEST")
+    assert dialect_cache == {'hits': 1, 'misses': 1}
+    assert sep == ';' and df.shape == (10, 2)
+
+    # Le fournisseur change de séparateur : le dialecte en cache est rejeté puis remplacé
+    path.write_text("sku,qty\n" + "".join(f"A{i},{i}\n" for i in range(10)))
+    df, _, sep = robust_read_csv(path, entity="plateformes/TEST")
+    assert dialect_cache == {'hits': 1, 'misses': 2}
+    assert sep == ',' and df.shape == (10, 2)
+    assert utils.get_cached_dialect("plateformes/TEST")['sep'] == ','
+
+
+def test_unreadable_cached_dialect_falls_back(tmp_path, dialect_cache):
+    path = tmp_path / "plateforme.csv"
+    path.write_text("sku;qty\n" + "".join(f"A{i};{i}\n" for i in range(10)))
+    remember_dialect("plateformes/TEST", utils._dialect('utf-32', ';', 'infer'))
+    df, encoding, sep = robust_read_csv(path, entity="plateformes/TEST")
+    assert dialect_cache['misses'] == 1
+    assert encoding != 'utf-32' and df.shape == (10, 2)
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from utils import patch_csv_column, save_file_and_archive
+
+
+def patch_and_read(tmp_path, raw, encoding, sep, column, patches, **kwargs):
+    source = tmp_path / "source.csv"
+    target = tmp_path / "target.csv"
+    source.write_bytes(raw)
+    ok = patch_csv_column(source, target, encoding, sep, column, patches, **kwargs)
+    return ok, (target.read_bytes() if ok else None)
+
+
+def test_only_patched_fields_change(tmp_path):
+    raw = b'sku;title;qty;price\r\nA1;"T; 1";12.0;9,99\r\n\r\nA2;t2;>10;1\r\nA3;"x""y";"5";2\r\n'
+    ok, out = patch_and_read(tmp_path, raw, 'utf-8', ';', 2, {0: '3', 2: '7'}, n_rows=3)
+    assert ok
+    assert out == b'sku;title;qty;price\r\nA1;"T; 1";3;9,99\r\n\r\nA2;t2;>10;1\r\nA3;"x""y";"7";2\r\n'
+
+
+def test_multiline_quoted_field_and_undecodable_bytes(tmp_path):
+    # 0x81 n'existe pas en cp1252 : l'octet doit être recopié tel quel
+    raw = b'ref,desc,stock\nR1,"ligne 1\nligne 2",4\nR2,caf\xe9 \x81,8'
+    ok, out = patch_and_read(tmp_path, raw, 'cp1252', ',', 2, {0: '0', 1: '9'}, n_rows=2)
+    assert ok
+    assert out == raw.replace(b',4\n', b',0\n').replace(b',8', b',9')
+    df = pd.read_csv(tmp_path / "target.csv", sep=',', encoding='cp1252', encoding_errors='surrogateescape')
+    assert df['stock'].tolist() == [0, 9]
+
+
+def test_row_count_mismatch_falls_back(tmp_path):
+    raw = b'sku;qty\nA1;1\nA2;2\n'
+    ok, _ = patch_and_read(tmp_path, raw, 'utf-8', ';', 1, {0: '5'}, n_rows=3)
+    assert not ok
+    assert not (tmp_path / "target.csv").exists()
+
+
+@pytest.mark.parametrize("encoding", ['utf-16', None])
+def test_unsupported_encodings(tmp_path, encoding):
+    ok, _ = patch_and_read(tmp_path, b'a;b\n1;2\n', encoding, ';', 1, {0: '5'})
+    assert not ok
+
+
+def test_save_returns_written_path(tmp_path):
+    (tmp_path / "P-latest.csv").write_text("old")
+    df = pd.DataFrame({'sku': ['A1'], 'qty': [3]})
+    written = save_file_and_archive(str(tmp_path / "P-latest.xlsx"), None, df, force_excel=True)
+    assert written == tmp_path / "P-latest.xlsx"
+    assert pd.read_excel(written)['qty'].tolist() == [3]
+    # Excel demandé sans force_excel : écrit en CSV, c'est ce chemin qui est renvoyé
+    assert save_file_and_archive(str(tmp_path / "Q-latest.xlsx"), None, df) == tmp_path / "Q-latest.csv"
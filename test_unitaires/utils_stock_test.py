@@ -0,0 +1,59 @@
+import glob
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import process_stock_series, process_stock_value, read_dataset_file
+
+
+VERIFIER_DIR = Path(__file__).resolve().parent.parent / "Verifier"
+SAMPLE_FILES = sorted(glob.glob(str(VERIFIER_DIR / "*")))
+
+
+def assert_same_as_scalar(values):
+    expected = [process_stock_value(v) for v in values]
+    result = process_stock_series(values)
+    assert result.index.equals(values.index)
+    assert result.tolist() == expected
+
+
+def test_process_stock_series_special_values():
+    values = pd.Series([
+        '>=10', '<= 5', '>3', '<7', '+5', '10-20', '10 - 20', '10-', '10-20-30', '5-', '10-abc',
+        'AVAILABLE', ' in stock ', 'N/A', 'na', 'none', 'RUPTURE', 'épuisé', 'Out of stock', '',
+        ' 12 ', '12.7', '12.', '.5', '-3', '-3.5', '1e3', '1E-5', '1,5', '0007', 'inf', 'nan',
+        'abc', '>x', '++5', '>+5', '²-3', None, np.nan, 5, 7.9, -2.5, True,
+    ], dtype=object)
+    assert_same_as_scalar(values)
+
+
+def test_process_stock_series_numeric_and_string_dtypes():
+    assert_same_as_scalar(pd.Series([1.5, np.nan, 3, -0.5]))
+    assert_same_as_scalar(pd.Series([1, 2, None, 4], dtype='Int64'))
+    assert_same_as_scalar(pd.Series(['>10', '3', 'N/A', None], dtype='string'))
+    assert_same_as_scalar(pd.Series([4, 2, 7], index=[3, 3, 0]))
+    assert process_stock_series(pd.Series([], dtype=object)).empty
+
+
+@pytest.mark.parametrize("file_path", SAMPLE_FILES, ids=lambda p: Path(p).name)
+def test_process_stock_series_matches_scalar_on_verifier_files(file_path):
+    df = read_dataset_file(file_path)['dataset']
+    if df.empty:
+        pytest.skip(f"{Path(file_path).name} illisible")
+    for column in df.columns:
+        assert_same_as_scalar(df[column])
+        assert_same_as_scalar(df[column].astype(str))
+
+
+@pytest.mark.parametrize("values", [
+    pd.Series(['a-1', pd.NA, ' b 2 '], dtype='string'),
+    pd.Series(['a-1', None, ' b 2 '], dtype='str'),
+    pd.Series(['a-1', None, np.nan, 12], dtype=object),
+    pd.Series([1.5, np.nan]),
+])
+def test_canonicalize_product_ids_matches_scalar(values):
+    from functions.functions_update import canonicalize_product_id, canonicalize_product_ids
+
+    assert canonicalize_product_ids(values).tolist() == [canonicalize_product_id(v) for v in values]
@@ -1,12 +1,20 @@
 import os
 import re
+import hashlib
 import sys
+import io
+import csv
+import json
 import yaml
+import shutil
+import threading
+import numpy as np
 import pandas as pd
 import smtplib
 import chardet
 import socket
 from ftplib import FTP
+from datetime import date, datetime
 
 from pathlib import Path
 from dotenv import load_dotenv
@@ -16,7 +24,7 @@ from config.logging_config import logger
 
 from config.config_path_variables import (
     YAML_ENCODING_SEP_FILE_PATH, YAML_REFERENCE_NAME, YAML_QUANTITY_NAME,
-    CONFIG
+    CONFIG, CACHE_PATH
 )
 
 # Charger les variables du fichier .env
@@ -136,24 +144,91 @@ def read_yaml_file(yaml_path: Path) -> dict:
 # ------------------------------------------------------------------------------
 #                      Enregistrement d'un fichier DataFrame 
 # ------------------------------------------------------------------------------
-def save_file(file_name: str, df: pd.DataFrame, encoding: str = 'utf-8', sep: str= ',', force_excel: bool = False) -> pd.DataFrame:
+def _write_dataframe(file_name: str, df: pd.DataFrame, encoding: str = 'utf-8', sep: str = ',', force_excel: bool = False) -> str:
+    """Sérialise df dans file_name (CSV, ou Excel si force_excel). Returns: chemin réellement écrit."""
+    ext = Path(file_name).suffix.lower()
+    # Always use CSV for intermediate/verification saves unless force_excel is True
+    if ext in {'.csv', '.txt'} or (ext in {'.xls', '.xlsx'} and not force_excel):
+        # If .xls/.xlsx but not forced, save as .csv instead and log a warning
+        if ext in {'.xls', '.xlsx'} and not force_excel:
+            csv_file_name = str(Path(file_name).with_suffix('.csv'))
+            logger.warning(f"Requested Excel save for {file_name}, but force_excel is False. Saving as CSV: {csv_file_name}")
+            file_name = csv_file_name
+        # Ensure sep is a valid 1-character string
+        if sep is None or not isinstance(sep, str) or len(sep) != 1:
+            sep = ','
+        df.to_csv(file_name, encoding=encoding, sep=sep, index=False)
+    elif ext == '.xlsx' and force_excel:
+        _write_xlsx(file_name, df)
+    elif ext == '.xls' and force_excel:
+        df.to_excel(file_name, index=False)
+    else:
+        raise ValueError(f"Extension de fichier non supportée: {file_name}")
+    return file_name
+
+
+def _write_xlsx(file_name: str, df: pd.DataFrame) -> None:
+    """xlsx écrit ligne par ligne (xlsxwriter, constant_memory) s'il est installé, sinon to_excel (openpyxl)."""
     try:
-        ext = Path(file_name).suffix.lower()
-        # Always use CSV for intermediate/verification saves unless force_excel is True
-        if ext in {'.csv', '.txt'} or (ext in {'.xls', '.xlsx'} and not force_excel):
-            # If .xls/.xlsx but not forced, save as .csv instead and log a warning
-            if ext in {'.xls', '.xlsx'} and not force_excel:
-                csv_file_name = str(Path(file_name).with_suffix('.csv'))
-                logger.warning(f"Requested Excel save for {file_name}, but force_excel is False. Saving as CSV: {csv_file_name}")
-                file_name = csv_file_name
-            # Ensure sep is a valid 1-character string
-            if sep is None or not isinstance(sep, str) or len(sep) != 1:
-                sep = ','
-            df.to_csv(file_name, encoding=encoding, sep=sep, index=False)
-        elif ext in {'.xls', '.xlsx'} and force_excel:
-            df.to_excel(file_name, index=False)
+        import xlsxwriter  # type: ignore
+    except ImportError:
+        df.to_excel(file_name, index=False)
+        return
+    try:
+        _write_xlsx_streaming(xlsxwriter, file_name, df)
+    except Exception as e:
+        logger.warning(f"-- ⚠️ --  Écriture xlsx en flux impossible pour {file_name} ({e}), to_excel utilisé")
+        df.to_excel(file_name, index=False, engine='openpyxl')
+
+
+def _write_xlsx_streaming(xlsxwriter, file_name: str, df: pd.DataFrame) -> None:
+    """
+    En mode constant_memory chaque ligne est écrite sur disque dès que la suivante commence :
+    les cellules doivent donc être écrites ligne par ligne (to_excel écrit colonne par colonne).
+    Même feuille, même entête et mêmes valeurs que to_excel ; les textes restent des textes
+    (to_excel/openpyxl transforme '=...' en formule).
+    """
+    workbook = xlsxwriter.Workbook(file_name, {'constant_memory': True, 'strings_to_urls': False})
+    try:
+        formats = {
+            'datetime': workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'}),
+            'date': workbook.add_format({'num_format': 'yyyy-mm-dd'}),
+        }
+        sheet = workbook.add_worksheet('Sheet1')
+        for col, name in enumerate(df.columns):
+            _write_xlsx_cell(sheet, 0, col, name, formats)
+        for row, values in enumerate(df.itertuples(index=False, name=None), start=1):
+            for col, value in enumerate(values):
+                _write_xlsx_cell(sheet, row, col, value, formats)
+    finally:
+        workbook.close()
+
+
+def _write_xlsx_cell(sheet, row, col, value, formats):
+    if value is None or value is pd.NaT or value is pd.NA:
+        return
+    if isinstance(value, (bool, np.bool_)):
+        sheet.write_boolean(row, col, bool(value))
+    elif isinstance(value, (int, np.integer)):
+        sheet.write_number(row, col, int(value))
+    elif isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return
+        if np.isinf(value):
+            sheet.write_string(row, col, 'inf' if value > 0 else '-inf')
         else:
-            raise ValueError(f"Extension de fichier non supportée: {file_name}")
+            sheet.write_number(row, col, float(value))
+    elif isinstance(value, datetime):
+        sheet.write_datetime(row, col, value, formats['datetime'])
+    elif isinstance(value, date):
+        sheet.write_datetime(row, col, value, formats['date'])
+    else:
+        sheet.write_string(row, col, str(value))
+
+
+def save_file(file_name: str, df: pd.DataFrame, encoding: str = 'utf-8', sep: str= ',', force_excel: bool = False) -> pd.DataFrame:
+    try:
+        file_name = _write_dataframe(file_name, df, encoding=encoding, sep=sep, force_excel=force_excel)
         logger.info(f"-- ✅ -- Fichier enregistré en : {file_name} - avec ({len(df)} lignes)")
         return df
     except Exception as e:
@@ -161,6 +236,186 @@ def save_file(file_name: str, df: pd.DataFrame, encoding: str = 'utf-8', sep: st
         return pd.DataFrame()  # Retourne un DataFrame vide en cas d'erreur
 
 
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def file_digest(file_path) -> str:
+    """sha256 du contenu du fichier (lu par blocs) : clé commune des caches, envois, archives et copies S3."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(source, target) -> str:
+    """Crée target à partir de source : lien physique si possible, sinon copie. Returns: 'link' ou 'copy'."""
+    target = Path(target)
+    target.unlink(missing_ok=True)
+    try:
+        os.link(source, target)
+        return 'link'
+    except OSError:
+        shutil.copyfile(source, target)
+        return 'copy'
+
+
+def save_file_and_archive(file_name: str, archive_name: str, df: pd.DataFrame, encoding: str = 'utf-8',
+                          sep: str = ',', force_excel: bool = False) -> Path | None:
+    """
+    Sérialise df une seule fois dans file_name (-latest) puis crée archive_name à partir de ce fichier
+    (lien physique, copie si le système de fichiers ne le permet pas) ; archive_name=None : pas d'archive.
+    Le fichier est écrit à côté puis renommé : un -latest existant, qui peut être lié à une archive
+    précédente, n'est jamais réécrit en place.
+    Returns: chemin du -latest réellement écrit (l'extension peut changer, ex: .xlsx), None en cas d'erreur.
+    """
+    path = Path(file_name)
+    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp{path.suffix}")
+    try:
+        written = Path(_write_dataframe(str(tmp_path), df, encoding=encoding, sep=sep, force_excel=force_excel))
+        path = path.with_suffix(written.suffix)
+        os.replace(written, path)
+        if archive_name is None:
+            logger.info(f"-- ✅ -- Fichier enregistré en : {path} - avec ({len(df)} lignes)")
+            return path
+        archive_path = Path(archive_name).with_suffix(path.suffix)
+        mode = link_or_copy(path, archive_path)
+        logger.info(f"-- ✅ -- Fichier enregistré en : {path} - avec ({len(df)} lignes), archive ({mode}) : {archive_path.name}")
+        return path
+    except Exception as e:
+        logger.exception(f"-- ❌ -- Erreur lors de l'enregistrement de {file_name}: {e}")
+        for leftover in (tmp_path, tmp_path.with_suffix('.csv')):
+            leftover.unlink(missing_ok=True)
+        return None
+
+
+# ------------------------------------------------------------------------------
+#     CSV plateforme : seules les cellules de stock modifiées sont réécrites
+# ------------------------------------------------------------------------------
+CSV_EXTENSIONS = {'.csv', '.txt'}
+PATCH_QUOTECHAR = '"'
+
+
+def _csv_field_spans(record: str, sep: str, quotechar: str = PATCH_QUOTECHAR):
+    """
+    (début, fin) de chaque champ d'un enregistrement CSV (sans fin de ligne), comme le
+    tokenizer pandas : un guillemet n'ouvre un champ que s'il est au début du champ, '""' = '"'.
+    Returns: (spans, in_quotes) ; in_quotes=True si l'enregistrement continue sur la ligne suivante.
+    """
+    spans = []
+    start = 0
+    in_quotes = False
+    i, n = 0, len(record)
+    while i < n:
+        ch = record[i]
+        if in_quotes:
+            if ch == quotechar:
+                if i + 1 < n and record[i + 1] == quotechar:
+                    i += 2
+                    continue
+                in_quotes = False
+        elif ch == quotechar and i == start:
+            in_quotes = True
+        elif ch == sep:
+            spans.append((start, i))
+            start = i + 1
+        i += 1
+    spans.append((start, n))
+    return spans, in_quotes
+
+
+def _csv_records(lines, sep: str, quotechar: str = PATCH_QUOTECHAR):
+    """Regroupe les lignes (fins de ligne conservées) en enregistrements CSV complets."""
+    buffer = ''
+    for line in lines:
+        buffer += line
+        if quotechar in buffer:
+            _, in_quotes = _csv_field_spans(buffer.rstrip('\r\n'), sep, quotechar)
+            if in_quotes:
+                continue
+        yield buffer
+        buffer = ''
+    if buffer:
+        yield buffer
+
+
+def patch_csv_column(source, target, encoding: str, sep: str, column: int, patches: dict,
+                     has_header: bool = True, n_rows: int | None = None) -> bool:
+    """
+    Copie source dans target octet pour octet, en remplaçant uniquement le champ n° `column`
+    des lignes de données listées dans patches ({position de la ligne dans le DataFrame: texte}).
+    Les lignes vides (ignorées par pandas) ne comptent pas ; les octets non décodables sont
+    conservés tels quels (surrogateescape).
+    Returns: False (target supprimé) si le fichier ne correspond pas à la lecture pandas :
+             encodage multi-octets (utf-16/32), nombre de lignes différent de n_rows, champ absent.
+    """
+    if not encoding or not sep or len(sep) != 1 or 'utf-16' in encoding.lower() or 'utf-32' in encoding.lower():
+        return False
+    whitespace_sep = sep in ' \t'
+    row = -1 if has_header else 0
+    remaining = len(patches)
+    try:
+        with open(source, 'r', encoding=encoding, errors='surrogateescape', newline='') as src, \
+                open(target, 'w', encoding=encoding, errors='surrogateescape', newline='') as dst:
+            for record in _csv_records(src, sep):
+                body = record.rstrip('\r\n')
+                if not body or (not whitespace_sep and not body.strip(' \t')):
+                    dst.write(record)          # ligne vide : ignorée par pandas
+                    continue
+                text = patches.get(row) if row >= 0 else None
+                if text is not None:
+                    if PATCH_QUOTECHAR in body:
+                        spans, _ = _csv_field_spans(body, sep)
+                    else:
+                        spans, pos = [], 0
+                        for field in body.split(sep):
+                            spans.append((pos, pos + len(field)))
+                            pos += len(field) + 1
+                    if column >= len(spans):
+                        raise ValueError(f"ligne {row}: champ {column} absent")
+                    start, end = spans[column]
+                    if body[start:start + 1] == PATCH_QUOTECHAR:
+                        text = f'{PATCH_QUOTECHAR}{text}{PATCH_QUOTECHAR}'
+                    record = record[:start] + text + record[end:]
+                    remaining -= 1
+                dst.write(record)
+                row += 1
+        if remaining or (n_rows is not None and row != n_rows):
+            raise ValueError(f"{row} lignes lues, {n_rows} attendues")
+        return True
+    except Exception as e:
+        logger.warning(f"-- ⚠️ --  Patch CSV impossible pour {source} ({e}), réécriture complète")
+        Path(target).unlink(missing_ok=True)
+        return False
+
+
+def patch_csv_file_and_archive(source, file_name: str, archive_name: str, encoding: str, sep: str,
+                               column: int, patches: dict, has_header: bool = True, n_rows: int | None = None) -> Path | None:
+    """
+    Comme save_file_and_archive, mais le -latest est une copie du fichier plateforme d'origine où
+    seules les cellules de stock modifiées (patches) sont réécrites (voir patch_csv_column).
+    Returns: chemin du -latest écrit, None si le patch est impossible (le fichier doit alors être
+             réécrit avec save_file_and_archive).
+    """
+    path = Path(file_name)
+    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp{path.suffix}")
+    if not patch_csv_column(source, tmp_path, encoding, sep, column, patches, has_header=has_header, n_rows=n_rows):
+        return None
+    try:
+        os.replace(tmp_path, path)
+        if archive_name is None:
+            logger.info(f"-- ✅ -- Fichier enregistré en : {path} - ({len(patches)} stocks modifiés)")
+            return path
+        archive_path = Path(archive_name)
+        mode = link_or_copy(path, archive_path)
+        logger.info(f"-- ✅ -- Fichier enregistré en : {path} - ({len(patches)} stocks modifiés), archive ({mode}) : {archive_path.name}")
+        return path
+    except Exception as e:
+        logger.exception(f"-- ❌ -- Erreur lors de l'enregistrement de {file_name}: {e}")
+        tmp_path.unlink(missing_ok=True)
+        return None
+
+
 # ------------------------------------------------------------------------
 #                        Détection rapide de l'encodage
 # ------------------------------------------------------------------------
@@ -233,25 +488,237 @@ def try_read_csv(file_path: str, sep: str, encoding: str, usecols=None) -> pd.Da
         return None
 
 
-def robust_read_csv(file_path, usecols=None, header='infer', encodings=None, separators=None):
-    if encodings is None:
-        encodings = ['utf-8', 'utf-8-sig', 'cp1252', 'latin1', 'iso-8859-1']
-    if separators is None:
-        # Prioritize semicolon for CSV files as it's more common in European data
-        separators = [';', ',', '|', '\t', ' ']
-    
-    # Check if this is likely an NTY file (contains specific patterns)
-    is_nty_file = False
+# ------------------------------------------------------------------------
+#     Cache des dialectes CSV (encodage, séparateur, header, lignes invalides)
+# ------------------------------------------------------------------------
+DIALECT_CACHE_FILE = CACHE_PATH / "csv_dialects.json"
+DIALECT_CACHE_STATS = {'hits': 0, 'misses': 0}
+_dialect_cache = None
+_dialect_cache_lock = threading.Lock()
+
+
+def _load_dialect_cache() -> dict:
+    global _dialect_cache
+    if _dialect_cache is None:
+        try:
+            with open(DIALECT_CACHE_FILE, 'r', encoding='utf-8') as f:
+                _dialect_cache = json.load(f)
+        except FileNotFoundError:
+            _dialect_cache = {}
+        except Exception as e:
+            logger.warning(f"-- ⚠️ --  Cache des dialectes CSV illisible, il sera reconstruit: {e}")
+            _dialect_cache = {}
+    return _dialect_cache
+
+
+def get_cached_dialect(entity: str, header='infer') -> dict | None:
+    """Dialecte appris pour l'entité (ex: 'fournisseurs/NTY'), si le mode d'entête correspond."""
+    with _dialect_cache_lock:
+        dialect = _load_dialect_cache().get(entity)
+    if not dialect or dialect.get('header') != ('none' if header is None else 'infer'):
+        return None
+    return dialect
+
+
+def remember_dialect(entity: str, dialect: dict) -> None:
+    """Enregistre le dialecte qui a permis de lire le fichier de l'entité."""
+    with _dialect_cache_lock:
+        cache = _load_dialect_cache()
+        if cache.get(entity) == dialect:
+            return
+        cache[entity] = dialect
+        try:
+            # Plusieurs process peuvent écrire en même temps : garder les entrées des autres
+            try:
+                with open(DIALECT_CACHE_FILE, 'r', encoding='utf-8') as f:
+                    for key, value in json.load(f).items():
+                        cache.setdefault(key, value)
+            except Exception:
+                pass
+            DIALECT_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = DIALECT_CACHE_FILE.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False, indent=1)
+            tmp_path.replace(DIALECT_CACHE_FILE)
+        except Exception as e:
+            logger.warning(f"-- ⚠️ --  Impossible d'enregistrer le cache des dialectes CSV: {e}")
+
+
+def read_csv_with_dialect(file_path, dialect: dict, usecols=None, header='infer', n_fields=None, nrows=None) -> pd.DataFrame:
+    """
+    Une seule lecture pandas avec un dialecte connu (voir robust_read_csv).
+    n_fields: nombre de colonnes déjà connu (sniff) pour les fichiers sans entête.
+    """
+    kwargs = {'encoding': dialect['encoding'], 'sep': dialect['sep'], 'usecols': usecols, 'header': header, 'nrows': nrows}
+    if dialect.get('engine') == 'python':
+        kwargs['engine'] = 'python'
+    if dialect.get('bad_lines', 'error') != 'error':
+        kwargs['on_bad_lines'] = dialect['bad_lines']
+    if header is None and dialect.get('bad_lines') == 'warn':
+        if n_fields is None:
+            sample_df = pd.read_csv(file_path, encoding=dialect['encoding'], sep=dialect['sep'], header=None, nrows=5)
+            n_fields = sample_df.shape[1]
+        kwargs['names'] = list(range(n_fields))
+    return pd.read_csv(file_path, **kwargs)
+
+
+def _dialect(encoding, sep, header, bad_lines='error', engine='c') -> dict:
+    return {'encoding': encoding, 'sep': sep, 'header': 'none' if header is None else 'infer',
+            'bad_lines': bad_lines, 'engine': engine}
+
+
+def _looks_like_wrong_separator(df: pd.DataFrame, sep: str) -> str | None:
+    """Retourne la raison du rejet si la 1re colonne contient visiblement le vrai séparateur."""
+    first_few_values = [str(df.iloc[i, 0]) for i in range(1, min(4, df.shape[0]))]
+    for sample_val in first_few_values:
+        # If we're using space as separator but data contains semicolons, reject this
+        if sep == ' ' and ';' in sample_val and sample_val.count(';') >= 2:
+            return f"space sep with semicolons: '{sample_val[:30]}...'"
+        # If we're using comma as separator but data contains semicolons, be suspicious
+        if sep == ',' and ';' in sample_val and sample_val.count(';') >= 3:
+            return f"comma sep with many semicolons: '{sample_val[:30]}...'"
+        # If we're using any separator but the first column contains the expected separator, reject
+        if sep != ';' and ';' in sample_val and sample_val.count(';') >= 2:
+            return f"non-semicolon sep with semicolons: '{sample_val[:30]}...'"
+    return None
+
+
+def _min_columns(is_nty_file: bool, sep: str, usecols=None) -> int:
+    """Nombre minimal de colonnes attendu (un fichier NTY complet en a au moins 8)."""
+    min_cols = 8 if is_nty_file and sep == ';' else 2
+    return min(min_cols, len(usecols)) if usecols is not None else min_cols
+
+
+def _dialect_frame_problem(df: pd.DataFrame, sep: str, is_nty_file: bool, usecols=None) -> str | None:
+    """Mêmes contrôles que la recherche complète : assez de lignes/colonnes, bon séparateur."""
+    if df.shape[1] < _min_columns(is_nty_file, sep, usecols) or df.shape[0] <= 1:
+        return f"insufficient data: shape={df.shape}"
+    if not is_nty_file:
+        return _looks_like_wrong_separator(df, sep)
+    return None
+
+
+def _read_with_cached_dialect(file_path, entity, usecols, header, is_nty_file):
+    dialect = get_cached_dialect(entity, header)
+    if dialect is None:
+        return None
+    try:
+        df = read_csv_with_dialect(file_path, dialect, usecols=usecols, header=header)
+    except Exception as e:
+        logger.info(f"🔁 Dialecte en cache pour {entity} invalide ({str(e)[:50]}), nouvelle détection...")
+        return None
+    if _dialect_frame_problem(df, dialect['sep'], is_nty_file, usecols):
+        logger.info(f"🔁 Dialecte en cache pour {entity} rejeté (shape={df.shape}), nouvelle détection...")
+        return None
+    logger.info(f"⚡ Dialecte en cache pour {entity}: encoding='{dialect['encoding']}', separator='{dialect['sep']}', shape={df.shape}")
+    return df, dialect['encoding'], dialect['sep']
+
+
+# ------------------------------------------------------------------------
+#       Détection du dialecte sur un échantillon (taille bornée du fichier)
+# ------------------------------------------------------------------------
+SNIFF_SAMPLE_BYTES = 100000
+SNIFF_SAMPLE_LINES = 50
+SNIFF_MIN_CONSISTENCY = 0.9
+
+
+def _field_counts(lines: list[str], sep: str) -> list[int]:
+    try:
+        return [len(row) for row in csv.reader(lines, delimiter=sep) if any(cell.strip() for cell in row)]
+    except csv.Error:
+        return []
+
+
+def sniff_csv_dialect(sample: bytes, encodings, separators, header='infer', is_nty_file=False,
+                      truncated=True) -> dict | None:
+    """
+    Choisit encodage, séparateur et présence d'entête à partir des premiers octets du fichier
+    (coût constant, indépendant de la taille du fichier).
+    Pour chaque encodage qui décode l'échantillon, le premier séparateur (dans l'ordre de
+    priorité) qui donne un nombre de champs constant (>= 2) sur les SNIFF_SAMPLE_LINES
+    premières lignes est retenu. Les fichiers NTY (lignes de longueurs variables) ne sont
+    pas soumis au contrôle de régularité.
+    La présence d'entête n'est pas devinée : elle vient de `header` (option no_header du fichier de config).
+    Returns:
+        dialect (voir _dialect) + 'fields' (nombre de colonnes), ou None si aucun candidat n'est convaincant.
+    """
+    for encoding in encodings:
+        try:
+            text = sample.decode(encoding)
+        except (UnicodeDecodeError, LookupError):
+            continue
+        text = text.lstrip('\ufeff')
+        lines = text.splitlines()
+        if truncated and len(lines) > 1:
+            lines = lines[:-1]   # dernière ligne probablement coupée par l'échantillon
+        lines = lines[:SNIFF_SAMPLE_LINES]
+        if len(lines) < 2:
+            continue
+
+        for sep in separators:
+            counts = _field_counts(lines, sep)
+            if not counts:
+                continue
+            fields = max(set(counts), key=counts.count)
+            consistency = counts.count(fields) / len(counts)
+            lenient = is_nty_file and sep == ';'
+            if fields < 2 or (not lenient and consistency < SNIFF_MIN_CONSISTENCY):
+                continue
+
+            try:
+                sample_df = pd.read_csv(io.StringIO('\n'.join(lines)), sep=sep, header=None,
+                                        on_bad_lines='skip', dtype=str)
+            except Exception:
+                continue
+            if _looks_like_wrong_separator(sample_df, sep) and not is_nty_file:
+                continue
+
+            if lenient:
+                dialect = _dialect(encoding, sep, header, 'skip', 'python')
+            elif header is None:
+                dialect = _dialect(encoding, sep, header, 'warn')
+            else:
+                dialect = _dialect(encoding, sep, header)
+            dialect['fields'] = fields
+            logger.info(f"🔍 Dialecte détecté sur échantillon: encoding='{encoding}', separator='{sep}', "
+                        f"colonnes={fields}, régularité={consistency:.0%}")
+            return dialect
+    return None
+
+
+def _read_with_sniffed_dialect(file_path, sample, truncated, encodings, separators, usecols, header, is_nty_file):
+    dialect = sniff_csv_dialect(sample, encodings, separators, header=header,
+                                is_nty_file=is_nty_file, truncated=truncated)
+    if dialect is None:
+        return None
+    try:
+        df = read_csv_with_dialect(file_path, dialect, usecols=usecols, header=header, n_fields=dialect['fields'])
+    except Exception as e:
+        logger.info(f"🔁 Dialecte détecté invalide sur le fichier complet ({str(e)[:50]}), recherche complète...")
+        return None
+    problem = _dialect_frame_problem(df, dialect['sep'], is_nty_file, usecols)
+    if problem:
+        logger.info(f"🔁 Dialecte détecté rejeté ({problem}), recherche complète...")
+        return None
+    return df, dialect
+
+
+def _is_nty_file(file_path) -> bool:
     file_name = Path(file_path).name.upper()
-    if 'NTY' in file_name or 'AJS-OFERTA' in file_name:
-        is_nty_file = True
-        logger.info(f"🔍 Detected NTY file pattern in: {file_name}")
-    
-    # Try chardet first and prioritize its detection
+    return 'NTY' in file_name or 'AJS-OFERTA' in file_name
+
+
+def _read_sample_with_encodings(file_path, encodings):
+    """
+    Lit les SNIFF_SAMPLE_BYTES premiers octets et place l'encodage détecté par chardet en tête.
+    Returns: (sample, truncated, encodings)
+    """
     detected_encoding = None
+    raw, truncated = b'', False
     try:
         with open(file_path, 'rb') as f:
-            raw = f.read(100000)  # Read first 100KB for detection
+            raw = f.read(SNIFF_SAMPLE_BYTES)  # Read first 100KB for detection
+            truncated = bool(f.read(1))
             guess = chardet.detect(raw)
             if guess and guess['encoding'] and guess['confidence'] > 0.7:
                 detected_encoding = guess['encoding']
@@ -265,12 +732,52 @@ def robust_read_csv(file_path, usecols=None, header='infer', encodings=None, sep
     elif detected_encoding:
         # Move detected encoding to front
         encodings = [detected_encoding] + [enc for enc in encodings if enc != detected_encoding]
+    return raw, truncated, encodings
+
+
+def robust_read_csv(file_path, usecols=None, header='infer', encodings=None, separators=None, entity=None):
+    """
+    Lit un CSV en cherchant l'encodage et le séparateur.
+    Si `entity` est fourni (ex: 'fournisseurs/NTY'), le dialecte appris lors d'une lecture
+    précédente est essayé en premier ; la recherche complète n'a lieu qu'en cas d'échec.
+    """
+    if encodings is None:
+        encodings = ['utf-8', 'utf-8-sig', 'cp1252', 'latin1', 'iso-8859-1']
+    if separators is None:
+        # Prioritize semicolon for CSV files as it's more common in European data
+        separators = [';', ',', '|', '\t', ' ']
+    
+    # Check if this is likely an NTY file (contains specific patterns)
+    is_nty_file = _is_nty_file(file_path)
+    if is_nty_file:
+        logger.info(f"🔍 Detected NTY file pattern in: {Path(file_path).name.upper()}")
+    
+    if entity:
+        cached = _read_with_cached_dialect(file_path, entity, usecols, header, is_nty_file)
+        with _dialect_cache_lock:
+            DIALECT_CACHE_STATS['hits' if cached else 'misses'] += 1
+        if cached:
+            return cached
+
+    # Try chardet first and prioritize its detection
+    raw, truncated, encodings = _read_sample_with_encodings(file_path, encodings)
     
     # For NTY files, force semicolon as the first separator to try
     if is_nty_file:
         separators = [';'] + [sep for sep in separators if sep != ';']
         logger.info("📌 NTY file detected - prioritizing semicolon separator")
     
+    # Détection sur échantillon puis une seule lecture complète ;
+    # la recherche exhaustive ci-dessous ne sert plus que de dernier recours.
+    if raw:
+        sniffed = _read_with_sniffed_dialect(file_path, raw, truncated, encodings, separators, usecols, header, is_nty_file)
+        if sniffed is not None:
+            df, dialect = sniffed
+            logger.info(f"✅ Successfully read file with encoding='{dialect['encoding']}', separator='{dialect['sep']}', shape={df.shape}")
+            if entity:
+                remember_dialect(entity, {k: v for k, v in dialect.items() if k != 'fields'})
+            return df, dialect['encoding'], dialect['sep']
+
     successful_attempts = []
     failed_attempts = []
     
@@ -292,8 +799,10 @@ def robust_read_csv(file_path, usecols=None, header='infer', encodings=None, sep
                         )
                         
                         # Validate that we got meaningful data
-                        if df is not None and df.shape[1] >= 8 and df.shape[0] > 1:
+                        if df is not None and df.shape[1] >= _min_columns(True, sep, usecols) and df.shape[0] > 1:
                             logger.info(f"✅ Successfully read NTY file with encoding='{encoding}', separator='{sep}', shape={df.shape}")
+                            if entity:
+                                remember_dialect(entity, _dialect(encoding, sep, header, 'skip', 'python'))
                             return df, encoding, sep
                         else:
                             failed_attempts.append((encoding, sep, f"NTY file validation failed: shape={df.shape if df is not None else 'None'}"))
@@ -310,7 +819,7 @@ def robust_read_csv(file_path, usecols=None, header='infer', encodings=None, sep
                                 error_bad_lines=False,  # Old pandas syntax
                                 warn_bad_lines=False
                             )
-                            if df is not None and df.shape[1] >= 8 and df.shape[0] > 1:
+                            if df is not None and df.shape[1] >= _min_columns(True, sep, usecols) and df.shape[0] > 1:
                                 logger.info(f"✅ Successfully read NTY file (legacy mode) with encoding='{encoding}', separator='{sep}', shape={df.shape}")
                                 return df, encoding, sep
                         except:
@@ -320,6 +829,7 @@ def robust_read_csv(file_path, usecols=None, header='infer', encodings=None, sep
                 # Standard parsing for non-NTY files or other separators
                 elif header is None:
                     # For no-header files, try a more flexible approach
+                    bad_lines = 'warn'
                     try:
                         # First, try to read a sample to understand the structure
                         sample_df = pd.read_csv(file_path, encoding=encoding, sep=sep, header=None, nrows=5)
@@ -337,6 +847,7 @@ def robust_read_csv(file_path, usecols=None, header='infer', encodings=None, sep
                         )
                     except Exception:
                         # Fallback: try the older pandas approach
+                        bad_lines = None
                         try:
                             df = pd.read_csv(
                                 file_path, 
@@ -349,34 +860,24 @@ def robust_read_csv(file_path, usecols=None, header='infer', encodings=None, sep
                             )
                         except TypeError:
                             # If both approaches fail, read normally
+                            bad_lines = 'error'
                             df = pd.read_csv(file_path, encoding=encoding, sep=sep, usecols=usecols, header=header)
                 else:
+                    bad_lines = 'error'
                     df = pd.read_csv(file_path, encoding=encoding, sep=sep, usecols=usecols, header=header)
                     
-                if df is not None and df.shape[1] >= 2 and df.shape[0] > 1:
-                    # Enhanced validation: check if we have reasonable data separation
-                    first_few_values = [str(df.iloc[i, 0]) if i < df.shape[0] else "" for i in range(1, min(4, df.shape[0]))]
-                    
+                if df is not None and df.shape[1] >= _min_columns(False, sep, usecols) and df.shape[0] > 1:
                     # Skip validation for NTY files as they may have complex data
                     if not is_nty_file:
                         # Check for common separator mismatches
-                        for sample_val in first_few_values:
-                            # If we're using space as separator but data contains semicolons, reject this
-                            if sep == ' ' and ';' in sample_val and sample_val.count(';') >= 2:
-                                failed_attempts.append((encoding, sep, f"space sep with semicolons: '{sample_val[:30]}...'"))
-                                raise ValueError("Wrong separator detected")
-                            
-                            # If we're using comma as separator but data contains semicolons, be suspicious
-                            if sep == ',' and ';' in sample_val and sample_val.count(';') >= 3:
-                                failed_attempts.append((encoding, sep, f"comma sep with many semicolons: '{sample_val[:30]}...'"))
-                                raise ValueError("Wrong separator detected")
-                            
-                            # If we're using any separator but the first column contains the expected separator, reject
-                            if sep != ';' and ';' in sample_val and sample_val.count(';') >= 2:
-                                failed_attempts.append((encoding, sep, f"non-semicolon sep with semicolons: '{sample_val[:30]}...'"))
-                                raise ValueError("Wrong separator detected")
+                        reason = _looks_like_wrong_separator(df, sep)
+                        if reason:
+                            failed_attempts.append((encoding, sep, reason))
+                            raise ValueError("Wrong separator detected")
                     
                     logger.info(f"✅ Successfully read file with encoding='{encoding}', separator='{sep}', shape={df.shape}")
+                    if entity and bad_lines:
+                        remember_dialect(entity, _dialect(encoding, sep, header, bad_lines))
                     return df, encoding, sep
                 else:
                     failed_attempts.append((encoding, sep, f"insufficient data: shape={df.shape if df is not None else 'None'}"))
@@ -401,55 +902,81 @@ def read_csv_file_checking_encodings_sep(
     file_path: str,
     usecols=None,
     yaml_encoding_sep_path: Path = Path(YAML_ENCODING_SEP_FILE_PATH),
-    header='infer'
+    header='infer',
+    entity=None
     ) -> tuple[pd.DataFrame, str, str]:
     """
     Reads a CSV file, trying different encodings and separators. Accepts header argument for pandas.
+    entity: clé du cache de dialectes (ex: 'fournisseurs/NTY'), None pour ne pas utiliser le cache.
     """
     yaml_info = read_yaml_file(yaml_encoding_sep_path)
     encodings, separators = yaml_info['encodings'], yaml_info['separators']
     # Use robust_read_csv for better detection
-    return robust_read_csv(file_path, usecols=usecols, header=header, encodings=encodings, separators=separators)
+    return robust_read_csv(file_path, usecols=usecols, header=header, encodings=encodings, separators=separators, entity=entity)
+
+
+# ------------------------------------------------------------------------------
+#        Classeurs Excel : format détecté sur les octets, classeur ouvert une fois
+# ------------------------------------------------------------------------------
+EXCEL_EXTENSIONS = {'.xls', '.xlsx'}
+XLSX_MAGIC = b'PK\x03\x04'                           # archive zip (xlsx)
+XLS_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'  # OLE2 (xls)
+EXCEL_ENGINES = {'xlsx': 'openpyxl', 'xls': 'xlrd'}
+
+
+def detect_file_format(file_name) -> str:
+    """'xlsx', 'xls' ou 'csv' d'après les premiers octets du fichier (et non l'extension)."""
+    with open(file_name, 'rb') as f:
+        head = f.read(len(XLS_MAGIC))
+    if head.startswith(XLSX_MAGIC):
+        return 'xlsx'
+    if head.startswith(XLS_MAGIC):
+        return 'xls'
+    return 'csv'
+
+
+def read_excel_dataset(file_name, usecols=None) -> pd.DataFrame:
+    """
+    Ouvre le classeur une seule fois (openpyxl en lecture seule ou xlrd selon les octets
+    du fichier), décide de l'entête sur ses 4 premières lignes puis lit la feuille.
+    """
+    engine = EXCEL_ENGINES.get(detect_file_format(file_name))
+    with pd.ExcelFile(file_name, engine=engine) as xl:
+        temp_df = xl.parse(nrows=4, header=0)
+        header_option = 0 if has_valid_header(temp_df) else None
+        return xl.parse(header=header_option, usecols=usecols)
 
 
 # ------------------------------------------------------------------------------
 #                   Open Files of differents formats
 # ------------------------------------------------------------------------------
-def read_dataset_file(file_name: str, usecols=None, header='infer') -> dict:
+def read_dataset_file(file_name: str, usecols=None, header='infer', entity=None) -> dict:
     """
     Reads a dataset file with optional usecols and header arguments.
     header: 'infer' (default) for files with header, None for files without header.
+    entity: 'fournisseurs/<nom>' ou 'plateformes/<nom>' pour réutiliser le dialecte CSV appris.
     """
     logger.info(f"📥 Tentative de lecture du fichier : {file_name}  ...")
 
     try:
         ext = Path(file_name).suffix.lower()
         if ext in {'.csv', '.txt'}:
-            df,  encoding, sep = read_csv_file_checking_encodings_sep(file_name, usecols=usecols, header=header)
+            df,  encoding, sep = read_csv_file_checking_encodings_sep(file_name, usecols=usecols, header=header, entity=entity)
             logger.info(f"📄 Fichier lu : {file_name} -- avec ({len(df)} lignes)")
             return {'dataset':df, 'encoding':encoding, 'sep':sep}
         
-        elif ext in {'.xls', '.xlsx'}:
-            # Prefer explicit engines and provide CSV fallback if content mismatch
-            engines_to_try = []
-            if ext == '.xlsx':
-                engines_to_try = ['openpyxl', None]  # None lets pandas infer
-            else:
-                engines_to_try = ['xlrd', None]
+        elif ext in EXCEL_EXTENSIONS:
             last_error = None
-            for engine in engines_to_try:
+            if detect_file_format(file_name) != 'csv':
                 try:
-                    temp_df = pd.read_excel(file_name, nrows=4, header=0, engine=engine)
-                    header_option = 0 if has_valid_header(temp_df) else None
-                    df = pd.read_excel(file_name, header=header_option, usecols=usecols, engine=engine)
+                    df = read_excel_dataset(file_name, usecols=usecols)
                     logger.info(f"📄 Fichier lu : {file_name} -- avec ({len(df)} lignes)")
                     return {'dataset': df, 'encoding': '', 'sep': ''}
                 except Exception as e:
                     last_error = e
-                    continue
             # Fallback: some .xlsx are actually CSV; try robust CSV reader
             try:
-                df, encoding, sep = read_csv_file_checking_encodings_sep(file_name, usecols=usecols, header='infer')
+                df, encoding, sep = read_csv_file_checking_encodings_sep(file_name, usecols=usecols, header='infer', entity=entity)
                 logger.warning(f"[WARN] File '{file_name}' has Excel extension but was read as CSV (encoding='{encoding}', sep='{sep}').")
                 return {'dataset': df, 'encoding': encoding, 'sep': sep}
             except Exception:
@@ -462,6 +989,66 @@ def read_dataset_file(file_name: str, usecols=None, header='infer') -> dict:
         return {'dataset':pd.DataFrame(), 'encoding':'', 'sep':''}  # Retourne un DataFrame vide en cas d'erreur
 
 
+# ------------------------------------------------------------------------------
+#         Lecture restreinte aux colonnes mappées (référence / quantité)
+# ------------------------------------------------------------------------------
+def peek_dataset_columns(file_name: str, header='infer', entity=None) -> list | None:
+    """
+    Colonnes du fichier telles que read_dataset_file les nommerait, lues sur les
+    premières lignes seulement (dialecte en cache ou détecté sur échantillon).
+    Retourne None si l'entête ne peut pas être déterminée à moindre coût.
+    """
+    try:
+        if Path(file_name).suffix.lower() in EXCEL_EXTENSIONS:
+            if detect_file_format(file_name) != 'csv':
+                # Ouvrir le classeur coûte autant que le lire : read_dataset_file le lit en une fois
+                return None
+            header = 'infer'   # même repli CSV que read_dataset_file
+        dialect = get_cached_dialect(entity, header) if entity else None
+        if dialect is None:
+            yaml_info = read_yaml_file(Path(YAML_ENCODING_SEP_FILE_PATH))
+            raw, truncated, encodings = _read_sample_with_encodings(file_name, yaml_info['encodings'])
+            dialect = sniff_csv_dialect(raw, encodings, yaml_info['separators'], header=header,
+                                        is_nty_file=_is_nty_file(file_name), truncated=truncated)
+        if dialect is None:
+            return None
+        return list(read_csv_with_dialect(file_name, dialect, header=header, nrows=5).columns)
+    except Exception as e:
+        logger.debug(f"[DEBUG]: Entête non déterminée pour {file_name}: {e}")
+        return None
+
+
+def read_dataset_columns(file_name: str, mappings: list, header='infer', entity=None) -> dict:
+    """
+    Lit uniquement les colonnes correspondant à `mappings` (noms ou index, comme dans
+    header_mappings.yaml) : l'entête est résolue d'abord, puis seules ces colonnes sont parsées.
+    Returns:
+        même dict que read_dataset_file + 'columns': noms des colonnes résolues, dans l'ordre de `mappings`
+                                          + 'positions': leur position dans le fichier.
+    Se replie sur une lecture complète si l'entête ne peut pas être déterminée à l'avance.
+    Raises:
+        ValueError si un mapping ne correspond à aucune colonne (voir get_column_by_mapping).
+    """
+    columns = peek_dataset_columns(file_name, header=header, entity=entity)
+    if columns:
+        # Même erreur qu'après une lecture complète si le mapping ne correspond pas à l'entête
+        head_df = pd.DataFrame(columns=columns)
+        positions = [columns.index(get_column_by_mapping(head_df, mapping)) for mapping in mappings]
+        usecols = sorted(set(positions))
+        info = read_dataset_file(file_name, usecols=usecols, header=header, entity=entity)
+        df = info['dataset']
+        if df.shape[1] == len(usecols):
+            info['columns'] = [df.columns[usecols.index(pos)] for pos in positions]
+            info['positions'] = positions
+            return info
+        logger.info(f"🔁 Lecture restreinte impossible pour {file_name}, lecture complète...")
+
+    info = read_dataset_file(file_name, header=header, entity=entity)
+    info['columns'] = [get_column_by_mapping(info['dataset'], mapping) for mapping in mappings]
+    info['positions'] = [list(info['dataset'].columns).index(column) for column in info['columns']]
+    return info
+
+
 # ------------------------------------------------------------------------------
 #                       Adapter les chemins pour .exe
 # ------------------------------------------------------------------------------
@@ -552,6 +1139,86 @@ def process_stock_value(value):
         return 0
 
 
+STOCK_ZERO_VALUES = ["N/A", "NA", "NONE", "", "OUT OF STOCK", "OUTOFSTOCK", "RUPTURE", "ÉPUISÉ", "EPUISE"]
+STOCK_AVAILABLE_VALUES = ["AVAILABLE", "IN STOCK", "INSTOCK", "EN STOCK", "ENSTOCK"]
+
+# Formes couvertes par process_stock_series (au plus 15 chiffres : valeurs exactes en int64 et en float)
+_STOCK_PREFIXED_RE = r'^(?:>=|<=|>|<|\+)\s*([0-9]{1,15})$'     # '>=10', '<5', '+10'
+_STOCK_RANGE_RE = r'^([0-9]{1,15})\s*-[^-]*$'                  # '10-20' -> 10
+_STOCK_NUMBER_RE = r'^-?[0-9]{1,15}(?:\.[0-9]*)?$'             # '12', '-3', '12.7' -> 12
+
+
+def process_stock_series(values: pd.Series) -> pd.Series:
+    """
+    Version vectorisée de process_stock_value pour une colonne entière : mêmes résultats,
+    valeur par valeur, en int64 (object si une valeur dépasse int64) et avec le même index.
+    Une colonne de stock n'a que quelques valeurs distinctes : les colonnes texte sont
+    factorisées et seules les valeurs distinctes sont normalisées.
+    """
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return _process_stock_values(values)
+    codes, uniques = pd.factorize(values)       # NaN/None -> code -1
+    per_value = _process_stock_values(pd.Series(uniques)).to_numpy()
+    per_value = np.append(per_value, np.zeros(1, dtype=per_value.dtype))   # code -1 -> 0
+    return pd.Series(per_value[codes], index=values.index, dtype=per_value.dtype, name=values.name)
+
+
+def _process_stock_values(values: pd.Series) -> pd.Series:
+    """
+    Les formes courantes (nombres, '>=10', '+5', '10-20', 'AVAILABLE', 'N/A', 'RUPTURE', ...)
+    sont traitées par les méthodes .str et des regex ; les valeurs restantes (rares)
+    passent par process_stock_value.
+    """
+    original_index = values.index
+    values = values.reset_index(drop=True)
+    result = pd.Series(0, index=values.index, dtype='int64')
+    if values.empty:
+        return result.set_axis(original_index)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        text = pd.Series(np.nan, index=values.index, dtype=object)
+        numeric = values.notna()
+    else:
+        try:
+            text = values.str.strip().str.upper()
+        except AttributeError:      # colonne objet sans aucune chaîne
+            text = pd.Series(np.nan, index=values.index, dtype=object)
+        # nombres Python (int/float) d'une colonne objet, ex: lecture Excel
+        numeric = text.isna() & values.notna()
+        numeric[numeric] = values[numeric].map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)).astype(bool)
+
+    # Nombres : int(value), donc troncature vers zéro
+    numbers = values[numeric].astype('float64')
+    exact = np.isfinite(numbers) & (numbers.abs() < 1e15)
+    result[exact.index[exact]] = np.trunc(numbers[exact]).astype('int64')
+    rest = values.notna() & ~numeric
+    rest[exact.index[~exact]] = True
+
+    # Chaînes : mots-clés, puis '12.7', '>=10' / '+5', '10-20'
+    is_text = text.notna()
+    result[text.isin(STOCK_AVAILABLE_VALUES)] = 100
+    done = text.isin(STOCK_ZERO_VALUES) | text.isin(STOCK_AVAILABLE_VALUES)
+    candidates = text[is_text & ~done]
+    matched = candidates[candidates.str.match(_STOCK_NUMBER_RE).astype(bool)]
+    # float() de Python (pas to_numeric) : arrondi identique à int(float(value_str))
+    result[matched.index] = np.trunc(matched.map(float).astype('float64')).astype('int64')
+    done[matched.index] = True
+    for pattern in (_STOCK_PREFIXED_RE, _STOCK_RANGE_RE):
+        extracted = text[is_text & ~done].str.extract(pattern, expand=False).dropna()
+        result[extracted.index] = extracted.astype('int64')
+        done[extracted.index] = True
+
+    rest &= ~done
+    if rest.any():
+        fallback = values[rest].map(process_stock_value)
+        try:
+            result[rest] = fallback.astype('int64')
+        except OverflowError:
+            # ex: '0986479E45' -> entier Python hors int64, comme avec .apply(process_stock_value)
+            result = result.astype(object)
+            result[rest] = fallback
+    return result.set_axis(original_index)
+
+
 # ------------------------------------------------------------------------------
 #         Remove spaces before/after '='  + avoid '' or "" in the env file
 # ------------------------------------------------------------------------------
@@ -794,11 +1461,13 @@ def save_header_mappings(mappings):
 def get_valid_fournisseurs(timeout=5):
     """
     Tests FTP connections for all configured suppliers of type 'ftp' and returns only those with valid connections.
+    Successful sessions stay open in the run FTP pool and are reused by the download/upload steps.
     Args:
         timeout (int): Connection timeout in seconds
     Returns:
         list: List of supplier names with valid FTP connections
     """
+    from functions.functions_ftp_pool import get_run_pool  # import local (évite un import circulaire)
     valid = []
     invalid = []
     fournisseurs = load_fournisseurs_config()
@@ -807,16 +1476,7 @@ def get_valid_fournisseurs(timeout=5):
     print(f"\nTesting FTP connections for {len(fournisseurs)} fournisseurs (type=ftp)...")
     for name, info in fournisseurs.items():
         try:
-            with FTP() as ftp:
-                ftp.connect(
-                    host=info['host'],
-                    port=int(info.get('port', 21)),
-                    timeout=timeout
-                )
-                ftp.login(
-                    user=info['username'],
-                    passwd=info['password']
-                )
+            with get_run_pool().session(info['host'], info['username'], info['password'], port=int(info.get('port', 21)), timeout=timeout):
                 valid.append(name)
                 print(f"✅ {name}: Connection successful")
         except Exception as e:
@@ -833,11 +1493,13 @@ def get_valid_fournisseurs(timeout=5):
 def get_valid_platforms(timeout=5):
     """
     Tests FTP connections for all configured platforms of type 'ftp' and returns only those with valid connections.
+    Successful sessions stay open in the run FTP pool and are reused by the download/upload steps.
     Args:
         timeout (int): Connection timeout in seconds
     Returns:
         list: List of platform names with valid FTP connections
     """
+    from functions.functions_ftp_pool import get_run_pool  # import local (évite un import circulaire)
     valid = []
     invalid = []
     platforms = load_plateformes_config()
@@ -846,16 +1508,7 @@ def get_valid_platforms(timeout=5):
     print(f"\nTesting FTP connections for {len(platforms)} platforms (type=ftp)...")
     for name, info in platforms.items():
         try:
-            with FTP() as ftp:
-                ftp.connect(
-                    host=info['host'],
-                    port=int(info.get('port', 21)),
-                    timeout=timeout
-                )
-                ftp.login(
-                    user=info['username'],
-                    passwd=info['password']
-                )
+            with get_run_pool().session(info['host'], info['username'], info['password'], port=int(info.get('port', 21)), timeout=timeout):
                 valid.append(name)
                 print(f"✅ {name}: Connection successful")
         except Exception as e: